@@ -38,6 +38,19 @@ if 'REMOTE_SERVICE' not in globals():
 if "LOGS" not in globals():
     LOGS = False
 
+#
+# HEADLESS determines whether Chrome runs headless. This is possible
+# only for local runs. A headless browser needs neither a virtual
+# display nor a window manager, which makes starting the suite and
+# each scenario faster. The features that need a window manager are
+# tagged @window_manager and are skipped in headless mode. Set it with
+# ``-D headless=1`` or with the environment variable SELENIUM_HEADLESS.
+#
+if "HEADLESS" not in globals():
+    HEADLESS = builder_args.get("headless",
+                                os.environ.get("SELENIUM_HEADLESS", ""))
+    HEADLESS = HEADLESS.lower() not in ("", "0", "false", "no")
+
 # Detect whether we are running in a builder like Buildbot. (Note that
 # this is unrelated to selenic's Builder class.)
 in_builder = os.environ.get('BUILDBOT')
@@ -196,6 +209,11 @@ if CONFIG.browser == "CHROME":
     #
     CHROME_OPTIONS.add_argument("touch-events")
 
+    if HEADLESS:
+        CHROME_OPTIONS.add_argument("headless")
+        # The same size as the virtual display used when not headless.
+        CHROME_OPTIONS.add_argument("window-size=1024,768")
+
 profile = FirefoxProfile()
 # profile.set_preference("webdriver.log.file",
 #                        "/tmp/firefox_webdriver.log")
@@ -220,6 +238,10 @@ FIREFOX_PROFILE = profile
 def post_execution():
     shutil.rmtree(tmp_path, True)
 
+if HEADLESS and (CONFIG.browser != "CHROME" or CONFIG.remote):
+    raise ValueError("headless mode is available only for local runs "
+                     "of Chrome")
+
 if CONFIG.remote and not REMOTE_SERVICE:
     raise ValueError("you must pass a service argument to behave")
 
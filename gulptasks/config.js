@@ -47,6 +47,20 @@ exports.optionDefinitions = {
     help: "Parameters to pass to behave.",
     defaultValue: undefined,
   },
+  behave_jobs: {
+    help: "Number of behave processes to run in parallel when running the " +
+      "Selenium tests. Each process runs a share of the features with its " +
+      "own browser, display and server.",
+    type: Number,
+    defaultValue: 1,
+  },
+  selenium_headless: {
+    help: "Run the Selenium tests with a headless browser. The features " +
+      "that need a window manager are then run separately with a " +
+      "regular browser.",
+    type: toBoolean,
+    defaultValue: false,
+  },
   tei: {
     help: "Path to the directory containing the TEI stylesheets.",
     defaultValue: "/usr/share/xml/tei/stylesheet",
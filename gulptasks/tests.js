@@ -8,8 +8,8 @@ const versync = require("versync");
 const Promise = require("bluebird");
 
 const { options } = require("./config");
-const { cprp, defineTask, exec, existsInFile, mkdirp, newer, sequence, spawn } =
-      require("./util");
+const { cprp, defineTask, exec, existsInFile, fs, mkdirp, newer, sequence,
+        spawn } = require("./util");
 
 const convertXMLDirs = glob.sync("lib/tests/*_test_data")
         .filter(x => x !== "lib/tests/convert_test_data");
@@ -132,14 +132,127 @@ exports.test = sequence("test", lint, testKarma, testKarmaWebpack,
                           }
                         });
 
-// Features is an optional array of features to run instead of running all
-// features.
-function selenium(features) {
-  let args = options.behave_params ? shell.parse(options.behave_params) : [];
+const shardsDir = "test_logs/shards";
+const featureDurationsPath = "test_logs/feature_durations.json";
+
+/**
+ * Distribute features among shards so that the shards take about the same
+ * time to run. Features are assigned from the longest to the shortest, each
+ * to the shard with the least work so far.
+ *
+ * @param {Array<string>} features The features to distribute.
+ *
+ * @param {Object} durations The durations of past runs, keyed by feature.
+ *
+ * @param {number} count The number of shards.
+ *
+ * @returns {Array<Array<string>>} The features of each shard.
+ */
+function makeShards(features, durations, count) {
+  const known = features.filter(x => durations[x] !== undefined)
+        .map(x => durations[x]);
+  // Features we've never timed are assumed to take an average time.
+  const fallback = known.length !== 0 ?
+        known.reduce((acc, x) => acc + x, 0) / known.length : 1;
+  const durationOf = x => (durations[x] !== undefined ? durations[x] :
+                           fallback);
+
+  const shards = [];
+  for (let i = 0; i < count; ++i) {
+    shards.push({ features: [], total: 0 });
+  }
+
+  const sorted = features.slice().sort((a, b) => durationOf(b) -
+                                       durationOf(a));
+  for (const feature of sorted) {
+    const shard = shards.reduce((acc, x) => (x.total < acc.total ? x : acc));
+    shard.features.push(feature);
+    shard.total += durationOf(feature);
+  }
+
+  return shards.map(x => x.features).filter(x => x.length !== 0);
+}
+
+/**
+ * Run features in multiple behave processes at once. Each process produces a
+ * JSON report. Once all processes are done, the reports are merged into
+ * ``test_logs/behave.json`` and the duration of each feature is recorded so
+ * that the next run can balance the shards better.
+ *
+ * @param {Array<string>} features The features to run.
+ *
+ * @param {Array<string>} args Additional arguments to pass to behave.
+ *
+ * @returns {Promise} A promise that resolves if all processes succeeded.
+ */
+const shardedSelenium = Promise.coroutine(function *shardedSelenium(features,
+                                                                    args) {
+  yield fs.emptyDir(shardsDir);
+  let durations = {};
+  if (yield fs.pathExists(featureDurationsPath)) {
+    durations = yield fs.readJson(featureDurationsPath);
+  }
+
+  const shards = makeShards(features, durations, options.behave_jobs);
+  const results = yield Promise.all(shards.map((shard, ix) => {
+    const report = path.join(shardsDir, `${ix}.json`);
+    log(`shard ${ix}: ${shard.join(" ")}`);
+    // The first formatter, which has no -o option, writes to stdout.
+    const shardArgs = shard.concat("-f", "progress", "-f", "json", "-o",
+                                   report, args);
+    // Each process records its timings in its own files.
+    const env = Object.assign({}, process.env, {
+      BEHAVE_TIMINGS: path.join(shardsDir, `${ix}-timings`),
+    });
+    return spawn("behave", shardArgs, { stdio: "inherit", env })
+      .then(() => true, () => false);
+  }));
+
+  let merged = [];
+  for (let ix = 0; ix < shards.length; ++ix) {
+    const report = path.join(shardsDir, `${ix}.json`);
+    if (yield fs.pathExists(report)) {
+      merged = merged.concat(yield fs.readJson(report));
+    }
+  }
+  yield fs.writeJson("test_logs/behave.json", merged, { spaces: 2 });
+
+  for (const feature of merged) {
+    let duration = 0;
+    for (const element of feature.elements || []) {
+      for (const step of element.steps || []) {
+        if (step.result && step.result.duration) {
+          duration += step.result.duration;
+        }
+      }
+    }
+    durations[feature.location.replace(/:\d+$/, "")] = duration;
+  }
+  yield fs.writeJson(featureDurationsPath, durations, { spaces: 2 });
+
+  const failed = shards.filter((shard, ix) => !results[ix]);
+  if (failed.length !== 0) {
+    throw new Error(`failures in: ${[].concat(...failed).join(" ")}`);
+  }
+});
 
+// Features is an optional array of features to run instead of running all
+// features. Jobs is the number of behave processes to run at once. Env is an
+// optional set of environment variables for behave.
+function runSelenium(features, args, jobs, env) {
   // We check what we obtained from `behave_params` too, just in case someone is
   // trying to select a specific feature though behave_params.
-  if (args.filter(x => /\.feature$/.test(x)).length === 0 && !features) {
+  const paramFeatures = args.filter(x => /\.feature$/.test(x));
+  if (jobs > 1) {
+    args = args.filter(x => paramFeatures.indexOf(x) === -1);
+    if (!features) {
+      features = paramFeatures.length !== 0 ? paramFeatures :
+        glob.sync("selenium_test/*.feature");
+    }
+    return shardedSelenium(features, args);
+  }
+
+  if (paramFeatures.length === 0 && !features) {
     args.push("selenium_test");
   }
 
@@ -147,7 +260,34 @@ function selenium(features) {
     args = features.concat(args);
   }
 
-  return spawn("behave", args, { stdio: "inherit" });
+  return spawn("behave", args, {
+    stdio: "inherit",
+    env: Object.assign({}, process.env, env),
+  });
+}
+
+// Features is an optional array of features to run instead of running all
+// features.
+function selenium(features) {
+  const args = options.behave_params ? shell.parse(options.behave_params) : [];
+  if (!options.selenium_headless) {
+    return runSelenium(features, args, options.behave_jobs);
+  }
+
+  // Behave skips the features that need a window manager in headless mode, so
+  // we run them afterwards with a regular browser. There are few of them, so
+  // one process is enough.
+  return runSelenium(features, args.concat("-D", "headless=1"),
+                     options.behave_jobs)
+    .then(() => true, () => false)
+    .then(headlessPassed => runSelenium(
+      features, args.concat("--tags=window_manager"), 1,
+      { BEHAVE_TIMINGS: "test_logs/timings-window-manager" })
+          .then(() => {
+            if (!headlessPassed) {
+              throw new Error("the headless run failed");
+            }
+          }));
 }
 
 const seleniumTest = {
@@ -157,6 +297,19 @@ const seleniumTest = {
 };
 defineTask(seleniumTest);
 
+const seleniumBenchmark = {
+  name: "selenium-benchmark",
+  deps: seleniumTest.deps,
+  func: () => {
+    const args = options.behave_params ? shell.parse(options.behave_params) :
+          [];
+    const env = Object.assign({}, process.env, { BEHAVE_BENCHMARKS: "1" });
+    return spawn("behave", ["selenium_test/benchmark.feature"].concat(args),
+                 { stdio: "inherit", env });
+  },
+};
+defineTask(seleniumBenchmark);
+
 for (const feature of glob.sync("selenium_test/*.feature")) {
   gulp.task(feature, seleniumTest.deps, () => selenium([feature]));
 }
@@ -84,6 +84,25 @@ describe("wed decoration:", () => {
                   "should have an end label");
   });
 
+  it("labels are not recreated when typing in an element", () => {
+    const initial = editor.guiRoot.querySelector(".body>.p")!;
+    const start = initial.firstChild;
+    const end = initial.lastChild;
+    caretManager.setCaret(editor.toDataNode(initial)!.firstChild, 1);
+    editor.type("a");
+    assert.strictEqual(initial.firstChild, start, "same start label");
+    assert.strictEqual(initial.lastChild, end, "same end label");
+  });
+
+  it("labels are recreated when an attribute changes", () => {
+    const initial = editor.guiRoot.querySelector(".body>.p")!;
+    const start = initial.firstChild;
+    editor.dataUpdater.setAttribute(editor.toDataNode(initial) as Element,
+                                    "rend", "foo");
+    assert.notStrictEqual(initial.firstChild, start, "new start label");
+    assert.equal(getAttributeNamesFor(initial)[0].textContent, "rend");
+  });
+
   function isVisible(el: HTMLElement): boolean {
     return (el.offsetWidth !== 0 ||
             el.offsetHeight !== 0 ||
@@ -49,4 +49,26 @@ describe("wed gui:", () => {
                    "the list is displayed");
     });
   });
+
+  describe("fromDataNode and toDataNode", () => {
+    it("map text nodes in both directions", () => {
+      const dataText = editor.dataRoot.querySelector("body p")!
+        .firstChild as Text;
+      const guiText = editor.fromDataNode(dataText)!;
+      assert.equal(guiText.nodeType, Node.TEXT_NODE);
+      assert.equal(guiText.textContent, dataText.data);
+      assert.strictEqual(editor.toDataNode(guiText), dataText);
+    });
+
+    it("map text nodes that have been moved", () => {
+      const dataPs = editor.dataRoot.querySelectorAll("body p");
+      const dataText = dataPs[0].firstChild as Text;
+      editor.dataUpdater.deleteNode(dataText);
+      editor.dataUpdater.insertNodeAt(dataPs[1], 0, dataText);
+      const guiText = editor.fromDataNode(dataText)!;
+      assert.strictEqual(guiText.parentNode,
+                         editor.fromDataNode(dataPs[1]));
+      assert.strictEqual(editor.toDataNode(guiText), dataText);
+    });
+  });
 });
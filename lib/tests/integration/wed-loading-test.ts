@@ -0,0 +1,76 @@
+/**
+ * @author Louis-Dominique Dubeau
+ * @license MPL 2.0
+ * @copyright Mangalam Research Center for Buddhist Languages
+ */
+import { first } from "rxjs/operators";
+
+import { Editor } from "wed/editor";
+
+import { EditorSetup } from "../wed-test-util";
+
+const options = {
+  schema: "/base/build/schemas/tei-simplified-rng.js",
+  mode: {
+    path: "wed/modes/test/test-mode",
+    options: {
+      metadata: "/base/build/schemas/tei-metadata.json",
+    },
+  },
+  loading: {
+    chunkSize: 1,
+  },
+};
+
+const assert = chai.assert;
+
+describe("wed loading:", () => {
+  let setup: EditorSetup;
+  let editor: Editor;
+
+  beforeEach(() => {
+    setup = new EditorSetup(
+      "/base/build/standalone/lib/tests/wed_test_data/source_converted.xml",
+      options,
+      document);
+    ({ editor } = setup);
+  });
+
+  afterEach(() => {
+    setup.restore();
+
+    // tslint:disable-next-line:no-any
+    (editor as any) = undefined;
+  });
+
+  it("does not accept edits while the document is loading", async () => {
+    const initialized = setup.init();
+    const progress = await editor.loadProgress
+      .pipe(first((x) => x > 0)).toPromise();
+    assert.isBelow(progress, 1, "the document should still be loading");
+
+    const walker = editor.dataRoot.createTreeWalker(editor.dataRoot,
+                                                    NodeFilter.SHOW_TEXT);
+    const text = walker.nextNode() as Text;
+    assert.isNotNull(text, "there should be some text loaded");
+    const before = text.data;
+    editor.caretManager.setCaret(text, 0);
+    editor.type("blah");
+    editor.undo();
+
+    await initialized;
+    assert.equal(text.data, before);
+    assert.notInclude(editor.dataRoot.documentElement.textContent!, "blah");
+    assert.isAbove(editor.dataRoot.querySelectorAll("body p").length, 0);
+  });
+
+  it("accepts edits once the document is loaded", async () => {
+    await setup.init();
+    const p = editor.dataRoot.querySelector("body p")!;
+    editor.caretManager.setCaret(p, 0);
+    editor.type("blah");
+    assert.match(p.textContent!, /^blah/);
+  });
+});
+
+//  LocalWords:  MPL
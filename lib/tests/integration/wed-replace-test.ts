@@ -0,0 +1,65 @@
+/**
+ * @author Louis-Dominique Dubeau
+ * @license MPL 2.0
+ * @copyright Mangalam Research Center for Buddhist Languages
+ */
+import { replaceEditor } from "wed";
+import { Editor } from "wed/editor";
+
+import { DataProvider } from "../util";
+import { EditorSetup } from "../wed-test-util";
+
+const options = {
+  schema: "/base/build/schemas/tei-simplified-rng.js",
+  mode: {
+    path: "wed/modes/test/test-mode",
+    options: {
+      metadata: "/base/build/schemas/tei-metadata.json",
+    },
+  },
+};
+
+const assert = chai.assert;
+
+describe("wed replaceEditor:", () => {
+  let setup: EditorSetup;
+  let editor: Editor;
+  let replacement: Editor | undefined;
+
+  beforeEach(() => {
+    setup = new EditorSetup(
+      "/base/build/standalone/lib/tests/wed_test_data/source_converted.xml",
+      options,
+      document);
+    ({ editor } = setup);
+    return setup.init();
+  });
+
+  afterEach(() => {
+    if (replacement !== undefined) {
+      replacement.destroy();
+      replacement = undefined;
+    }
+    setup.restore();
+
+    // tslint:disable-next-line:no-any
+    (editor as any) = undefined;
+  });
+
+  it("destroys the old editor", () => {
+    replacement = replaceEditor(editor, options) as Editor;
+    assert.isTrue(editor.destroyed);
+    assert.isFalse(replacement.destroyed);
+  });
+
+  it("creates the new editor in the same widget", async () => {
+    const widget = setup.wedroot;
+    const data = await new DataProvider("").getText(setup.source);
+    replacement = replaceEditor(editor, options) as Editor;
+    await replacement.init(data);
+    assert.strictEqual(replacement.widget, widget);
+    assert.isTrue(widget.contains(replacement.guiRoot));
+    assert.equal(widget.getElementsByClassName("wed-document").length, 1);
+    assert.equal(replacement.dataRoot.firstElementChild!.tagName, "TEI");
+  });
+});
@@ -89,6 +89,13 @@ server_interaction_converted.xml",
     return prom;
   });
 
+  it("saveComplete resolves once the save is done", async () => {
+    const prom = editor.saveComplete();
+    editor.type(keyConstants.SAVE);
+    assert.strictEqual(await prom, editor);
+    assert.equal(server.lastSaveRequest.command, "save");
+  });
+
   it("does not autosave if not modified", (done) => {
     // tslint:disable-next-line:no-floating-promises
     editor.save().then(() => {
@@ -167,4 +174,54 @@ server_interaction_converted.xml",
          }, interval * 2);
        });
      });
+
+  it("emits metrics for saves", async () => {
+    const prom = editor.saver.events
+      .pipe(first((ev) => ev.name === "SaveMetrics")).toPromise();
+    await editor.save();
+    const ev = await prom;
+    if (ev.name !== "SaveMetrics") {
+      throw new Error("unexpected event");
+    }
+    assert.isFalse(ev.autosave);
+    assert.equal(ev.size, server.lastSaveRequest.data.length);
+    assert.equal(ev.deferrals, 0);
+    assert.isAtLeast(ev.duration, ev.serialization);
+  });
+
+  it("defers autosaves while the document is being modified", async () => {
+    await editor.save();
+    let deferred = 0;
+    const sub = editor.saver.events
+      .pipe(filter((ev) => ev.name === "AutosaveDeferred"))
+      .subscribe(() => {
+        deferred++;
+      });
+    const prom = editor.saver.events
+      .pipe(first((ev) => ev.name === "SaveMetrics")).toPromise();
+    const title = editor.dataRoot.querySelector("title")!;
+    let count = 0;
+    // We keep modifying the document for longer than the autosave interval.
+    // The autosave is put off until the modifications have remained unsaved
+    // for twice the interval.
+    const timer = setInterval(() => {
+      editor.dataUpdater.setTextNodeValue(title.firstChild as Text,
+                                          `abcd${count++}`);
+    }, 10);
+    editor.saver.setAutosaveInterval(50);
+    try {
+      const ev = await prom;
+      if (ev.name !== "SaveMetrics") {
+        throw new Error("unexpected event");
+      }
+      assert.isTrue(ev.autosave);
+      assert.isAtLeast(ev.deferrals, 1);
+      assert.equal(ev.deferrals, deferred);
+    }
+    finally {
+      clearInterval(timer);
+      sub.unsubscribe();
+      editor.saver.setAutosaveInterval(0);
+    }
+  });
 });
@@ -263,6 +263,26 @@ describe("wed undo redo:", () => {
     assert.equal(getAttributeValuesFor(p).length, 0, "no attributes");
   });
 
+  it("undoes and redoes deletions after compacting them", () => {
+    const body = editor.dataRoot.querySelector("body")!;
+    const original = body.innerHTML;
+    const p = body.querySelector("p")!;
+    editor.dataUpdater.removeNode(p);
+    const deleted = body.innerHTML;
+
+    // tslint:disable-next-line:no-any
+    for (const item of (editor as any)._undo.list) {
+      item.undo.compact();
+    }
+
+    editor.undo();
+    assert.equal(body.innerHTML, original);
+    editor.redo();
+    assert.equal(body.innerHTML, deleted);
+    editor.undo();
+    assert.equal(body.innerHTML, original);
+  });
+
   it("can undo using the toolbar", () => {
     // Text node inside title.
     const initial = titles[0].childNodes[1];
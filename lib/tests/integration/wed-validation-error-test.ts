@@ -74,6 +74,12 @@ describe("wed validation errors:", () => {
     assert.equal(last.ev.error.toString(), "Test");
   });
 
+  it("validationComplete resolves once the errors are shown", async () => {
+    assert.strictEqual(await editor.validationComplete(), editor);
+    assert.equal(editor.$errorList.children("li").length,
+                 controller.copyErrorList().length);
+  });
+
   it("refreshErrors does not change the number of errors", async () => {
     await processRunner.onCompleted();
     const count = controller.copyErrorList().length;
@@ -93,6 +99,21 @@ describe("wed validation errors:", () => {
                  "the number of markers should be the same");
   });
 
+  it("refreshErrors does not move markers if nothing changed", async () => {
+    await processRunner.onCompleted();
+    const markers = controller.copyErrorList()
+      .map((error) => error.marker)
+      .filter((marker) => marker !== undefined) as HTMLElement[];
+    assert.isAbove(markers.length, 0);
+    const positions = markers.map(({ style }) => [style.top, style.left]);
+
+    controller.refreshErrors();
+    await refreshRunner.onCompleted();
+
+    assert.deepEqual(markers.map(({ style }) => [style.top, style.left]),
+                     positions);
+  });
+
   // tslint:disable-next-line:mocha-no-side-effect-code
   const itNoIE = browsers.MSIE ? it.skip : it;
 
@@ -0,0 +1,62 @@
+/**
+ * @author Louis-Dominique Dubeau
+ * @license MPL 2.0
+ * @copyright Mangalam Research Center for Buddhist Languages
+ */
+import { Editor } from "wed/editor";
+
+import { EditorSetup } from "../wed-test-util";
+
+const options = {
+  schema: "/base/build/schemas/tei-simplified-rng.js",
+  mode: {
+    path: "wed/modes/test/test-mode",
+    options: {
+      metadata: "/base/build/schemas/tei-metadata.json",
+    },
+  },
+  virtualize: {
+    selector: "p",
+    estimatedHeight: 100,
+  },
+};
+
+const assert = chai.assert;
+
+describe("wed virtualize:", () => {
+  let setup: EditorSetup;
+  let editor: Editor;
+
+  before(() => {
+    setup = new EditorSetup(
+      "/base/build/standalone/lib/tests/wed_test_data/source_converted.xml",
+      options,
+      document);
+    ({ editor } = setup);
+    return setup.init();
+  });
+
+  afterEach(() => {
+    setup.reset();
+  });
+
+  after(() => {
+    setup.restore();
+
+    // tslint:disable-next-line:no-any
+    (editor as any) = undefined;
+  });
+
+  it("marks the selected elements", () => {
+    const ps = editor.guiRoot.querySelectorAll("._real.p");
+    assert.isAbove(ps.length, 0);
+    for (const p of Array.from(ps)) {
+      assert.isTrue(p.classList.contains("_virtualized"));
+    }
+  });
+
+  it("does not mark other elements", () => {
+    assert.equal(editor.guiRoot.querySelectorAll("._virtualized:not(.p)")
+                 .length, 0);
+  });
+});
@@ -159,6 +159,76 @@ describe("dloc", () => {
                      Error, "malformed path expression");
       });
     });
+
+    describe("nodeToArrayPath", () => {
+      it("returns an empty array on root", () => {
+        assert.deepEqual(rootObj.nodeToArrayPath(root), []);
+      });
+
+      it("returns a correct path on text node", () => {
+        const node = defined($root.find(".body>.p")[1].childNodes[2]);
+        assert.deepEqual(rootObj.nodeToArrayPath(node), [0, 1, 0, 1, 2]);
+      });
+
+      it("returns a correct path on attribute", () => {
+        const node =
+          defined($root.find(".body>.p")[1].attributes.getNamedItem("class"));
+        assert.deepEqual(rootObj.nodeToArrayPath(node),
+                         [0, 1, 0, 1, "class"]);
+      });
+    });
+
+    describe("arrayPathToNode", () => {
+      it("returns root when passed an empty array", () => {
+        assert.equal(rootObj.arrayPathToNode([]), root);
+      });
+
+      it("returns a correct node on a text path", () => {
+        const node = defined($root.find(".body>.p")[1].childNodes[2]);
+        assert.equal(rootObj.arrayPathToNode([0, 1, 0, 1, 2]), node);
+      });
+
+      it("returns a correct node on attribute path", () => {
+        const node =
+          defined($root.find(".body>.p")[1].attributes.getNamedItem("class"));
+        assert.equal(rootObj.arrayPathToNode([0, 1, 0, 1, "class"]), node);
+      });
+
+      it("returns null on a path to a node that does not exist", () => {
+        assert.equal(rootObj.arrayPathToNode([0, 10]), null);
+      });
+
+      it("fails on malformed path", () => {
+        assert.throws(rootObj.arrayPathToNode.bind(rootObj, ["class", 0]),
+                      Error, "malformed path expression");
+      });
+    });
+
+    describe("with an index", () => {
+      let indexedRoot: HTMLElement;
+      let indexedRootObj: DLocRoot;
+
+      beforeEach(() => {
+        indexedRoot = root.cloneNode(true) as HTMLElement;
+        indexedRootObj = new DLocRoot(indexedRoot, true);
+      });
+
+      it("converts nodes to paths and back", () => {
+        const node = defined($(indexedRoot).find(".body>.p")[1].childNodes[2]);
+        assert.equal(indexedRootObj.nodeToPath(node), "0/1/0/1/2");
+        assert.equal(indexedRootObj.pathToNode("0/1/0/1/2"), node);
+      });
+
+      it("reflects changes it is told about", () => {
+        const p = defined($(indexedRoot).find(".body>.p")[1]);
+        const node = defined(p.childNodes[2]);
+        assert.equal(indexedRootObj.nodeToPath(node), "0/1/0/1/2");
+        p.removeChild(p.firstChild!);
+        defined(indexedRootObj.positionIndex).childrenChanged(p);
+        assert.equal(indexedRootObj.nodeToPath(node), "0/1/0/1/1");
+        assert.equal(indexedRootObj.pathToNode("0/1/0/1/1"), node);
+      });
+    });
   });
 
   describe("findRoot", () => {
@@ -0,0 +1,80 @@
+/**
+ * @author Louis-Dominique Dubeau
+ * @license MPL 2.0
+ * @copyright Mangalam Research Center for Buddhist Languages
+ */
+import { DLocRoot } from "wed/dloc";
+import { DocumentLoader } from "wed/document-loader";
+import { TaskRunner } from "wed/task-runner";
+import { TreeUpdater } from "wed/tree-updater";
+
+const assert = chai.assert;
+
+describe("DocumentLoader", () => {
+  const source = "<doc><a><b>1</b><b>2<c/></b></a>3<a><b/></a></doc>";
+  let doc: Document;
+  let root: Element;
+  let updater: TreeUpdater;
+
+  beforeEach(() => {
+    const parser = new DOMParser();
+    doc = parser.parseFromString(source, "text/xml");
+    root = doc.documentElement;
+    doc.removeChild(root);
+    // tslint:disable-next-line:no-unused-expression
+    new DLocRoot(doc);
+    updater = new TreeUpdater(doc);
+  });
+
+  function load(loader: DocumentLoader): void {
+    while (loader.cycle()) {
+      // Keep going.
+    }
+  }
+
+  it("loads small documents in one insertion", () => {
+    let inserted = 0;
+    updater.events.subscribe((ev) => {
+      if (ev.name === "InsertNodeAt") {
+        inserted++;
+      }
+    });
+    load(new DocumentLoader(updater, doc, root));
+    assert.equal(inserted, 1);
+    assert.equal(new XMLSerializer().serializeToString(doc), source);
+  });
+
+  it("loads large documents in multiple insertions", () => {
+    const inserted: Node[] = [];
+    updater.events.subscribe((ev) => {
+      if (ev.name === "InsertNodeAt") {
+        inserted.push(ev.node);
+      }
+    });
+    load(new DocumentLoader(updater, doc, root, 1));
+    assert.equal(new XMLSerializer().serializeToString(doc), source);
+    assert.deepEqual(inserted.map((node) => node.nodeName),
+                     ["doc", "a", "b", "b", "#text", "a"]);
+  });
+
+  it("reports progress", () => {
+    const loader = new DocumentLoader(updater, doc, root, 1);
+    const progress: number[] = [];
+    loader.progress.subscribe((value) => {
+      progress.push(value);
+    });
+    load(loader);
+    assert.equal(progress[0], 0);
+    assert.equal(progress[progress.length - 1], 1);
+    for (let i = 1; i < progress.length; ++i) {
+      assert.isAbove(progress[i], progress[i - 1]);
+    }
+  });
+
+  it("can be run by a task runner", async () => {
+    const runner = new TaskRunner(new DocumentLoader(updater, doc, root, 1));
+    runner.start();
+    await runner.onCompleted();
+    assert.equal(new XMLSerializer().serializeToString(doc), source);
+  });
+});
@@ -582,6 +582,43 @@ describe("domlistener", () => {
        mark.check();
      });
 
+  it("calls handlers in the order they were added, whatever their " +
+     "selectors", () => {
+       const calls: string[] = [];
+       function makeHandler(name: string): IncludedElementHandler {
+         return ((_thisRoot, _tree, _parent, _previousSibling, _nextSibling,
+                  element) => {
+                   calls.push(`${name} ${element.textContent}`);
+                 }) as IncludedElementHandler;
+       }
+       listener.addHandler("included-element", "._real.li", makeHandler("1"));
+       listener.addHandler("included-element", "div.li", makeHandler("2"));
+       listener.addHandler("included-element", "*", makeHandler("3"));
+       listener.addHandler("included-element", ".ul, ._real.li",
+                           makeHandler("4"));
+       listener.startListening();
+       treeUpdater.insertNodeAt(root, root.childNodes.length, fragmentToAdd);
+       assert.deepEqual(calls, ["1 A", "1 B", "2 A", "2 B", "3 AB", "3 A",
+                                "3 B", "4 AB", "4 A", "4 B"]);
+     });
+
+  it("matches elements according to their current classes", () => {
+    const changed: Element[] = [];
+    listener.addHandler("children-changed", ".x\\:y",
+                        ((_thisRoot, _added, _removed, _previousSibling,
+                          _nextSibling, element) => {
+                          changed.push(element);
+                        }) as ChildrenChangedHandler);
+    listener.startListening();
+    treeUpdater.insertNodeAt(root, root.childNodes.length, fragmentToAdd);
+    const li = fragmentToAdd.firstElementChild!;
+    treeUpdater.insertText(li, 0, "1");
+    assert.deepEqual(changed, []);
+    li.classList.add("x:y");
+    treeUpdater.deleteNode(li.firstChild!);
+    assert.deepEqual(changed, [li]);
+  });
+
   it("processImmediately processes immediately", () => {
     let marked = false;
     mark = new Mark(2, { "children root": 1, trigger: 1 }, listener,
@@ -630,6 +667,29 @@ describe("domlistener", () => {
     mark.check();
     assert.isTrue(marked);
   });
+
+  describe("whenIdle", () => {
+    it("resolves immediately when nothing is pending", async () => {
+      listener.startListening();
+      await listener.whenIdle();
+    });
+
+    it("resolves once pending triggers are processed", async () => {
+      let triggered = false;
+      listener.addHandler("children-changed", "*", (() => {
+        listener.trigger("t");
+      }) as ChildrenChangedHandler);
+      listener.addHandler("trigger", "t", () => {
+        triggered = true;
+      });
+      listener.startListening();
+
+      treeUpdater.insertNodeAt(root, root.childNodes.length, fragmentToAdd);
+      assert.isFalse(triggered);
+      await listener.whenIdle();
+      assert.isTrue(triggered);
+    });
+  });
 });
 
 //  LocalWords:  domlistener Dubeau MPL Mangalam jsdom TreeUpdater
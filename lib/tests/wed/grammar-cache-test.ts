@@ -0,0 +1,65 @@
+/**
+ * @author Louis-Dominique Dubeau
+ * @license MPL 2.0
+ * @copyright Mangalam Research Center for Buddhist Languages
+ */
+import { GrammarCache } from "wed/grammar-cache";
+
+import { DataProvider } from "../util";
+
+const assert = chai.assert;
+
+describe("GrammarCache", () => {
+  let schemaText: string;
+  let otherSchemaText: string;
+
+  before(() => {
+    const provider = new DataProvider("/base/build/schemas/");
+    return Promise.all([
+      provider.getText("simplified-rng.js").then((text) => {
+        schemaText = text;
+      }),
+      provider.getText("tei-simplified-rng.js").then((text) => {
+        otherSchemaText = text;
+      }),
+    ]);
+  });
+
+  it("returns the same grammar for the same text", () => {
+    const cache = new GrammarCache();
+    const grammar = cache.get(schemaText);
+    // We make a copy of the string to ensure that we do not depend on string
+    // identity.
+    assert.strictEqual(cache.get(schemaText.slice(0)), grammar);
+    assert.equal(cache.size, schemaText.length);
+  });
+
+  it("returns different grammars for different texts", () => {
+    const cache = new GrammarCache();
+    assert.notStrictEqual(cache.get(schemaText), cache.get(otherSchemaText));
+    assert.equal(cache.size, schemaText.length + otherSchemaText.length);
+  });
+
+  it("does not cache texts larger than its maximum size", () => {
+    const cache = new GrammarCache(schemaText.length - 1);
+    assert.notStrictEqual(cache.get(schemaText), cache.get(schemaText));
+    assert.equal(cache.size, 0);
+  });
+
+  it("evicts the least recently used entries", () => {
+    const cache = new GrammarCache(Math.max(schemaText.length,
+                                            otherSchemaText.length));
+    const grammar = cache.get(schemaText);
+    cache.get(otherSchemaText);
+    assert.equal(cache.size, otherSchemaText.length);
+    assert.notStrictEqual(cache.get(schemaText), grammar);
+  });
+
+  it("clear empties the cache", () => {
+    const cache = new GrammarCache();
+    const grammar = cache.get(schemaText);
+    cache.clear();
+    assert.equal(cache.size, 0);
+    assert.notStrictEqual(cache.get(schemaText), grammar);
+  });
+});
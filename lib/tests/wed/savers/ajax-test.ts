@@ -7,7 +7,7 @@ const expect = chai.expect;
 
 import { DLocRoot } from "wed/dloc";
 import { Runtime } from "wed/runtime";
-import { Saver } from "wed/savers/ajax";
+import { PatchRecorder, Saver } from "wed/savers/ajax";
 import { TreeUpdater } from "wed/tree-updater";
 
 describe("ajax", () => {
@@ -83,4 +83,237 @@ describe("ajax", () => {
         .property("requests[0].requestHeaders.If-Match").equal("\"abc\"");
     });
   });
+
+  describe("PatchRecorder", () => {
+    let doc: Document;
+    let updater: TreeUpdater;
+    let recorder: PatchRecorder;
+
+    beforeEach(() => {
+      doc = new DOMParser().parseFromString(
+        "<doc><p>abc</p><p>def</p></doc>", "text/xml");
+      new DLocRoot(doc);
+      updater = new TreeUpdater(doc);
+      recorder = new PatchRecorder(updater, doc);
+    });
+
+    it("records changes", () => {
+      const first = doc.firstChild!.firstChild as Element;
+      updater.setTextNodeValue(first.firstChild as Text, "abcd");
+      updater.setAttributeNS(first, "", "rend", "bold");
+      updater.insertNodeAt(doc.firstChild!, 2, doc.createElement("q"));
+      updater.removeNode(doc.firstChild!.childNodes[1]);
+      expect(recorder.makePatch()).to.deep.equal({
+        ops: [{
+          op: "text",
+          path: [0, 0, 0],
+          value: "abcd",
+        }, {
+          op: "attr",
+          path: [0, 0],
+          name: "p",
+          ns: "",
+          attribute: "rend",
+          value: "bold",
+        }, {
+          op: "insert",
+          path: [0, 2],
+          xml: "<q/>",
+        }, {
+          op: "delete",
+          path: [0, 1],
+          name: "p",
+        }],
+        mark: 4,
+      });
+    });
+
+    it("drops acknowledged changes", () => {
+      const first = doc.firstChild!.firstChild as Element;
+      updater.setTextNodeValue(first.firstChild as Text, "abcd");
+      const mark = recorder.mark();
+      updater.setTextNodeValue(first.firstChild as Text, "abcde");
+      recorder.acknowledge(mark);
+      expect(recorder.makePatch()).to.deep.equal({
+        ops: [{
+          op: "text",
+          path: [0, 0, 0],
+          value: "abcde",
+        }],
+        mark: 2,
+      });
+    });
+
+    it("makes no patch if text nodes would be merged", () => {
+      const first = doc.firstChild!.firstChild as Element;
+      updater.insertNodeAt(first, 1, doc.createTextNode("x"));
+      expect(recorder.makePatch()).to.be.undefined;
+    });
+
+    it("serializes inserted elements as full saves do", () => {
+      const q = doc.createElement("q");
+      q.setAttribute("n", "a>b");
+      updater.insertNodeAt(doc.firstChild!, 0, q);
+      expect(recorder.makePatch()).to.deep.equal({
+        ops: [{
+          op: "insert",
+          path: [0, 0],
+          xml: "<q n=\"a&gt;b\"/>",
+        }],
+        mark: 1,
+      });
+    });
+
+    it("makes no patch when a text node is emptied", () => {
+      const first = doc.firstChild!.firstChild as Element;
+      updater.setTextNodeValue(first.firstChild as Text, "");
+      expect(recorder.makePatch()).to.be.undefined;
+    });
+
+    it("makes no patch when the changes exceed the limit", () => {
+      const first = doc.firstChild!.firstChild as Element;
+      recorder.limit = 10;
+      updater.setTextNodeValue(first.firstChild as Text, "abcd");
+      expect(recorder.makePatch()).to.be.undefined;
+      // An acknowledgment made before the limit was exceeded does not help.
+      recorder.acknowledge(0);
+      expect(recorder.makePatch()).to.be.undefined;
+      recorder.acknowledge(recorder.mark());
+      expect(recorder.makePatch()).to.deep.equal({ ops: [], mark: 2 });
+    });
+  });
+
+  describe("delta autosaves", () => {
+    let doc: Document;
+    let updater: TreeUpdater;
+    let saver: Saver;
+
+    function respond(messages: {}[]): void {
+      server.respondWith("POST", "/moo",
+                         [200, { "Content-Type": "application/json",
+                                 ETag: "\"def\"" },
+                          JSON.stringify({ messages })]);
+    }
+
+    function autosave(): Promise<void> {
+      // We use any here to cheat a bit.
+      // tslint:disable-next-line:no-any
+      return (saver as any)._save(true);
+    }
+
+    beforeEach(async () => {
+      doc = new DOMParser().parseFromString("<doc><p>abc</p></doc>",
+                                            "text/xml");
+      new DLocRoot(doc);
+      updater = new TreeUpdater(doc);
+      saver = new Saver(rt, "0.30.0", updater, doc, {
+        url: "/moo",
+        initial_etag: "abc",
+        delta: true,
+      });
+      respond([]);
+      await saver.init();
+      updater.setTextNodeValue(doc.firstChild!.firstChild!.firstChild as Text,
+                               "abcd");
+    });
+
+    it("send a patch", async () => {
+      respond([{ type: "save_successful" }]);
+      await autosave();
+      expect(server).to.have.property("requests").have.lengthOf(2);
+      expect(server).to.have.nested.property("requests[1].requestBody")
+        .equal($.param({
+          command: "patch",
+          version: "0.30.0",
+          base: "\"abc\"",
+          patch: JSON.stringify([{ op: "text", path: [0, 0, 0],
+                                   value: "abcd" }]),
+        }));
+    });
+
+    it("send the whole document if the patch is rejected", async () => {
+      respond([{ type: "save_patch_rejected" }]);
+      await autosave();
+      expect(server).to.have.property("requests").have.lengthOf(3);
+      expect(server).to.have.nested.property("requests[2].requestBody")
+        .equal($.param({
+          command: "autosave",
+          version: "0.30.0",
+          data: "<doc><p>abcd</p></doc>",
+        }));
+    });
+
+    it("do not apply to manual saves", async () => {
+      respond([{ type: "save_successful" }]);
+      await saver.save();
+      expect(server).to.have.property("requests").have.lengthOf(2);
+      expect(server).to.have.nested.property("requests[1].requestBody")
+        .equal($.param({
+          command: "save",
+          version: "0.30.0",
+          data: "<doc><p>abcd</p></doc>",
+        }));
+    });
+  });
+
+  describe("compression", () => {
+    let doc: Document;
+    let saver: Saver;
+    let text: string;
+
+    function respond(messages: {}[]): void {
+      server.respondWith("POST", "/moo",
+                         [200, { "Content-Type": "application/json" },
+                          JSON.stringify({ messages })]);
+    }
+
+    beforeEach(() => {
+      text = new Array(1000).join("blah ");
+      doc = new DOMParser().parseFromString(`<doc><p>${text}</p></doc>`,
+                                            "text/xml");
+      new DLocRoot(doc);
+      saver = new Saver(rt, "0.30.0", new TreeUpdater(doc), doc, {
+        url: "/moo",
+      });
+    });
+
+    it("is not used if the server does not support it", async () => {
+      respond([]);
+      await saver.init();
+      respond([{ type: "save_successful" }]);
+      await saver.save();
+      expect(server).to.have.nested.property("requests[1].requestBody")
+        .equal($.param({
+          command: "save",
+          version: "0.30.0",
+          data: `<doc><p>${text}</p></doc>`,
+        }));
+    });
+
+    it("is used if the server supports it", async function () {
+      // tslint:disable-next-line:no-any
+      const w = window as any;
+      if (w.CompressionStream === undefined) {
+        this.skip();
+      }
+
+      respond([{ type: "capabilities", encodings: ["deflate"] }]);
+      await saver.init();
+      respond([{ type: "save_successful" }]);
+      await saver.save();
+      const params =
+        new URLSearchParams(server.requests[1].requestBody as string);
+      expect(params.get("command")).to.equal("save");
+      expect(params.get("encoding")).to.equal("deflate");
+      const compressed = atob(params.get("data")!);
+      const bytes = new Uint8Array(compressed.length);
+      for (let i = 0; i < compressed.length; ++i) {
+        bytes[i] = compressed.charCodeAt(i);
+      }
+      const decompressed = await new w.Response(
+        new w.Response(bytes).body
+          .pipeThrough(new w.DecompressionStream("deflate"))).text();
+      expect(decompressed).to.equal(`<doc><p>${text}</p></doc>`);
+    });
+  });
 });
@@ -0,0 +1,114 @@
+// tslint:disable-next-line:missing-jsdoc
+import "chai";
+
+const expect = chai.expect;
+
+import { DLocRoot } from "wed/dloc";
+import { Runtime } from "wed/runtime";
+import { Saver, Store } from "wed/savers/indexeddb";
+import { KeyValueStore, SnapshotStore } from "wed/savers/snapshots";
+import { TreeUpdater } from "wed/tree-updater";
+
+class MemoryStore implements Store, KeyValueStore {
+  readonly items: Record<string, {}> = Object.create(null);
+
+  put(name: string, data: string): Promise<void> {
+    this.items[name] = data;
+    return Promise.resolve();
+  }
+
+  getItem<T>(key: string): Promise<T | null> {
+    const value = this.items[key];
+    return Promise.resolve(value === undefined ? null : value as T);
+  }
+
+  setItem<T>(key: string, value: T): Promise<T> {
+    this.items[key] = value;
+    return Promise.resolve(value);
+  }
+
+  removeItem(key: string): Promise<void> {
+    delete this.items[key];
+    return Promise.resolve();
+  }
+}
+
+describe("indexeddb", () => {
+  let rt: Runtime;
+  let doc: Document;
+  let updater: TreeUpdater;
+  let files: MemoryStore;
+  let snapshotStore: MemoryStore;
+  let saver: Saver;
+
+  before(() => {
+    // We use any here to cheat a bit.
+    // tslint:disable-next-line:no-any
+    rt = new Runtime({} as any);
+  });
+
+  beforeEach(async () => {
+    doc = new DOMParser().parseFromString("<doc><p>abc</p></doc>",
+                                          "text/xml");
+    new DLocRoot(doc);
+    updater = new TreeUpdater(doc);
+    files = new MemoryStore();
+    snapshotStore = new MemoryStore();
+    saver = new Saver(rt, "0.30.0", updater, doc, {
+      name: "foo",
+      getStore: () => files,
+      snapshots: { keep: 5 },
+      getSnapshotStore: () => snapshotStore,
+    });
+    await saver.init();
+  });
+
+  function autosave(): Promise<void> {
+    // We use any here to cheat a bit.
+    // tslint:disable-next-line:no-any
+    return (saver as any)._save(true);
+  }
+
+  function modify(value: string): void {
+    updater.setTextNodeValue(doc.firstChild!.firstChild!.firstChild as Text,
+                             value);
+  }
+
+  describe("with snapshots", () => {
+    it("writes the file and a snapshot on manual saves", async () => {
+      modify("abcd");
+      await saver.save();
+      expect(files.items).to.have.property("foo")
+        .equal("<doc><p>abcd</p></doc>");
+      expect(await new SnapshotStore(snapshotStore).load("foo"))
+        .to.equal("<doc><p>abcd</p></doc>");
+    });
+
+    it("writes the file and a snapshot on autosaves", async () => {
+      modify("abcd");
+      await saver.save();
+      modify("abcde");
+      await autosave();
+      // The file holds the autosaved data, so that loading the file does not
+      // lose what was autosaved.
+      expect(files.items).to.have.property("foo")
+        .equal("<doc><p>abcde</p></doc>");
+      const snapshots = new SnapshotStore(snapshotStore);
+      const infos = await snapshots.list("foo");
+      expect(infos.map((x) => x.autosave)).to.deep.equal([false, true]);
+      expect(await snapshots.load("foo", infos[0].seq))
+        .to.equal("<doc><p>abcd</p></doc>");
+      expect(await snapshots.load("foo"))
+        .to.equal("<doc><p>abcde</p></doc>");
+    });
+
+    it("saves even if the snapshot cannot be made", async () => {
+      snapshotStore.setItem = () => Promise.reject(new Error("full"));
+      modify("abcd");
+      await saver.save();
+      expect(files.items).to.have.property("foo")
+        .equal("<doc><p>abcd</p></doc>");
+      expect(saver.getModifiedWhen()).to.be.false;
+    });
+  });
+});
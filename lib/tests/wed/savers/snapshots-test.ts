@@ -0,0 +1,135 @@
+// tslint:disable-next-line:missing-jsdoc
+import "chai";
+
+const expect = chai.expect;
+
+import { chunk, hashChunk, KeyValueStore,
+         SnapshotStore } from "wed/savers/snapshots";
+
+class MemoryStore implements KeyValueStore {
+  readonly items: Record<string, {}> = Object.create(null);
+
+  writes: string[] = [];
+
+  getItem<T>(key: string): Promise<T | null> {
+    const value = this.items[key];
+    return Promise.resolve(value === undefined ? null : value as T);
+  }
+
+  setItem<T>(key: string, value: T): Promise<T> {
+    this.writes.push(key);
+    this.items[key] = value;
+    return Promise.resolve(value);
+  }
+
+  removeItem(key: string): Promise<void> {
+    delete this.items[key];
+    return Promise.resolve();
+  }
+
+  keys(prefix: string): string[] {
+    return Object.keys(this.items)
+      .filter((x) => x.lastIndexOf(prefix, 0) === 0);
+  }
+}
+
+function makeDocument(paragraphs: number, seed: number = 1): string {
+  const parts = ["<doc>"];
+  let x = seed;
+  for (let i = 0; i < paragraphs; ++i) {
+    x = (x * 1103515245 + 12345) & 0x7FFFFFFF;
+    parts.push(`<p n="${i}">Paragraph ${x.toString(36)} of the document.</p>`);
+  }
+  parts.push("</doc>");
+  return parts.join("");
+}
+
+describe("snapshots", () => {
+  describe("chunk", () => {
+    it("cuts a document into chunks that make up the document", () => {
+      const doc = makeDocument(5000);
+      const chunks = chunk(doc);
+      expect(chunks).to.have.length.above(1);
+      expect(chunks.join("")).to.equal(doc);
+    });
+
+    it("cuts the same way around a change", () => {
+      const doc = makeDocument(5000);
+      const half = doc.length >> 1;
+      const changed = `${doc.slice(0, half)}blah${doc.slice(half)}`;
+      const before = chunk(doc);
+      const after = chunk(changed);
+      const common = after.filter((x) => before.indexOf(x) !== -1);
+      expect(common).to.have.length.at.least(after.length - 2);
+    });
+  });
+
+  describe("hashChunk", () => {
+    it("distinguishes chunks", () => {
+      expect(hashChunk("abc")).to.not.equal(hashChunk("abd"));
+      expect(hashChunk("abc")).to.equal(hashChunk("abc"));
+    });
+  });
+
+  describe("SnapshotStore", () => {
+    let store: MemoryStore;
+    let snapshots: SnapshotStore;
+
+    beforeEach(() => {
+      store = new MemoryStore();
+      snapshots = new SnapshotStore(store, { keep: 2 });
+    });
+
+    it("loads what was saved", async () => {
+      const doc = makeDocument(5000);
+      await snapshots.save("foo", doc, false);
+      expect(await snapshots.load("foo")).to.equal(doc);
+      // A new store on the same data can load it too.
+      expect(await new SnapshotStore(store).load("foo")).to.equal(doc);
+    });
+
+    it("loads nothing if there is no snapshot", async () => {
+      expect(await snapshots.load("foo")).to.be.undefined;
+    });
+
+    it("writes only the chunks that changed", async () => {
+      const doc = makeDocument(5000);
+      await snapshots.save("foo", doc, false);
+      store.writes = [];
+      const half = doc.length >> 1;
+      await snapshots.save("foo", `${doc.slice(0, half)}blah${doc.slice(half)}`,
+                           true);
+      const chunkWrites =
+        store.writes.filter((x) => x.lastIndexOf("foo/chunk/", 0) === 0);
+      expect(chunkWrites).to.have.length.within(1, 2);
+    });
+
+    it("keeps the number of snapshots requested", async () => {
+      const docs = [makeDocument(3000, 1), makeDocument(3000, 2),
+                    makeDocument(3000, 3)];
+      for (const doc of docs) {
+        await snapshots.save("foo", doc, true);
+      }
+
+      const infos = await snapshots.list("foo");
+      expect(infos.map((x) => x.seq)).to.deep.equal([1, 2]);
+      expect(await snapshots.load("foo", 0)).to.be.undefined;
+      expect(await snapshots.load("foo", 1)).to.equal(docs[1]);
+      expect(await snapshots.load("foo", 2)).to.equal(docs[2]);
+      expect(store.keys("foo/manifest/")).to.have.lengthOf(2);
+
+      // The chunks of the deleted snapshot are gone.
+      const expected = chunk(docs[1]).concat(chunk(docs[2]))
+        .map((x) => `foo/chunk/${hashChunk(x)}`).sort()
+        .filter((x, ix, arr) => ix === 0 || arr[ix - 1] !== x);
+      expect(store.keys("foo/chunk/").sort()).to.deep.equal(expected);
+    });
+
+    it("keeps the documents apart", async () => {
+      await snapshots.save("foo", "foo", true);
+      await snapshots.save("bar", "bar", true);
+      expect(await snapshots.load("foo")).to.equal("foo");
+      expect(await snapshots.load("bar")).to.equal("bar");
+    });
+  });
+});
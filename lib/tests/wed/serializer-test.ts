@@ -0,0 +1,97 @@
+/**
+ * @author Louis-Dominique Dubeau
+ * @license MPL 2.0
+ * @copyright Mangalam Research Center for Buddhist Languages
+ */
+"use strict";
+
+import { DLocRoot } from "wed/dloc";
+import { IncrementalSerializer, serialize } from "wed/serializer";
+import { TreeUpdater } from "wed/tree-updater";
+
+const assert = chai.assert;
+
+describe("serializer", () => {
+  describe("serialize", () => {
+    it("serializes elements, attributes and text", () => {
+      const doc = new DOMParser().parseFromString(
+        "<doc a=\"&quot;&amp;\"><p>a &lt; b</p><q/></doc>", "text/xml");
+      assert.equal(serialize(doc),
+                   "<doc a=\"&quot;&amp;\"><p>a &lt; b</p><q/></doc>");
+    });
+  });
+
+  describe("IncrementalSerializer", () => {
+    let doc: Document;
+    let root: Element;
+    let updater: TreeUpdater;
+    let serializer: IncrementalSerializer;
+
+    beforeEach(() => {
+      doc = new DOMParser().parseFromString(
+        "<doc><div><p>abc</p><p>def</p></div><div><p>ghi</p></div></doc>",
+        "text/xml");
+      new DLocRoot(doc);
+      root = doc.documentElement;
+      updater = new TreeUpdater(doc);
+      serializer = new IncrementalSerializer(updater);
+    });
+
+    function check(): void {
+      assert.equal(serializer.serialize(root), serialize(root));
+    }
+
+    it("produces the same output as serialize", () => {
+      check();
+      // The second time around, the output comes from the cache.
+      check();
+    });
+
+    it("uses the serializations it has cached", () => {
+      check();
+      // We cheat and modify the tree without going through the updater. The
+      // serializer does not see the change.
+      root.firstChild!.firstChild!.firstChild!.textContent = "changed";
+      assert.notInclude(serializer.serialize(root), "changed");
+    });
+
+    it("sees text changes", () => {
+      check();
+      updater.setTextNodeValue(
+        root.firstChild!.firstChild!.firstChild as Text, "abcd");
+      check();
+    });
+
+    it("sees attribute changes", () => {
+      check();
+      updater.setAttribute(root.lastChild!.firstChild as Element, "n", "1");
+      check();
+    });
+
+    it("sees insertions and deletions", () => {
+      check();
+      updater.insertNodeAt(root.lastChild!, 0, doc.createElement("q"));
+      check();
+      updater.removeNode(root.firstChild!.firstChild);
+      check();
+    });
+
+    it("sees moves", () => {
+      check();
+      updater.insertNodeAt(root.lastChild!, 0,
+                           root.firstChild!.firstChild!);
+      check();
+    });
+
+    it("sees changes made to nodes while outside the tree", () => {
+      check();
+      const div = root.firstChild as Element;
+      updater.removeNode(div);
+      div.firstChild!.firstChild!.textContent = "changed";
+      updater.insertNodeAt(root, 0, div);
+      check();
+    });
+  });
+});
+
+//  LocalWords:  MPL updater
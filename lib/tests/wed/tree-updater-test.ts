@@ -141,6 +141,56 @@ describe("TreeUpdater", () => {
     });
   });
 
+  describe("with an indexed root", () => {
+    let indexedRoot: HTMLElement;
+    let itu: TreeUpdater;
+
+    beforeEach(() => {
+      indexedRoot = document.createElement("div");
+      indexedRoot.appendChild(htmlTree.cloneNode(true));
+      new DLocRoot(indexedRoot, true);
+      itu = new TreeUpdater(indexedRoot);
+    });
+
+    it("keeps paths current when inserting nodes", () => {
+      const p = indexedRoot.querySelectorAll(".body>.p")[1];
+      const last = p.lastChild!;
+      const path = itu.nodeToArrayPath(last);
+      itu.insertNodeAt(p, 0, document.createElement("span"));
+      const newPath = itu.nodeToArrayPath(last);
+      assert.equal(newPath[newPath.length - 1],
+                   (path[path.length - 1] as number) + 1);
+      assert.equal(itu.arrayPathToNode(newPath), last);
+    });
+
+    it("keeps paths current when deleting nodes", () => {
+      const p = indexedRoot.querySelectorAll(".body>.p")[1];
+      const last = p.lastChild!;
+      const path = itu.nodeToArrayPath(last);
+      itu.deleteNode(p.firstChild!);
+      const newPath = itu.nodeToArrayPath(last);
+      assert.equal(newPath[newPath.length - 1],
+                   (path[path.length - 1] as number) - 1);
+      assert.equal(itu.arrayPathToNode(newPath), last);
+    });
+
+    it("keeps paths current when moving nodes", () => {
+      const ps = indexedRoot.querySelectorAll(".body>.p");
+      const first = ps[1];
+      const second = ps[2];
+      const moved = first.lastChild!;
+      const stays = first.firstChild!;
+      // Fill the index for both parents.
+      itu.nodeToArrayPath(stays);
+      itu.nodeToArrayPath(second.firstChild!);
+      itu.insertNodeAt(second, 0, moved);
+      assert.equal(itu.arrayPathToNode(itu.nodeToArrayPath(moved)), moved);
+      assert.equal(itu.arrayPathToNode(itu.nodeToArrayPath(stays)), stays);
+      assert.equal(itu.nodeToPath(second.childNodes[1]),
+                   `${itu.nodeToPath(second)}/1`);
+    });
+  });
+
   describe("splitAt", () => {
     it("fails on node which is not child of the top", () => {
       const top = root.querySelector(".p");
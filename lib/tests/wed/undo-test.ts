@@ -32,6 +32,23 @@ class MyUndo extends Undo {
 // tslint:disable-next-line:completed-docs
 class MyGroup extends UndoGroup {}
 
+// tslint:disable-next-line:completed-docs
+class SizedUndo extends MyUndo {
+  compacted: boolean = false;
+
+  constructor(name: string, object: any, public size: number) {
+    super(name, object);
+  }
+
+  getSize(): number {
+    return this.compacted ? 1 : this.size;
+  }
+
+  compact(): void {
+    this.compacted = true;
+  }
+}
+
 // tslint:disable-next-line:completed-docs
 class Tracker {
   private flags: boolean[] = [];
@@ -696,6 +713,78 @@ describe("UndoList", () => {
       });
     });
   });
+
+  describe("with a budget", () => {
+    beforeEach(() => {
+      ul = new UndoList({ budget: 250 });
+    });
+
+    it("forgets the oldest operations", () => {
+      const undos = [1, 2, 3, 4].map(
+        (x) => new SizedUndo(`undo${x}`, obj, 100));
+      for (const undo of undos) {
+        ul.record(undo);
+      }
+
+      const list = (ul as any).list;
+      assert.equal(list.length, 2);
+      assert.strictEqual(list[0].undo, undos[2]);
+      assert.strictEqual(list[1].undo, undos[3]);
+      ul.undo();
+      ul.undo();
+      assert.isFalse(ul.canUndo());
+      assert.isFalse(obj.undo3);
+      assert.isTrue(obj.undo2);
+    });
+
+    it("keeps the latest operation", () => {
+      const undo1 = new SizedUndo("undo1", obj, 1000);
+      ul.record(undo1);
+      assert.strictEqual((ul as any).list[0].undo, undo1);
+    });
+
+    it("does not forget operations that may be redone", () => {
+      const undo1 = new SizedUndo("undo1", obj, 100);
+      ul.record(undo1);
+      const undo2 = new SizedUndo("undo2", obj, 100);
+      ul.record(undo2);
+      // Undoing makes the operation grow over the budget.
+      undo2.size = 300;
+      ul.undo();
+      assert.equal((ul as any).list.length, 2);
+      ul.redo();
+      assert.isTrue(obj.undo2);
+    });
+  });
+
+  describe("with compactAfter", () => {
+    beforeEach(() => {
+      ul = new UndoList({ compactAfter: 2 });
+    });
+
+    it("compacts the old operations", () => {
+      const undos = [1, 2, 3, 4].map(
+        (x) => new SizedUndo(`undo${x}`, obj, 100));
+      for (const undo of undos) {
+        ul.record(undo);
+      }
+
+      assert.deepEqual(undos.map((x) => x.compacted),
+                       [true, true, false, false]);
+      assert.equal((ul as any).total, 202);
+    });
+
+    it("compacts groups", () => {
+      const group = new MyGroup("group1");
+      ul.startGroup(group);
+      const undo1 = new SizedUndo("undo1", obj, 100);
+      ul.record(undo1);
+      ul.endGroup();
+      ul.record(new SizedUndo("undo2", obj, 100));
+      ul.record(new SizedUndo("undo3", obj, 100));
+      assert.isTrue(undo1.compacted);
+    });
+  });
 });
 
 //  LocalWords:  UndoList canUndo canRedo endGroup endAllGroups chai getGroup
@@ -86,6 +86,54 @@ describe("validator", () => {
     });
   });
 
+  describe("deferResets", () => {
+    let p: validator.Validator;
+    let tree: Document;
+    let resets: number;
+
+    beforeEach(() => {
+      tree = genericTree.cloneNode(true) as Document;
+      p = new validator.Validator(grammar, tree, []);
+      resets = 0;
+      p.events.addEventListener("reset-errors", () => {
+        resets++;
+      });
+    });
+
+    it("causes resets to be performed only once flushed", () => {
+      const body = tree.getElementsByTagName("body")[0];
+      p.deferResets();
+      p.deferResets();
+      p.resetTo(body);
+      p.resetTo(body.parentNode!);
+      p.flushResets();
+      assert.equal(resets, 0);
+      p.flushResets();
+      assert.equal(resets, 1);
+    });
+
+    it("does not cause a reset if none was requested", () => {
+      p.deferResets();
+      p.flushResets();
+      assert.equal(resets, 0);
+    });
+
+    it("performs the pending reset before possibleAt", () => {
+      p.deferResets();
+      p.resetTo(tree.getElementsByTagName("body")[0]);
+      p.possibleAt(tree, 0);
+      assert.equal(resets, 1);
+      p.flushResets();
+      assert.equal(resets, 1);
+    });
+
+    it("throws on underflow", () => {
+      assert.throws(() => {
+        p.flushResets();
+      }, Error, "flushResets underflow");
+    });
+  });
+
   describe("with a mode validator", () => {
     let p: validator.Validator;
     let tree: Document;
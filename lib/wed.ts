@@ -18,6 +18,7 @@ import * as objectCheck from "./wed/object-check";
 import { Options } from "./wed/options";
 import { Runtime } from "./wed/runtime";
 import * as saver from "./wed/saver";
+import * as serializer from "./wed/serializer";
 import * as transformation from "./wed/transformation";
 import * as treeUpdater from "./wed/tree-updater";
 import * as util from "./wed/util";
@@ -39,6 +40,7 @@ export {
   // it should support it. The embedded savers are already written with this
   // eventuality in mind, and so we need to export this.
   saver,
+  serializer,
   transformation,
   treeUpdater,
   util,
@@ -49,6 +51,26 @@ export function makeEditor(widget: HTMLElement,
   return new Editor(widget, options);
 }
 
+/**
+ * Replace an editor with a new editor created in the same widget. The old
+ * editor is destroyed. This is meant for applications that edit a succession
+ * of documents in the same page: the modules, modes and grammars that the old
+ * editor loaded are reused by the new editor, which makes this much faster than
+ * reloading the page.
+ *
+ * @param editor The editor to replace.
+ *
+ * @param options The options of the new editor.
+ *
+ * @returns The new editor. It must be initialized with ``init``.
+ */
+export function replaceEditor(editor: EditorInstance,
+                              options: Options | Runtime): EditorInstance {
+  const widget = editor.widget;
+  editor.destroy();
+  return makeEditor(widget, options);
+}
+
 export { Action } from "./wed/action";
 export { Decorator } from "./wed/decorator";
 export { DLoc, DLocRoot } from "./wed/dloc";
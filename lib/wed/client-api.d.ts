@@ -14,6 +14,9 @@ export interface EditorInstance {
   /** A name for this editor. */
   readonly name: string;
 
+  /** The element in which the editor was created. */
+  readonly widget: HTMLElement;
+
   /** A promise that resolves once the first validation is complete. */
   readonly firstValidationComplete: Promise<EditorInstance>;
 
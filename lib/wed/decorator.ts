@@ -45,6 +45,12 @@ export abstract class Decorator implements DecoratorAPI {
   protected readonly domlistener: DOMListener;
   protected readonly guiUpdater: GUIUpdater;
 
+  /**
+   * Records, for each element decorated by [[elementDecorator]], a
+   * description of the labels that were created for it.
+   */
+  private readonly decoratedLabels: WeakMap<Element, string> = new WeakMap();
+
   /**
    * @param domlistener The listener that the decorator must use to know when
    * the DOM tree has changed and must be redecorated.
@@ -172,15 +178,8 @@ export abstract class Decorator implements DecoratorAPI {
 
     const origName = util.getOriginalName(el);
     // _[name]_label is used locally to make the function idempotent.
-    let cls = `_${origName}_label`;
-
-    // We must grab a list of nodes to remove before we start removing them
-    // because an element that has a placeholder in it is going to lose the
-    // placeholder while we are modifying it. This could throw off the scan.
-    const toRemove = domutil.childrenByClass(el, cls);
-    for (const remove of toRemove) {
-      el.removeChild(remove);
-    }
+    const labelCls = `_${origName}_label`;
+    let cls = labelCls;
 
     let attributesHTML = "";
     let hiddenAttributes = false;
@@ -215,6 +214,31 @@ ${domutil.textToHTML(attributes[name])}</span>"</span>`;
     if (hiddenAttributes) {
       cls += " _autohidden_attributes";
     }
+
+    // If the labels we created the last time we decorated this element are
+    // still in place and would be created identically, there is nothing to
+    // do. This is the usual case when the element is redecorated because its
+    // contents changed.
+    const labels = `${cls}\n${attributesHTML}`;
+    const first = el.firstElementChild;
+    const last = el.lastElementChild;
+    if (this.decoratedLabels.get(el) === labels &&
+        first !== null && first === el.firstChild &&
+        first.classList.contains("__start_label") &&
+        first.classList.contains(labelCls) &&
+        last !== null && last === el.lastChild &&
+        last.classList.contains("__end_label") &&
+        last.classList.contains(labelCls)) {
+      return;
+    }
+
+    // We must grab a list of nodes to remove before we start removing them
+    // because an element that has a placeholder in it is going to lose the
+    // placeholder while we are modifying it. This could throw off the scan.
+    const toRemove = domutil.childrenByClass(el, labelCls);
+    for (const remove of toRemove) {
+      el.removeChild(remove);
+    }
     const pre = doc.createElement("span");
     pre.className = `_gui _phantom __start_label _start_wrapper ${cls} _label`;
     const prePh = doc.createElement("span");
@@ -243,6 +267,8 @@ ${domutil.textToHTML(attributes[name])}</span>"</span>`;
     $(post).on("wed-context-menu",
                postContextHandler !== undefined ? postContextHandler : false);
 
+    this.decoratedLabels.set(el, labels);
+
     if (dataCaret != null) {
       tryToSetDataCaret(this.editor, dataCaret);
     }
@@ -11,20 +11,193 @@ import { Caret, comparePositions, contains, indexOf, rangeFromPoints,
 
 export type ValidRoots = Document | Element;
 
+/**
+ * A path in array form. Each number in the array is the offset of a node among
+ * those children of its parent which are elements or text nodes. When the path
+ * points to an attribute, the last item of the array is the name of the
+ * attribute.
+ *
+ * Paths in this form represent the same information as the string paths
+ * produced by [[DLocRoot.nodeToPath]] but they do not need to be parsed.
+ */
+export type ArrayPath = (number | string)[];
+
+/**
+ * Convert a path in string form to a path in array form.
+ *
+ * @param path The path to convert.
+ *
+ * @returns The converted path.
+ *
+ * @throws {Error} If given a malformed ``path``.
+ */
+export function pathToArrayPath(path: string): ArrayPath {
+  if (path === "") {
+    return [];
+  }
+
+  const parts = path.split(/\//);
+  const ret: ArrayPath = [];
+
+  let attribute;
+  // Set aside the last part if it is an attribute.
+  if (parts[parts.length - 1][0] === "@") {
+    attribute = parts.pop()!.slice(1);
+  }
+
+  for (const part of parts) {
+    if (!/^(\d+)$/.test(part)) {
+      throw new Error("malformed path expression");
+    }
+    ret.push(parseInt(part));
+  }
+
+  if (attribute !== undefined) {
+    ret.push(attribute);
+  }
+
+  return ret;
+}
+
+/**
+ * Convert a path in array form to a path in string form.
+ *
+ * @param path The path to convert.
+ *
+ * @returns The converted path.
+ */
+export function arrayPathToPath(path: ArrayPath): string {
+  return path.map((part) => typeof part === "string" ? `@${part}` : part)
+    .join("/");
+}
+
+/**
+ * Determine whether a node counts when computing the offsets used in paths.
+ */
+function isPathNode(node: Node): boolean {
+  const t = node.nodeType;
+  return t === Node.TEXT_NODE || t === Node.ELEMENT_NODE;
+}
+
+/**
+ * An index of the offsets that nodes have among those siblings which count in
+ * paths. The index is filled lazily, one parent at a time, and must be told
+ * when the children of a parent change.
+ */
+export class PositionIndex {
+  /** Maps a parent to its children that count in paths. */
+  private readonly children: WeakMap<Node, Node[]> = new WeakMap();
+
+  /**
+   * Maps a node to its offset in its parent. The offsets are valid only so
+   * long as the parent has an entry in [[children]].
+   */
+  private readonly offsets: WeakMap<Node, number> = new WeakMap();
+
+  /**
+   * Get the children of a node which count in paths.
+   *
+   * @param parent The node whose children we want.
+   *
+   * @returns The children.
+   */
+  private getChildren(parent: Node): Node[] {
+    let children = this.children.get(parent);
+    if (children === undefined) {
+      children = [];
+      let child = parent.firstChild;
+      while (child !== null) {
+        if (isPathNode(child)) {
+          this.offsets.set(child, children.length);
+          children.push(child);
+        }
+        child = child.nextSibling;
+      }
+      this.children.set(parent, children);
+    }
+
+    return children;
+  }
+
+  /**
+   * Get the offset of a node in its parent.
+   *
+   * @param node The node whose offset we want. It must have a parent.
+   *
+   * @returns The offset.
+   */
+  offsetOf(node: Node): number {
+    this.getChildren(node.parentNode!);
+    return this.offsets.get(node)!;
+  }
+
+  /**
+   * Get the child of a node at a specific offset.
+   *
+   * @param parent The parent of the child.
+   *
+   * @param offset The offset of the child.
+   *
+   * @returns The child, or ``null`` if there is no such child.
+   */
+  childAt(parent: Node, offset: number): Node | null {
+    const children = this.getChildren(parent);
+    return offset < children.length ? children[offset] : null;
+  }
+
+  /**
+   * Inform the index that the children of a node have changed.
+   *
+   * @param parent The node whose children have changed.
+   */
+  childrenChanged(parent: Node): void {
+    this.children.delete(parent);
+  }
+
+  /**
+   * Inform the index that a node is entering the tree. Nodes outside the tree
+   * may be modified without the index being told, so we forget whatever we
+   * know about the node and its descendants.
+   *
+   * @param node The node entering the tree.
+   */
+  entering(node: Node): void {
+    this.children.delete(node);
+    if (isElement(node)) {
+      const descendants = node.getElementsByTagName("*");
+      for (let i = 0; i < descendants.length; ++i) {
+        this.children.delete(descendants[i]);
+      }
+    }
+  }
+}
+
 /**
  * A class for objects that are used to mark DOM nodes as roots for the purpose
  * of using DLoc objects.
  */
 export class DLocRoot {
+  /**
+   * The index used to speed up the conversions between nodes and paths. It is
+   * ``undefined`` if the root does not use an index.
+   */
+  readonly positionIndex: PositionIndex | undefined;
+
   /**
    * @param el The element to which this object is associated.
+   *
+   * @param indexed Whether to maintain a [[PositionIndex]] to speed up
+   * conversions between nodes and paths. This must be used only if the tree is
+   * modified exclusively through a [["wed/tree-updater".TreeUpdater]], as the
+   * updater is responsible for keeping the index current.
    */
-  constructor(public readonly node: ValidRoots) {
+  constructor(public readonly node: ValidRoots, indexed: boolean = false) {
     if ($.data(node, "wed-dloc-root") != null) {
       throw new Error("node already marked as root");
     }
 
     $.data(node, "wed-dloc-root", this);
+    this.positionIndex = indexed ? new PositionIndex() : undefined;
   }
 
   /**
@@ -36,41 +209,56 @@ export class DLocRoot {
    * @returns The path.
    */
   nodeToPath(node: Node | Attr): string {
+    return arrayPathToPath(this.nodeToArrayPath(node));
+  }
+
+  /**
+   * Converts a node to a path in array form.
+   *
+   * @param node The node for which to construct a path.
+   *
+   * @returns The path.
+   */
+  nodeToArrayPath(node: Node | Attr): ArrayPath {
     if (node == null) {
       throw new Error("invalid node parameter");
     }
 
     const root = this.node;
     if (root === node) {
-      return "";
+      return [];
     }
 
     if (!contains(root, node)) {
       throw new Error("node is not a descendant of root");
     }
 
-    const ret = [];
+    const index = this.positionIndex;
+    const ret: ArrayPath = [];
     while (node !== root) {
       let parent;
       if (isAttr(node)) {
         parent = node.ownerElement;
-        ret.unshift(`@${node.name}`);
+        ret.push(node.name);
       }
       else {
-        let offset = 0;
-
         parent = node.parentNode;
 
-        let offsetNode = node.previousSibling;
-        while (offsetNode !== null) {
-          const t = offsetNode.nodeType;
-          if ((t === Node.TEXT_NODE) || (t === Node.ELEMENT_NODE)) {
-            offset++;
+        let offset = 0;
+        if (index !== undefined) {
+          offset = index.offsetOf(node);
+        }
+        else {
+          let offsetNode = node.previousSibling;
+          while (offsetNode !== null) {
+            if (isPathNode(offsetNode)) {
+              offset++;
+            }
+            offsetNode = offsetNode.previousSibling;
           }
-          offsetNode = offsetNode.previousSibling;
         }
 
-        ret.unshift(String(offset));
+        ret.push(offset);
       }
 
       // We checked whether the node is contained by root so we should never run
@@ -78,7 +266,7 @@ export class DLocRoot {
       node = parent!;
     }
 
-    return ret.join("/");
+    return ret.reverse();
   }
 
   /**
@@ -93,49 +281,60 @@ export class DLocRoot {
    * @throws {Error} If given a malformed ``path``.
    */
   pathToNode(path: string): Node | Attr | null {
-    const root = this.node;
-
-    if (path === "") {
-      return root;
-    }
+    return this.arrayPathToNode(pathToArrayPath(path));
+  }
 
-    const parts = path.split(/\//);
-    let parent: Node = root;
+  /**
+   * This function recovers a DOM node on the basis of a path previously created
+   * by [[nodeToArrayPath]].
+   *
+   * @param path The path to interpret.
+   *
+   * @returns The node corresponding to the path, or ``null`` if no such node
+   * exists.
+   *
+   * @throws {Error} If given a malformed ``path``.
+   */
+  arrayPathToNode(path: ArrayPath): Node | Attr | null {
+    const index = this.positionIndex;
+    let parent: Node = this.node;
 
-    let attribute;
+    let last = path.length;
+    const attribute = path[last - 1];
     // Set aside the last part if it is an attribute.
-    if (parts[parts.length - 1][0] === "@") {
-      attribute = parts.pop();
+    if (typeof attribute === "string") {
+      last--;
     }
 
-    for (const part of parts) {
-      if (/^(\d+)$/.test(part)) {
-        let index = parseInt(part);
-        let found = null;
+    for (let i = 0; i < last; ++i) {
+      let offset = path[i];
+      if (typeof offset !== "number") {
+        throw new Error("malformed path expression");
+      }
+
+      let found = null;
+      if (index !== undefined) {
+        found = index.childAt(parent, offset);
+      }
+      else {
         let node = parent.firstChild;
         while (node !== null && found === null) {
-          const t = node.nodeType;
-
-          if ((t === Node.TEXT_NODE || (t === Node.ELEMENT_NODE)) &&
-              --index < 0) {
+          if (isPathNode(node) && --offset < 0) {
             found = node;
           }
 
           node = node.nextSibling;
         }
-
-        if (found === null) {
-          return null;
-        }
-
-        parent = found;
       }
-      else {
-        throw new Error("malformed path expression");
+
+      if (found === null) {
+        return null;
       }
+
+      parent = found;
     }
 
-    if (attribute === undefined) {
+    if (typeof attribute !== "string") {
       return parent;
     }
 
@@ -144,7 +343,7 @@ export class DLocRoot {
 attribute`);
     }
 
-    return parent.getAttributeNode(attribute.slice(1));
+    return parent.getAttributeNode(attribute);
   }
 }
 
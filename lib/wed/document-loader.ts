@@ -0,0 +1,139 @@
+/**
+ * Load a document into the editor in chunks.
+ * @author Louis-Dominique Dubeau
+ * @license MPL 2.0
+ * @copyright Mangalam Research Center for Buddhist Languages
+ */
+
+import { BehaviorSubject, Observable } from "rxjs";
+
+import { isElement } from "./domtypeguards";
+import { Task } from "./task-runner";
+import { TreeUpdater } from "./tree-updater";
+
+/**
+ * Records the children that remain to be inserted into an element.
+ */
+interface Frame {
+  /** The element into which the children must be inserted. */
+  parent: Node;
+
+  /** The children to insert. */
+  children: Node[];
+
+  /** The index in ``children`` of the next child to insert. */
+  index: number;
+}
+
+/**
+ * A task that inserts a document into a data tree a bit at a time. Every
+ * insertion goes through a tree updater, so the GUI tree is converted and
+ * decorated as the document is inserted. Running this task with a
+ * [["wed/task-runner".TaskRunner]] lets the browser show the start of the
+ * document while the rest is being converted.
+ *
+ * The document is inserted in document order. An element which has no more
+ * than ``chunkSize`` descendant elements is inserted as a whole. A larger
+ * element is first inserted without its children, and then its children are
+ * inserted one by one, subject to the same rule.
+ */
+export class DocumentLoader implements Task {
+  private readonly _progress: BehaviorSubject<number> = new BehaviorSubject(0);
+
+  /**
+   * The fraction of the document that has been inserted, from 0 to 1. The
+   * fraction is computed over the number of elements in the document.
+   */
+  readonly progress: Observable<number> = this._progress.asObservable();
+
+  /** The stack of elements into which we are inserting children. */
+  private readonly frames: Frame[] = [];
+
+  /** The number of elements in the document. */
+  private readonly total: number;
+
+  /** The number of elements inserted so far. */
+  private loaded: number = 0;
+
+  private rootInserted: boolean = false;
+
+  /**
+   * @param updater The updater through which to insert the document.
+   *
+   * @param parent The node into which to insert the document.
+   *
+   * @param root The root element of the document. It must not be part of
+   * ``parent`` yet.
+   *
+   * @param chunkSize The maximum number of descendant elements that an element
+   * may have and still be inserted as a whole.
+   */
+  constructor(private readonly updater: TreeUpdater,
+              private readonly parent: Node,
+              private readonly root: Element,
+              private readonly chunkSize: number = 500) {
+    this.total = root.getElementsByTagName("*").length + 1;
+  }
+
+  cycle(): boolean {
+    if (!this.rootInserted) {
+      this.rootInserted = true;
+      this.insert(this.parent, this.root);
+      return true;
+    }
+
+    const frame = this.frames[this.frames.length - 1];
+    if (frame === undefined) {
+      return false;
+    }
+
+    if (frame.index >= frame.children.length) {
+      this.frames.pop();
+      return true;
+    }
+
+    this.insert(frame.parent, frame.children[frame.index++]);
+    return true;
+  }
+
+  /**
+   * A document cannot be loaded twice, so this does nothing.
+   */
+  reset(): void {
+    // Nothing to do.
+  }
+
+  /**
+   * Insert a node at the end of a parent. If the node is too large to be
+   * inserted as a whole, its children are removed and pushed on the stack of
+   * nodes that remain to be inserted.
+   *
+   * @param parent The parent.
+   *
+   * @param node The node to insert.
+   */
+  private insert(parent: Node, node: Node): void {
+    if (isElement(node)) {
+      const size = node.getElementsByTagName("*").length;
+      if (size > this.chunkSize) {
+        const children = Array.from(node.childNodes);
+        for (const child of children) {
+          node.removeChild(child);
+        }
+        this.frames.push({ parent: node, children, index: 0 });
+        this.loaded++;
+      }
+      else {
+        this.loaded += size + 1;
+      }
+    }
+
+    this.updater.insertNodeAt(parent, parent.childNodes.length, node);
+    const progress = this.loaded / this.total;
+    if (progress !== this._progress.value) {
+      this._progress.next(progress);
+    }
+  }
+}
+
+//  LocalWords:  MPL chunkSize
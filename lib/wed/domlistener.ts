@@ -251,6 +251,216 @@ type AddRemEvents = "added-element" | "removed-element" | "removing-element";
 type IncludeExcludeEvents = "included-element" | "excluded-element" |
   "excluding-element";
 
+/**
+ * Matches class names in selectors. Class names may contain escaped
+ * characters, as produced by [["wed/util".escapeCSSClass]].
+ */
+const CLASS_RE = /^\.((?:[-\w]|\\.)+)/;
+
+/**
+ * Parse a selector that is a list of compound selectors made only of classes
+ * or of the universal selector. For instance ``._real, ._phantom_wrap`` or
+ * ``.a.b``.
+ *
+ * @param selector The selector to parse.
+ *
+ * @returns The classes of each compound selector in the list. An empty list of
+ * classes stands for ``*``. If the selector has any other form, the return
+ * value is ``undefined``.
+ */
+function parseClassSelector(selector: string): string[][] | undefined {
+  const ret: string[][] = [];
+  for (let compound of selector.split(",")) {
+    compound = compound.trim();
+    const classes: string[] = [];
+    if (compound === "*") {
+      ret.push(classes);
+      continue;
+    }
+
+    while (compound.length !== 0) {
+      const match = CLASS_RE.exec(compound);
+      if (match === null) {
+        return undefined;
+      }
+      classes.push(match[1].replace(/\\(.)/g, "$1"));
+      compound = compound.slice(match[0].length);
+    }
+
+    // The selector was empty or had an empty element in its list.
+    if (classes.length === 0) {
+      return undefined;
+    }
+
+    ret.push(classes);
+  }
+
+  return ret;
+}
+
+/**
+ * The maximum number of entries we keep in the cache of a [[SelectorIndex]].
+ */
+const MAX_CACHE_SIZE = 1000;
+
+/**
+ * An index of the handlers registered for one event type. It finds which
+ * handlers apply to an element without testing every selector against the
+ * element.
+ *
+ * Selectors that [[parseClassSelector]] can parse are indexed by one of the
+ * classes of each of their compound selectors. Whether they match an element
+ * depends only on the element's classes, so the results for these selectors
+ * are cached by the value of the ``class`` attribute. All other selectors are
+ * tested with ``Element.matches``.
+ */
+class SelectorIndex<H> {
+  /** The handlers, in the order they were added. */
+  private readonly handlers: H[] = [];
+
+  /** The parsed selector of each handler, if it could be parsed. */
+  private readonly parsed: (string[][] | undefined)[] = [];
+
+  /** The selector of each handler. */
+  private readonly selectors: string[] = [];
+
+  /** Maps class names to the handlers that may match elements of this class. */
+  private readonly byClass: Map<string, number[]> = new Map();
+
+  /** Handlers with a selector that matches all elements. */
+  private readonly universal: number[] = [];
+
+  /** Handlers with selectors that must be tested with ``matches``. */
+  private readonly complex: number[] = [];
+
+  /**
+   * Maps values of the ``class`` attribute to the handlers whose parsed
+   * selectors match elements having this value.
+   */
+  private readonly cache: Map<string, number[]> = new Map();
+
+  /**
+   * Add a handler.
+   *
+   * @param selector The selector that determines to which elements the handler
+   * applies.
+   *
+   * @param handler The handler.
+   */
+  add(selector: string, handler: H): void {
+    const index = this.handlers.length;
+    this.handlers.push(handler);
+    this.selectors.push(selector);
+    const parsed = parseClassSelector(selector);
+    this.parsed.push(parsed);
+    this.cache.clear();
+
+    if (parsed === undefined) {
+      this.complex.push(index);
+      return;
+    }
+
+    if (parsed.some((classes) => classes.length === 0)) {
+      this.universal.push(index);
+      return;
+    }
+
+    for (const classes of parsed) {
+      // An element must have all the classes of a compound selector to match
+      // it, so indexing by any one of them is enough.
+      const cls = classes[0];
+      let handlers = this.byClass.get(cls);
+      if (handlers === undefined) {
+        handlers = [];
+        this.byClass.set(cls, handlers);
+      }
+      if (handlers[handlers.length - 1] !== index) {
+        handlers.push(index);
+      }
+    }
+  }
+
+  /**
+   * Get the handler with a given index.
+   *
+   * @param index The index.
+   *
+   * @returns The handler.
+   */
+  getHandler(index: number): H {
+    return this.handlers[index];
+  }
+
+  /**
+   * Find the handlers that apply to an element.
+   *
+   * @param el The element.
+   *
+   * @returns The indexes of the handlers whose selector matches ``el``, in the
+   * order in which the handlers were added.
+   */
+  matching(el: Element): number[] {
+    if (this.handlers.length === 0) {
+      return [];
+    }
+
+    const key = el.getAttribute("class");
+    const cacheKey = key === null ? "" : key;
+    let simple = this.cache.get(cacheKey);
+    if (simple === undefined) {
+      simple = this.matchingParsed(el);
+      if (this.cache.size >= MAX_CACHE_SIZE) {
+        this.cache.clear();
+      }
+      this.cache.set(cacheKey, simple);
+    }
+
+    if (this.complex.length === 0) {
+      return simple;
+    }
+
+    const ret = simple.slice();
+    for (const index of this.complex) {
+      if (el.matches(this.selectors[index])) {
+        ret.push(index);
+      }
+    }
+
+    return ret.sort((a, b) => a - b);
+  }
+
+  /**
+   * Find the handlers with parsed selectors that apply to an element.
+   *
+   * @param el The element.
+   *
+   * @returns The indexes of the handlers, sorted.
+   */
+  private matchingParsed(el: Element): number[] {
+    const ret = this.universal.slice();
+    const classList = el.classList;
+    for (let i = 0; i < classList.length; ++i) {
+      const candidates = this.byClass.get(classList[i]);
+      if (candidates === undefined) {
+        continue;
+      }
+
+      for (const index of candidates) {
+        if (ret.indexOf(index) === -1 &&
+            this.parsed[index]!.some(
+              (classes) => classes.every((cls) => classList.contains(cls)))) {
+          ret.push(index);
+        }
+      }
+    }
+
+    return ret.sort((a, b) => a - b);
+  }
+}
+
+type EventIndexMap =
+  { [name in Events]: SelectorIndex<EventHandlers[name]> };
+
 interface CallSpec<T extends Events> {
   fn: EventHandlers[T];
   // tslint:disable-next-line:no-any
@@ -351,17 +561,17 @@ interface CallSpec<T extends Events> {
  *   changes that are not relevant.
  */
 export class DOMListener {
-  private readonly eventHandlers: EventHandlerMap = {
-      "included-element": [],
-      "added-element": [],
-      "excluded-element": [],
-      "excluding-element": [],
-      "removed-element": [],
-      "removing-element": [],
-      "children-changed": [],
-      "children-changing": [],
-      "text-changed": [],
-      "attribute-changed": [],
+  private readonly eventHandlers: EventIndexMap = {
+      "included-element": new SelectorIndex(),
+      "added-element": new SelectorIndex(),
+      "excluded-element": new SelectorIndex(),
+      "excluding-element": new SelectorIndex(),
+      "removed-element": new SelectorIndex(),
+      "removing-element": new SelectorIndex(),
+      "children-changed": new SelectorIndex(),
+      "children-changing": new SelectorIndex(),
+      "text-changed": new SelectorIndex(),
+      "attribute-changed": new SelectorIndex(),
   };
 
   private readonly triggerHandlers: { [key: string]: TriggerHandler[] }
@@ -370,6 +580,11 @@ export class DOMListener {
   private stopped: boolean = true;
   private scheduledProcessTriggers: number | undefined;
 
+  /**
+   * The functions to call once no triggers are pending.
+   */
+  private idleResolvers: (() => void)[] = [];
+
   /**
    * @param root The root of the DOM tree about which the listener should listen
    * to changes.
@@ -433,6 +648,32 @@ export class DOMListener {
       window.clearTimeout(this.scheduledProcessTriggers);
       this.scheduledProcessTriggers = undefined;
     }
+    this.notifyIdle();
+  }
+
+  /**
+   * @returns A promise that resolves once no triggers are pending. It
+   * resolves immediately if none are pending now.
+   */
+  whenIdle(): Promise<void> {
+    if (this.scheduledProcessTriggers === undefined) {
+      return Promise.resolve();
+    }
+
+    return new Promise((resolve) => {
+      this.idleResolvers.push(resolve);
+    });
+  }
+
+  /**
+   * Resolve the promises returned by [[whenIdle]].
+   */
+  private notifyIdle(): void {
+    const resolvers = this.idleResolvers;
+    this.idleResolvers = [];
+    for (const resolve of resolvers) {
+      resolve();
+    }
   }
 
   /**
@@ -475,13 +716,13 @@ export class DOMListener {
     }
     else {
       // As of TS 2.2.2, we need to the type annotation in the next line.
-      const pairs: SelectorHandlerPair<EventHandlers[T]>[] =
+      const index: SelectorIndex<EventHandlers[T]> =
         this.eventHandlers[eventType];
-      if (pairs === undefined) {
+      if (index === undefined) {
         throw new Error(`invalid eventType: ${eventType}`);
       }
 
-      pairs.push([selector, handler]);
+      index.add(selector, handler as EventHandlers[T]);
     }
   }
 
@@ -652,14 +893,12 @@ export class DOMListener {
                       "and removed in the same event");
     }
 
-    const pairs = this.eventHandlers[call];
+    const handlers = this.eventHandlers[call];
     const ret = [];
 
-    // Go over all the elements for which we have handlers
-    for (const [sel, fn] of pairs) {
-      if (parent.matches(sel)) {
-        ret.push({ fn, params: [added, removed, prev, next, parent] });
-      }
+    for (const index of handlers.matching(parent)) {
+      ret.push({ fn: handlers.getHandler(index),
+                 params: [added, removed, prev, next, parent] });
     }
 
     return ret;
@@ -675,16 +914,12 @@ export class DOMListener {
       return;
     }
 
-    const pairs = this.eventHandlers["text-changed"];
+    const handlers = this.eventHandlers["text-changed"];
     const node = ev.node;
 
-    // Go over all the elements for which we have
-    // handlers
     const parent = node.parentNode as Element;
-    for (const [sel, fn] of pairs) {
-      if (parent.matches(sel)) {
-        this._callHandler(fn, node, ev.oldValue);
-      }
+    for (const index of handlers.matching(parent)) {
+      this._callHandler(handlers.getHandler(index), node, ev.oldValue);
     }
 
     this._scheduleProcessTriggers();
@@ -702,12 +937,10 @@ export class DOMListener {
 
     const target = ev.node;
 
-    // Go over all the elements for which we have handlers
-    const pairs = this.eventHandlers["attribute-changed"];
-    for (const [sel, fn] of pairs) {
-      if (target.matches(sel)) {
-        this._callHandler(fn, target, ev.ns, ev.attribute, ev.oldValue);
-      }
+    const handlers = this.eventHandlers["attribute-changed"];
+    for (const index of handlers.matching(target)) {
+      this._callHandler(handlers.getHandler(index), target, ev.ns,
+                        ev.attribute, ev.oldValue);
     }
 
     this._scheduleProcessTriggers();
@@ -723,6 +956,10 @@ export class DOMListener {
     this.scheduledProcessTriggers = window.setTimeout(() => {
       this.scheduledProcessTriggers = undefined;
       this._processTriggers();
+      // Processing the triggers may have scheduled more processing.
+      if (this.scheduledProcessTriggers === undefined) {
+        this.notifyIdle();
+      }
     },
                                                       0);
   }
@@ -740,16 +977,14 @@ export class DOMListener {
    */
   private _addRemCalls<T extends AddRemEvents>(name: T, node: Element,
                                                target: Element): CallSpec<T>[] {
-    const pairs = this.eventHandlers[name];
+    const handlers = this.eventHandlers[name];
     const ret = [];
 
     const prev = node.previousSibling;
     const next = node.nextSibling;
-    // Go over all the elements for which we have handlers
-    for (const [sel, fn] of pairs) {
-      if (node.matches(sel)) {
-        ret.push({ fn, params: [target, prev, next, node] });
-      }
+    for (const index of handlers.matching(node)) {
+      ret.push({ fn: handlers.getHandler(index),
+                 params: [target, prev, next, node] });
     }
 
     return ret;
@@ -770,20 +1005,36 @@ export class DOMListener {
   private _incExcCalls<T extends IncludeExcludeEvents>(name: T, node: Element,
                                                        target: Element):
   CallSpec<T>[] {
-    const pairs = this.eventHandlers[name];
+    const handlers = this.eventHandlers[name];
     const prev = node.previousSibling;
     const next = node.nextSibling;
-    const ret = [];
 
-    // Go over all the elements for which we have handlers
-    for (const [sel, fn] of pairs) {
-      if (node.matches(sel)) {
-        ret.push({ fn, params: [node, target, prev, next, node] });
+    // We walk the tree only once, and record for each handler the elements it
+    // applies to, in document order. The calls are then produced handler by
+    // handler, which preserves the order in which handlers were added.
+    const perHandler: Element[][] = [];
+    const elements = [node].concat(
+      Array.prototype.slice.call(node.getElementsByTagName("*")));
+    for (const el of elements) {
+      for (const index of handlers.matching(el)) {
+        let matched = perHandler[index];
+        if (matched === undefined) {
+          matched = perHandler[index] = [];
+        }
+        matched.push(el);
+      }
+    }
+
+    const ret = [];
+    for (let index = 0; index < perHandler.length; ++index) {
+      const matched = perHandler[index];
+      if (matched === undefined) {
+        continue;
       }
 
-      const targets = node.querySelectorAll(sel);
-      for (const subtarget of Array.prototype.slice.call(targets)) {
-        ret.push({ fn, params: [node, target, prev, next, subtarget] });
+      const fn = handlers.getHandler(index);
+      for (const el of matched) {
+        ret.push({ fn, params: [node, target, prev, next, el] });
       }
     }
     return ret;
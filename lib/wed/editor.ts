@@ -7,8 +7,8 @@
 import Ajv from "ajv";
 import "bootstrap";
 import $ from "jquery";
-import { Observable } from "rxjs";
-import { filter } from "rxjs/operators";
+import { BehaviorSubject, Observable } from "rxjs";
+import { filter, first } from "rxjs/operators";
 import * as salve from "salve";
 import { WorkingState, WorkingStateData } from "salve-dom";
 
@@ -16,6 +16,7 @@ import { Action } from "./action";
 import { CaretChange, CaretManager } from "./caret-manager";
 import * as caretMovement from "./caret-movement";
 import { DLoc, DLocRoot } from "./dloc";
+import { DocumentLoader } from "./document-loader";
 import * as domlistener from "./domlistener";
 import { isAttr, isElement, isText } from "./domtypeguards";
 import * as domutil from "./domutil";
@@ -23,6 +24,7 @@ import * as domutil from "./domutil";
 import { closest, closestByClass, htmlToElements, indexOf } from "./domutil";
 import * as editorActions from "./editor-actions";
 import { AbortTransformationException } from "./exceptions";
+import { grammarCache } from "./grammar-cache";
 import { GUIUpdater } from "./gui-updater";
 import { GUIValidationError } from "./gui-validation-error";
 import { DialogSearchReplace } from "./gui/dialog-search-replace";
@@ -53,7 +55,7 @@ import * as preferences from "./preferences";
 import { Runtime } from "./runtime";
 import { FailedEvent, SaveKind, Saver, SaverConstructor } from "./saver";
 import { StockModals } from "./stock-modals";
-import { Task, TaskRunner } from "./task-runner";
+import { State, Task, TaskRunner } from "./task-runner";
 import { insertElement, mergeWithNextHomogeneousSibling,
          mergeWithPreviousHomogeneousSibling, removeMarkup, splitNode,
          Transformation, TransformationData, TransformationEvent,
@@ -203,6 +205,15 @@ export class Editor implements EditorAPI {
   private textUndoMaxLength: number = 10;
   private readonly taskRunners: TaskRunner[] = [];
   private taskSuspension: number = 0;
+  /**
+   * The delay in milliseconds between the end of a task suspension and the
+   * resumption of the tasks.
+   */
+  private taskResumeDelay: number = 0;
+  /**
+   * The timeout which will resume the tasks, if one is pending.
+   */
+  private taskResumeTimeout: number | undefined;
   // We may want to make this configurable in the future.
   private readonly normalizeEnteredSpaces: boolean = true;
   private readonly strippedSpaces: RegExp = /\u200B/g;
@@ -212,6 +223,14 @@ export class Editor implements EditorAPI {
   private currentLabelLevel: number = 0;
   /** A temporary initialization value. */
   private _dataChild: Element | undefined;
+  private readonly _loadProgress: BehaviorSubject<number> =
+    new BehaviorSubject(0);
+  /**
+   * Whether the document is being loaded in chunks. The editor is read-only
+   * while this is true, because the loader inserts the chunks into elements it
+   * holds references to, and edits could move or remove these elements.
+   */
+  private loadingDocument: boolean = false;
   private readonly scroller: Scroller;
   private readonly constrainer: HTMLElement;
   private readonly inputField: HTMLInputElement;
@@ -252,6 +271,12 @@ export class Editor implements EditorAPI {
   readonly name: string = "";
   readonly firstValidationComplete: Promise<Editor>;
   readonly initialized: Promise<Editor>;
+
+  /**
+   * The fraction of the document that has been loaded into the editor, from 0
+   * to 1. See the ``loading`` option.
+   */
+  readonly loadProgress: Observable<number>;
   readonly widget: HTMLElement;
   readonly $widget: JQuery;
   readonly $frame: JQuery;
@@ -321,6 +346,8 @@ export class Editor implements EditorAPI {
       this.initializedResolve = resolve;
     });
 
+    this.loadProgress = this._loadProgress.asObservable();
+
     onerror.editors.push(this);
 
     this.widget = widget;
@@ -368,6 +395,11 @@ export class Editor implements EditorAPI {
     const docURL = this.options.docURL;
     this.docURL = docURL == null ? "./doc/index.html" : docURL;
 
+    const validation = this.options.validation;
+    if (validation !== undefined && validation.resumeDelay !== undefined) {
+      this.taskResumeDelay = validation.resumeDelay;
+    }
+
     this.preferences = new preferences.Preferences({
       tooltips: true,
     });
@@ -461,7 +493,11 @@ export class Editor implements EditorAPI {
     this.$errorList = $(doc.getElementById("sb-errorlist"));
     this.$excludedFromBlur = $();
     this.errorItemHandlerBound = this.errorItemHandler.bind(this);
-    this._undo = new UndoList();
+    const undo = this.options.undo !== undefined ? this.options.undo : {};
+    this._undo = new UndoList({
+      budget: undo.budget,
+      compactAfter: undo.compactAfter !== undefined ? undo.compactAfter : 100,
+    });
 
     this.complexPatternAction = new ComplexPatternAction(
       this, "Complex name pattern", undefined, icon.makeHTML("exclamation"),
@@ -530,6 +566,10 @@ export class Editor implements EditorAPI {
     // using rangy. If we move on without this call, then the transformation
     // could destroy the markers that rangy put in and rangy will complain.
     this.editingMenuManager.dismiss();
+    // Actions may be invoked from the toolbar while the document is loading.
+    if (this.loadingDocument) {
+      return;
+    }
     let currentGroup = this._undo.getGroup();
     if (currentGroup instanceof wundo.TextUndoGroup) {
       this._undo.endGroup();
@@ -624,7 +664,11 @@ export class Editor implements EditorAPI {
    */
   private enterTaskSuspension(): void {
     if (this.taskSuspension === 0) {
+      this.clearTaskResumeTimeout();
       this.stopAllTasks();
+      // Changes made while tasks are suspended should cause one reset of the
+      // validator, not one per change.
+      this.validator.deferResets();
     }
     this.taskSuspension++;
   }
@@ -633,6 +677,10 @@ export class Editor implements EditorAPI {
    * Exit a state in which all tasks are suspended. For the state to be
    * effectively exited, this method needs to be called the same number of times
    * ``enterTaskSuspension`` was called.
+   *
+   * If the editor was configured with a delay for resuming tasks, the tasks are
+   * resumed only once the delay has elapsed without the state being entered
+   * again.
    */
   private exitTaskSuspension(): void {
     this.taskSuspension--;
@@ -640,7 +688,29 @@ export class Editor implements EditorAPI {
       throw new Error("exitTaskSuspension underflow");
     }
     if (this.taskSuspension === 0) {
-      this.resumeAllTasks();
+      this.validator.flushResets();
+      if (this.taskResumeDelay === 0) {
+        this.resumeAllTasks();
+      }
+      else {
+        this.taskResumeTimeout = setTimeout(() => {
+          this.taskResumeTimeout = undefined;
+          if (this.destroyed) {
+            return;
+          }
+          this.resumeAllTasks();
+        }, this.taskResumeDelay);
+      }
+    }
+  }
+
+  /**
+   * Clear the timeout which resumes the tasks, if one is pending.
+   */
+  private clearTaskResumeTimeout(): void {
+    if (this.taskResumeTimeout !== undefined) {
+      clearTimeout(this.taskResumeTimeout);
+      this.taskResumeTimeout = undefined;
     }
   }
 
@@ -670,11 +740,11 @@ export class Editor implements EditorAPI {
 
   /**
    * If we are not in the task suspended state that is entered upon calling
-   * ``enterTaskSuspension``, resume the task right away. Otherwise, this is a
-   * no-op.
+   * ``enterTaskSuspension``, and we are not waiting to resume tasks, resume the
+   * task right away. Otherwise, this is a no-op.
    */
   resumeTaskWhenPossible(task: TaskRunner): void {
-    if (this.taskSuspension === 0) {
+    if (this.taskSuspension === 0 && this.taskResumeTimeout === undefined) {
       task.resume();
     }
   }
@@ -698,6 +768,11 @@ export class Editor implements EditorAPI {
   }
 
   undo(): void {
+    // The insertions made by the loader are recorded, and must not be undone.
+    if (this.loadingDocument) {
+      return;
+    }
+
     // We need to replicate to some extent how fireTransformation inhibits
     // functions and reinstates them.
     this.caretManager.mark.suspend();
@@ -712,6 +787,10 @@ export class Editor implements EditorAPI {
   }
 
   redo(): void {
+    if (this.loadingDocument) {
+      return;
+    }
+
     // We need to replicate to some extent how fireTransformation inhibits
     // functions and reinstates them.
     this.caretManager.mark.suspend();
@@ -761,6 +840,48 @@ export class Editor implements EditorAPI {
     return this.saver.save();
   }
 
+  /**
+   * @returns A promise that resolves once the validator is done validating the
+   * document and the errors it found are shown. If validation is in progress,
+   * the promise resolves when it is done.
+   */
+  async validationComplete(): Promise<Editor> {
+    await this.initialized;
+    await this.validationController.validationComplete();
+    return this;
+  }
+
+  /**
+   * @returns A promise that resolves once the decorations of the GUI tree are
+   * up to date with the changes made to the document so far.
+   */
+  async decorationComplete(): Promise<Editor> {
+    await this.initialized;
+    await this.domlistener.whenIdle();
+    return this;
+  }
+
+  /**
+   * @param kind The kind of save to wait for. If omitted, either kind will do.
+   *
+   * @returns A promise that resolves once the next save of the requested kind
+   * is done. It is rejected if a save fails. Call this before triggering the
+   * save to be sure not to miss it.
+   */
+  async saveComplete(kind?: SaveKind): Promise<Editor> {
+    await this.initialized;
+    const ev = await this.saver.events
+      .pipe(first((x) => x.name === "Failed" ||
+                  (x.name === "Saved" && kind !== SaveKind.AUTO) ||
+                  (x.name === "Autosaved" && kind !== SaveKind.MANUAL)))
+      .toPromise();
+    if (ev.name === "Failed") {
+      throw new Error(`save failed: ${ev.error.msg}`);
+    }
+
+    return this;
+  }
+
   private initiateTextUndo(): wundo.UndoGroup {
     // Handle undo information
     let currentGroup = this._undo.getGroup();
@@ -945,27 +1066,11 @@ export class Editor implements EditorAPI {
   }
 
   toDataNode(node: Node): Node | Attr | null {
-    if (isElement(node)) {
-      const ret = $.data(node, "wed_mirror_node");
-      // We can bypass the whole pathToNode, nodeToPath thing.
-      if (ret != null) {
-        return ret;
-      }
-    }
-
-    return this.dataUpdater.pathToNode(this.nodeToPath(node));
+    return this.guiUpdater.toDataNode(node);
   }
 
   fromDataNode(node: Node): Node | null {
-    if (isElement(node)) {
-      const ret = $.data(node, "wed_mirror_node");
-      // We can bypass the whole pathToNode, nodeToPath thing.
-      if (ret != null) {
-        return ret;
-      }
-    }
-
-    return this.pathToNode(this.dataUpdater.nodeToPath(node));
+    return this.guiUpdater.fromDataNode(node);
   }
 
   private onSaverSaved(): void {
@@ -1041,6 +1146,8 @@ export class Editor implements EditorAPI {
     // The last recorded exception will be rethrown at the end.
     //
 
+    this.clearTaskResumeTimeout();
+
     // Turn off autosaving.
     if (this.saver !== undefined) {
       this.saver.setAutosaveInterval(0);
@@ -1129,7 +1236,9 @@ export class Editor implements EditorAPI {
     this.$dataRoot = $(this.dataRoot);
 
     this.guiDLocRoot = new GUIRoot(this.guiRoot);
-    this.dataDLocRoot = new DLocRoot(this.dataRoot);
+    // The data tree is modified only through this.dataUpdater, which keeps the
+    // index current.
+    this.dataDLocRoot = new DLocRoot(this.dataRoot, true);
 
     this.dataUpdater = new TreeUpdater(this.dataRoot);
     this.guiUpdater = new GUIUpdater(this.guiRoot, this.dataUpdater);
@@ -1239,14 +1348,17 @@ export class Editor implements EditorAPI {
     }
     else if (typeof schemaOption === "string") {
       const schemaText = await this.runtime.resolveToString(schemaOption);
-      schema = salve.constructTree(schemaText);
+      schema = grammarCache.get(schemaText);
     }
     else {
       throw new Error("unexpected value for schema");
     }
 
+    const validation = this.options.validation;
     this.validator = new Validator(schema, this.dataRoot,
-                                   this.modeTree.getValidators());
+                                   this.modeTree.getValidators(),
+                                   validation !== undefined ?
+                                   validation.maxTimespan : undefined);
     this.validator.events.addEventListener(
       "state-update", this.onValidatorStateChange.bind(this));
     this.validator.events.addEventListener(
@@ -1309,6 +1421,25 @@ export class Editor implements EditorAPI {
 
     this.modeTree.addDecoratorHandlers();
 
+    const virtualize = this.options.virtualize;
+    if (virtualize !== undefined) {
+      const selector = domutil.toGUISelector(
+        virtualize.selector,
+        this.modeTree.getMode(this.guiRoot).getAbsoluteNamespaceMappings());
+      const estimatedHeight = virtualize.estimatedHeight;
+      this.domlistener.addHandler(
+        "included-element",
+        selector,
+        (_root: Node, _tree: Node, _parent: Node, _prev: Node | null,
+         _next: Node | null, target: Element) => {
+          target.classList.add("_virtualized");
+          if (estimatedHeight !== undefined) {
+            (target as HTMLElement).style.setProperty(
+              "contain-intrinsic-size", `auto ${estimatedHeight}px`);
+          }
+        });
+    }
+
     this.domlistener.addHandler(
       "included-element",
       "._label",
@@ -1438,8 +1569,24 @@ export class Editor implements EditorAPI {
       });
 
     this.modeTree.startListening();
+    let loading: Promise<State> | undefined;
     if (this._dataChild !== undefined) {
-      this.dataUpdater.insertAt(this.dataRoot, 0, this._dataChild);
+      const loadingOptions = this.options.loading;
+      if (loadingOptions !== undefined) {
+        const loader = new DocumentLoader(this.dataUpdater, this.dataRoot,
+                                          this._dataChild,
+                                          loadingOptions.chunkSize);
+        loader.progress.subscribe((progress) => {
+          this._loadProgress.next(progress);
+        });
+        const runner = this.newTaskRunner(loader);
+        this.loadingDocument = true;
+        runner.start();
+        loading = runner.onCompleted();
+      }
+      else {
+        this.dataUpdater.insertAt(this.dataRoot, 0, this._dataChild);
+      }
     }
 
     // Drag and drop not supported by us. And we have to use "as any" to please
@@ -1540,6 +1687,17 @@ export class Editor implements EditorAPI {
     this.$widget.removeClass("loading");
     this.$widget.css("display", "block");
 
+    // The start of the document is shown while the rest is being loaded, but
+    // nothing that depends on the whole document may proceed before loading
+    // is done.
+    if (loading !== undefined) {
+      await loading;
+      if (this.destroyed) {
+        return this;
+      }
+    }
+    this._loadProgress.next(1);
+
     const namespaceError = this.initializeNamespaces();
     if (namespaceError !== undefined) {
       const limitationModal = this.modals.getModal("limitation");
@@ -1555,6 +1713,7 @@ export class Editor implements EditorAPI {
     $guiRoot.focus();
 
     this.validator.start();
+    this.loadingDocument = false;
 
     let demo = this.options.demo;
     if (demo !== undefined) {
@@ -1915,6 +2074,10 @@ in a way not supported by this version of wed.";
   }
 
   private cutHandler(e: JQueryEventObject): boolean {
+    if (this.loadingDocument) {
+      return false;
+    }
+
     if (this.caretManager.getDataCaret() === undefined) {
       // XXX alert the user?
       return false;
@@ -1939,6 +2102,10 @@ in a way not supported by this version of wed.";
   }
 
   private pasteHandler(e: JQueryEventObject): boolean {
+    if (this.loadingDocument) {
+      return false;
+    }
+
     const caret = this.caretManager.getDataCaret();
     if (caret === undefined) {
       // XXX alert the user?
@@ -2018,6 +2185,11 @@ in a way not supported by this version of wed.";
   }
 
   private keydownHandler(e: JQueryKeyEventObject): void {
+    if (this.loadingDocument) {
+      e.preventDefault();
+      return;
+    }
+
     const caret = this.caretManager.getNormalizedCaret();
     // Don't call it on undefined caret.
     if (caret !== undefined) {
@@ -2423,6 +2595,10 @@ in a way not supported by this version of wed.";
   }
 
   private keypressHandler(e: JQueryEventObject): boolean | undefined {
+    if (this.loadingDocument) {
+      return false;
+    }
+
     // IE is the odd browser that allows ESCAPE to show up as a keypress so
     // we have to prevent it from going any further.
     if (ESCAPE_KEYPRESS.matchesEvent(e)) {
@@ -2583,6 +2759,10 @@ in a way not supported by this version of wed.";
     if (this.$inputField.val() === "") {
       return;
     }
+    if (this.loadingDocument) {
+      this.$inputField.val("");
+      return;
+    }
     this.insertText(this.$inputField.val());
     this.$inputField.val("");
     this.caretManager.focusInputField();
@@ -2634,6 +2814,10 @@ in a way not supported by this version of wed.";
   }
 
   private mousedownHandler(ev: JQueryMouseEventObject): boolean {
+    if (this.loadingDocument) {
+      return false;
+    }
+
     // Make sure the mouse is not on a scroll bar.
     if (!this.scroller.isPointInside(ev.pageX, ev.pageY)) {
       return false;
@@ -2711,6 +2895,10 @@ in a way not supported by this version of wed.";
   // context menu is brought up would happen on the newly brought up menu and
   // would cause focus problems.
   private mouseupHandler(ev: JQueryEventObject): boolean {
+    if (this.loadingDocument) {
+      return false;
+    }
+
     // Make sure the mouse is not on a scroll bar.
     if (!this.scroller.isPointInside(ev.pageX, ev.pageY)) {
       return false;
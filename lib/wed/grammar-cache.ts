@@ -0,0 +1,153 @@
+/**
+ * A cache of grammars constructed from compiled schemas.
+ * @author Louis-Dominique Dubeau
+ * @license MPL 2.0
+ * @copyright Mangalam Research Center for Buddhist Languages
+ */
+import { constructTree, Grammar } from "salve";
+
+interface Entry {
+  /** The text from which the grammar was constructed. */
+  text: string;
+
+  /** The grammar constructed from ``text``. */
+  grammar: Grammar;
+}
+
+/**
+ * Compute a hash of a string. This is the 32-bit FNV-1a hash computed over
+ * UTF-16 code units. It is not cryptographically secure but it is fast and
+ * good enough for distributing keys. Collisions are handled by the cache.
+ */
+function hashString(text: string): string {
+  // tslint:disable:no-bitwise
+  let hash = 0x811c9dc5;
+  for (let i = 0; i < text.length; ++i) {
+    hash ^= text.charCodeAt(i);
+    // This is a multiplication by the FNV prime, done with shifts so as to stay
+    // within 32 bits.
+    hash += (hash << 1) + (hash << 4) + (hash << 7) + (hash << 8) +
+      (hash << 24);
+  }
+
+  return `${(hash >>> 0).toString(16)}:${text.length}`;
+  // tslint:enable:no-bitwise
+}
+
+/**
+ * A cache that maps the text of compiled schemas to the grammars constructed
+ * from them. Constructing a grammar from a large schema is expensive, and an
+ * application that creates multiple editors over the lifetime of a page
+ * (e.g. when switching between documents) would otherwise construct the same
+ * grammar over and over again.
+ *
+ * Entries are keyed by a hash of the schema text, and the text is kept in the
+ * entry so that hash collisions cannot cause the wrong grammar to be returned.
+ * The cache is bounded by the total length of the schema texts it holds. When
+ * adding an entry would exceed the bound, the least recently used entries are
+ * evicted.
+ *
+ * Grammar objects are not modified by validation, and so they can be shared
+ * among editors.
+ */
+export class GrammarCache {
+  /**
+   * The cached entries. We use the insertion order of ``Map`` to keep track of
+   * the order in which entries were used: the first entry is the least
+   * recently used one.
+   */
+  private readonly entries: Map<string, Entry[]> = new Map();
+
+  private _size: number = 0;
+
+  /**
+   * @param maxSize The maximum total length of the schema texts held by the
+   * cache. A single schema larger than this is never cached.
+   */
+  constructor(readonly maxSize: number = 8 * 1024 * 1024) {}
+
+  /**
+   * The total length of the schema texts held by the cache.
+   */
+  get size(): number {
+    return this._size;
+  }
+
+  /**
+   * Get a grammar for the schema text passed. The grammar is constructed and
+   * cached if it is not already in the cache.
+   *
+   * @param text The text of a schema compiled with salve.
+   *
+   * @returns The grammar.
+   */
+  get(text: string): Grammar {
+    const key = hashString(text);
+    let bucket = this.entries.get(key);
+    if (bucket !== undefined) {
+      for (const entry of bucket) {
+        if (entry.text === text) {
+          // Move the bucket to the end of the usage order.
+          this.entries.delete(key);
+          this.entries.set(key, bucket);
+          return entry.grammar;
+        }
+      }
+    }
+
+    const grammar = constructTree(text);
+    if (text.length > this.maxSize) {
+      return grammar;
+    }
+
+    this.evict(this.maxSize - text.length);
+
+    // Eviction may have removed the bucket.
+    bucket = this.entries.get(key);
+    if (bucket === undefined) {
+      bucket = [];
+    }
+    else {
+      this.entries.delete(key);
+    }
+    bucket.push({ text, grammar });
+    this.entries.set(key, bucket);
+    this._size += text.length;
+
+    return grammar;
+  }
+
+  /**
+   * Remove all entries from the cache.
+   */
+  clear(): void {
+    this.entries.clear();
+    this._size = 0;
+  }
+
+  /**
+   * Evict the least recently used entries until the size of the cache is no
+   * greater than the size passed.
+   *
+   * @param size The maximum size the cache may have after eviction.
+   */
+  private evict(size: number): void {
+    for (const [key, bucket] of Array.from(this.entries.entries())) {
+      if (this._size <= size) {
+        break;
+      }
+
+      this.entries.delete(key);
+      for (const entry of bucket) {
+        this._size -= entry.text.length;
+      }
+    }
+  }
+}
+
+/**
+ * The cache shared by all editors.
+ */
+export const grammarCache = new GrammarCache();
+
+//  LocalWords:  MPL FNV
@@ -20,6 +20,16 @@ import * as util from "./util";
  * decorations) mirror a data tree.
  */
 export class GUIUpdater extends TreeUpdater {
+  /**
+   * Maps data text nodes to the GUI text nodes that mirror them. Elements are
+   * linked with ``linkTrees`` but text nodes cannot carry jQuery data, so we
+   * keep their mapping here.
+   */
+  private readonly dataToGUIText: WeakMap<Text, Text> = new WeakMap();
+
+  /** The reverse of ``dataToGUIText``. */
+  private readonly guiToDataText: WeakMap<Text, Text> = new WeakMap();
+
   /**
    * @param guiTree The DOM tree to update.
    *
@@ -64,9 +74,35 @@ export class GUIUpdater extends TreeUpdater {
       // If ev.node is an element, then the clone is an element too.
       linkTrees(ev.node, clone as Element);
     }
+    this.linkTextNodes(ev.node, clone);
     this.insertNodeAt(guiCaret, clone);
   }
 
+  /**
+   * Record the mapping between the text nodes of a data tree and the text
+   * nodes of the GUI tree produced from it by ``convert.toHTMLTree``. The two
+   * trees must have the same structure.
+   *
+   * @param dataNode The root of the data tree.
+   *
+   * @param guiNode The root of the GUI tree.
+   */
+  private linkTextNodes(dataNode: Node, guiNode: Node): void {
+    if (isText(dataNode)) {
+      this.dataToGUIText.set(dataNode, guiNode as Text);
+      this.guiToDataText.set(guiNode as Text, dataNode);
+      return;
+    }
+
+    let dataChild = dataNode.firstChild;
+    let guiChild = guiNode.firstChild;
+    while (dataChild !== null && guiChild !== null) {
+      this.linkTextNodes(dataChild, guiChild);
+      dataChild = dataChild.nextSibling;
+      guiChild = guiChild.nextSibling;
+    }
+  }
+
   /**
    * Handles "SetTextNodeValue" events.
    *
@@ -128,6 +164,62 @@ export class GUIUpdater extends TreeUpdater {
                         util.encodeAttrName(ev.attribute), ev.newValue);
   }
 
+  /**
+   * Find the GUI node that mirrors a data node. Elements and text nodes are
+   * looked up in the mappings maintained by this updater. Other nodes, or
+   * nodes whose mapping is missing or out of date, are found by converting
+   * the node to a path.
+   *
+   * @param node The data node.
+   *
+   * @returns The GUI node, or ``null`` if it cannot be found.
+   */
+  fromDataNode(node: Node): Node | null {
+    if (isElement(node)) {
+      const ret = $.data(node, "wed_mirror_node");
+      if (ret != null) {
+        return ret;
+      }
+    }
+    else if (isText(node)) {
+      const ret = this.dataToGUIText.get(node);
+      // The mapping is current only if the GUI node is still in the mirror of
+      // the data node's parent.
+      if (ret !== undefined && node.parentNode !== null &&
+          ret.parentNode === $.data(node.parentNode, "wed_mirror_node")) {
+        return ret;
+      }
+    }
+
+    return this.pathToNode(this.treeUpdater.nodeToPath(node));
+  }
+
+  /**
+   * Find the data node mirrored by a GUI node. This is the converse of
+   * [[fromDataNode]].
+   *
+   * @param node The GUI node.
+   *
+   * @returns The data node, or ``null`` if it cannot be found.
+   */
+  toDataNode(node: Node): Node | Attr | null {
+    if (isElement(node)) {
+      const ret = $.data(node, "wed_mirror_node");
+      if (ret != null) {
+        return ret;
+      }
+    }
+    else if (isText(node)) {
+      const ret = this.guiToDataText.get(node);
+      if (ret !== undefined && ret.parentNode !== null &&
+          node.parentNode === $.data(ret.parentNode, "wed_mirror_node")) {
+        return ret;
+      }
+    }
+
+    return this.treeUpdater.pathToNode(this.nodeToPath(node));
+  }
+
   /**
    * Converts a data location to a GUI location.
    *
@@ -150,7 +242,7 @@ export class GUIUpdater extends TreeUpdater {
       }
     }
 
-    let guiNode = this.pathToNode(this.treeUpdater.nodeToPath(node));
+    let guiNode = this.fromDataNode(node);
     if (guiNode === null) {
       return null;
     }
@@ -176,8 +268,7 @@ export class GUIUpdater extends TreeUpdater {
       return DLoc.mustMakeDLoc(this.tree, guiNode, guiNode.childNodes.length);
     }
 
-    const guiChild = this.pathToNode(
-      this.treeUpdater.nodeToPath(node.childNodes[offset]));
+    const guiChild = this.fromDataNode(node.childNodes[offset]);
     if (guiChild === null) {
       // This happens if for instance node has X children but the
       // corresponding node in tree has X-1 children.
@@ -5,7 +5,8 @@
  * @copyright Mangalam Research Center for Buddhist Languages
  */
 
-import { DLocRoot } from "./dloc";
+import { ArrayPath, arrayPathToPath, DLocRoot,
+         pathToArrayPath } from "./dloc";
 import { isElement, isText } from "./domtypeguards";
 import { closestByClass, indexOf, siblingByClass } from "./domutil";
 import { fixPrototype } from "./util";
@@ -277,6 +278,29 @@ export class GUIRoot extends DLocRoot {
 
     return parent;
   }
+
+  /**
+   * Converts a node to a path in array form. See [[nodeToPath]].
+   *
+   * @param node The node for which to construct a path.
+   *
+   * @returns The path.
+   */
+  nodeToArrayPath(node: Node): ArrayPath {
+    return pathToArrayPath(this.nodeToPath(node));
+  }
+
+  /**
+   * Converts a path in array form to a node. See [[pathToNode]].
+   *
+   * @param path The path to interpret.
+   *
+   * @returns The node corresponding to the path, or ``null`` if no such node
+   * exists.
+   */
+  arrayPathToNode(path: ArrayPath): Node | null {
+    return this.pathToNode(arrayPathToPath(path));
+  }
 }
 
 //  LocalWords:  MPL
@@ -134,6 +134,15 @@ export class Runtime {
             }
 
             return record[property];
+          })
+        // We close the database so that the connection does not prevent
+        // deleting or upgrading it later.
+          .then((value) => {
+            store.close();
+            return value;
+          }, (err) => {
+            store.close();
+            throw err;
           });
       }
 
@@ -7,7 +7,6 @@
 
 import { Observable, Subject } from "rxjs";
 
-import * as browsers from "./browsers";
 import { Runtime } from "./runtime";
 import * as serializer from "./serializer";
 import { TreeUpdater } from "./tree-updater";
@@ -99,13 +98,82 @@ export interface Autosaved {
   name: "Autosaved";
 }
 
-export type SaveEvents = Saved | Autosaved | ChangedEvent | FailedEvent;
+/**
+ * This event is emitted when an autosave is due but is put off because the
+ * document is being modified.
+ */
+export interface AutosaveDeferred {
+  name: "AutosaveDeferred";
+
+  /** The number of times the pending autosave has been put off so far. */
+  deferrals: number;
+}
+
+/**
+ * This event is emitted after each save or autosave, whether it was
+ * successful or not.
+ */
+export interface SaveMetrics {
+  name: "SaveMetrics";
+
+  /** Whether this was an autosave. */
+  autosave: boolean;
+
+  /** How long the save took, in milliseconds. */
+  duration: number;
+
+  /**
+   * How long serializing the document took, in milliseconds. This is the part
+   * of the save that blocks the editor.
+   */
+  serialization: number;
+
+  /** The number of characters of data the save sent, before compression. */
+  size: number;
+
+  /** How many times the autosave was put off before it was performed. */
+  deferrals: number;
+}
+
+export type SaveEvents = Saved | Autosaved | ChangedEvent | FailedEvent |
+  AutosaveDeferred | SaveMetrics;
 
 export interface SaverOptions {
   /** The time between autosaves in seconds. */
   autosave?: number;
+
+  /**
+   * How long, in seconds, the document must go unmodified before an autosave
+   * is performed. If the document is being modified when an autosave is due,
+   * the autosave is put off. This is never longer than the time between
+   * autosaves. The default is 2.
+   */
+  autosaveIdle?: number;
+
+  /**
+   * The longest time, in seconds, that a modification may remain unsaved
+   * because autosaves are put off. The default is twice the time between
+   * autosaves.
+   */
+  autosaveMaxDelay?: number;
 }
 
+/**
+ * The time between autosaves is stretched so that autosaves spend at most
+ * 1/COST_FACTOR of the time serializing the document.
+ */
+const COST_FACTOR = 50;
+
+/**
+ * The weight given to the latest measurement in the average cost of
+ * serializations.
+ */
+const COST_WEIGHT = 0.3;
+
+// The typings we use do not know about idle callbacks.
+// tslint:disable-next-line:no-any
+const idleWindow = window as any;
+
 /**
  * A saver is responsible for saving a document's data. This class cannot be
  * instantiated as-is, but only through subclasses.
@@ -165,6 +233,36 @@ export abstract class Saver {
    */
   private autosaveTimeout: number | undefined;
 
+  /**
+   * The idle callback which will perform an autosave. It has the value
+   * ``undefined`` if there is none.
+   */
+  private autosaveIdleCallback: number | undefined;
+
+  /**
+   * The date at which the document went from saved to modified, or
+   * ``undefined`` if it is saved.
+   */
+  private modifiedSince: number | undefined;
+
+  /**
+   * The number of times the pending autosave has been put off.
+   */
+  private deferrals: number = 0;
+
+  /**
+   * The average time taken by serializing the document, in milliseconds, or
+   * ``undefined`` if it has not been measured yet.
+   */
+  private serializationCost: number | undefined;
+
+  /**
+   * The time spent serializing and the characters of data sent by the save in
+   * progress.
+   */
+  private saveSerialization: number = 0;
+  private saveSize: number = 0;
+
   /**
    * The object on which this class and subclasses may push new events.
    */
@@ -177,6 +275,11 @@ export abstract class Saver {
 
   private _boundAutosave: Function;
 
+  /**
+   * The serializer used by [[getData]].
+   */
+  private readonly dataSerializer: serializer.IncrementalSerializer;
+
   /**
    * @param runtime The runtime under which this saver is created.
    *
@@ -191,6 +294,7 @@ export abstract class Saver {
               protected readonly dataUpdater: TreeUpdater,
               protected readonly dataTree: Node,
               protected readonly options: SaverOptions) {
+    this.dataSerializer = new serializer.IncrementalSerializer(dataUpdater);
     dataUpdater.events.subscribe((ev) => {
       if (ev.name !== "Changed") {
         return;
@@ -198,6 +302,7 @@ export abstract class Saver {
 
       this.lastModification = Date.now();
       if (this.savedGeneration === this.currentGeneration) {
+        this.modifiedSince = this.lastModification;
         this.currentGeneration++;
         this._events.next({ name: "Changed" });
       }
@@ -232,7 +337,37 @@ export abstract class Saver {
    * @returns A promise which resolves if the save was successful.
    */
   save(): Promise<void> {
-    return this._save(false);
+    return this._measure(false, 0);
+  }
+
+  /**
+   * Perform a save and emit its metrics.
+   *
+   * @param autosave ``true`` if this is an autosave, ``false`` if not.
+   *
+   * @param deferrals The number of times the autosave was put off.
+   *
+   * @returns The promise returned by [[_save]].
+   */
+  private _measure(autosave: boolean, deferrals: number): Promise<void> {
+    this.saveSerialization = 0;
+    this.saveSize = 0;
+    const start = performance.now();
+    const report = () => {
+      this._events.next({
+        name: "SaveMetrics",
+        autosave,
+        duration: performance.now() - start,
+        serialization: this.saveSerialization,
+        size: this.saveSize,
+        deferrals,
+      });
+    };
+
+    return this._save(autosave).then(report, (err) => {
+      report();
+      throw err;
+    });
   }
 
   /**
@@ -247,19 +382,30 @@ export abstract class Saver {
    * This method returns the data to be saved in a save operation. Derived
    * classes **must** call this method rather than get the data directly from
    * the data tree.
+   *
+   * The serializations of the elements of the data tree are cached, so that
+   * only the elements changed since the last call are serialized again.
    */
   getData(): string {
-    const child = this.dataTree.firstChild as Element;
-
-    if (browsers.MSIE) {
-      return serializer.serialize(child);
-    }
+    const start = performance.now();
+    const data =
+      this.dataSerializer.serialize(this.dataTree.firstChild as Element);
+    const cost = performance.now() - start;
+    this.serializationCost = this.serializationCost === undefined ? cost :
+      this.serializationCost * (1 - COST_WEIGHT) + cost * COST_WEIGHT;
+    this.saveSerialization += cost;
+    this._recordSize(data.length);
+    return data;
+  }
 
-    const serialization = child.outerHTML;
-    // Edge has the bad habit of adding a space before the forward slash in
-    // self-closing tags. Remove it.
-    return browsers.EDGE ? serialization.replace(/<([^/<>]+) \/>/g, "<$1/>") :
-      serialization;
+  /**
+   * Record the size of data sent by the current save. Derived classes must
+   * call this for the data they send without getting it from [[getData]].
+   *
+   * @param size The number of characters sent.
+   */
+  protected _recordSize(size: number): void {
+    this.saveSize += size;
   }
 
   /**
@@ -276,6 +422,10 @@ export abstract class Saver {
     this.savedGeneration = savingGeneration;
     this.lastSave = Date.now();
     this.lastSaveKind = autosave ? SaveKind.AUTO : SaveKind.MANUAL;
+    if (this.savedGeneration === this.currentGeneration) {
+      this.modifiedSince = undefined;
+    }
+    this.deferrals = 0;
     this._events.next(autosave ? { name: "Autosaved" } : { name: "Saved" });
     // This resets the countdown to now.
     this.setAutosaveInterval(this.autosaveInterval);
@@ -300,6 +450,7 @@ export abstract class Saver {
    */
   private _autosave(): void {
     this.autosaveTimeout = undefined;
+    this.autosaveIdleCallback = undefined;
     const done = () => {
       // Calling ``setAutosaveInterval`` effectively starts a new timeout, and
       // takes care of possible race conditions. For instance, a call to
@@ -310,16 +461,60 @@ export abstract class Saver {
       this.setAutosaveInterval(this.autosaveInterval);
     };
 
-    if (this.currentGeneration !== this.savedGeneration) {
-      // We have something to save!
+    if (this.currentGeneration === this.savedGeneration) {
+      done();
+      return;
+    }
+
+    // We have something to save! But if the user is still modifying the
+    // document, we wait until they stop, or until the modifications have
+    // remained unsaved for too long.
+    const now = Date.now();
+    const quiet = now - this.lastModification!;
+    const idle = this.getAutosaveIdle();
+    const untilOverdue =
+      this.modifiedSince! + this.getAutosaveMaxDelay() - now;
+    if (quiet < idle && untilOverdue > 0) {
+      this.deferrals++;
+      this._events.next({ name: "AutosaveDeferred",
+                          deferrals: this.deferrals });
+      this.autosaveTimeout =
+        setTimeout(this._boundAutosave, Math.min(idle - quiet, untilOverdue));
+      return;
+    }
+
+    const save = () => {
+      this.autosaveTimeout = undefined;
+      this.autosaveIdleCallback = undefined;
+      const deferrals = this.deferrals;
+      this.deferrals = 0;
       // tslint:disable-next-line:no-floating-promises
-      this._save(true).then(done);
+      this._measure(true, deferrals).then(done);
+    };
+
+    // When the modifications are not overdue, we let the browser pick a time at
+    // which it is idle, within a limit.
+    if (untilOverdue > 0 && idleWindow.requestIdleCallback !== undefined) {
+      this.autosaveIdleCallback =
+        idleWindow.requestIdleCallback(save, { timeout: idle });
     }
     else {
-      done();
+      save();
     }
   }
 
+  private getAutosaveIdle(): number {
+    const idle = this.options.autosaveIdle;
+    return Math.min(idle !== undefined ? idle * 1000 : 2000,
+                    this.autosaveInterval);
+  }
+
+  private getAutosaveMaxDelay(): number {
+    const maxDelay = this.options.autosaveMaxDelay;
+    return maxDelay !== undefined ? maxDelay * 1000 :
+      2 * this.autosaveInterval;
+  }
+
   /**
    * Changes the interval at which autosaves are performed. Note that calling
    * this function will stop the current countdown and restart it from zero. If,
@@ -329,6 +524,9 @@ export abstract class Saver {
    * minutes, this will cause the next autosave to happen 4 minutes after the
    * call, rather than one minute.
    *
+   * The interval is stretched if serializing the document is costly, so that
+   * autosaves do not take too much of the time the editor has.
+   *
    * @param interval The interval between autosaves in milliseconds. 0 turns off
    * autosaves.
    */
@@ -340,8 +538,18 @@ export abstract class Saver {
       clearTimeout(oldTimeout);
     }
 
+    const oldIdleCallback = this.autosaveIdleCallback;
+    if (oldIdleCallback !== undefined) {
+      idleWindow.cancelIdleCallback(oldIdleCallback);
+      this.autosaveIdleCallback = undefined;
+    }
+
+    const cost = this.serializationCost;
     this.autosaveTimeout = interval !== 0 ?
-      setTimeout(this._boundAutosave, interval) : undefined;
+      setTimeout(this._boundAutosave,
+                 cost === undefined ? interval :
+                 Math.max(interval, cost * COST_FACTOR)) :
+      undefined;
   }
 
   /**
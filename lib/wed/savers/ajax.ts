@@ -9,14 +9,33 @@
 import mergeOptions from "merge-options";
 
 // Everything from wed must be loaded from "wed".
-import { Runtime, saver, treeUpdater } from "wed";
+import { domtypeguards, domutil, Runtime, saver, serializer,
+         treeUpdater } from "wed";
 
 import TreeUpdater = treeUpdater.TreeUpdater;
+import TreeUpdaterEvents = treeUpdater.TreeUpdaterEvents;
+import isElement = domtypeguards.isElement;
+import isText = domtypeguards.isText;
 
 interface Message {
   command: string;
   version: string;
   data?: string;
+  encoding?: string;
+  base?: string;
+  patch?: string;
+}
+
+/**
+ * The message with which a server replies to the ``check`` command to
+ * advertise the features it supports.
+ */
+interface CapabilitiesMessage {
+  // tslint:disable-next-line:no-reserved-keywords
+  type: "capabilities";
+
+  /** The encodings in which the server accepts the data. */
+  encodings?: string[];
 }
 
 interface Response {
@@ -58,6 +77,345 @@ function getMessages(data: Response): ParsedResponse | undefined {
   return ret;
 }
 
+/**
+ * The encodings we can compress the data with, in order of preference.
+ */
+const ENCODINGS = ["gzip", "deflate"];
+
+/**
+ * Documents smaller than this number of characters are not worth compressing.
+ */
+const COMPRESSION_THRESHOLD = 4096;
+
+/**
+ * Determine whether the browser can compress data.
+ */
+function canCompress(): boolean {
+  // tslint:disable-next-line:no-any
+  return typeof (window as any).CompressionStream === "function";
+}
+
+/**
+ * Convert a blob to base64.
+ *
+ * @param blob The blob to convert.
+ *
+ * @returns A promise that resolves to the converted blob.
+ */
+function blobToBase64(blob: Blob): Promise<string> {
+  return new Promise((resolve, reject) => {
+    const reader = new FileReader();
+    reader.onload = () => {
+      const url = reader.result as string;
+      resolve(url.slice(url.indexOf(",") + 1));
+    };
+    reader.onerror = () => {
+      reject(reader.error);
+    };
+    reader.readAsDataURL(blob);
+  });
+}
+
+/**
+ * Compress data. The compression is done by the browser's streaming
+ * compression, which does not block the main thread.
+ *
+ * @param data The data to compress.
+ *
+ * @param encoding The encoding to compress with.
+ *
+ * @returns A promise that resolves to the compressed data, encoded in base64.
+ */
+function compress(data: string, encoding: string): Promise<string> {
+  // The typings we use do not know about streaming compression. Also, we
+  // cannot refer to ``Response`` directly because this module defines an
+  // interface with that name.
+  // tslint:disable-next-line:no-any
+  const w = window as any;
+  // tslint:disable-next-line:no-any
+  const compressed = (new Blob([data]) as any).stream()
+    .pipeThrough(new w.CompressionStream(encoding));
+  return new w.Response(compressed).blob().then(blobToBase64);
+}
+
+/**
+ * Inserts a node. ``path`` is the path the node has once inserted. An element
+ * is given by its serialization in ``xml``, a text node by its value in
+ * ``text``.
+ */
+export interface InsertOperation {
+  op: "insert";
+  path: number[];
+  xml?: string;
+  text?: string;
+}
+
+/**
+ * Deletes the node at ``path``. If the node is an element, ``name`` is its
+ * name.
+ */
+export interface DeleteOperation {
+  op: "delete";
+  path: number[];
+  name?: string;
+}
+
+/**
+ * Sets the value of the text node at ``path``.
+ */
+export interface TextOperation {
+  op: "text";
+  path: number[];
+  value: string;
+}
+
+/**
+ * Sets the attribute ``attribute`` in the namespace ``ns`` of the element
+ * named ``name`` at ``path``. A ``value`` of ``null`` removes the attribute.
+ */
+export interface AttributeOperation {
+  op: "attr";
+  path: number[];
+  name: string;
+  ns: string;
+  attribute: string;
+  value: string | null;
+}
+
+/**
+ * An operation of a patch. Nodes are addressed by paths in the array form
+ * produced by ``TreeUpdater.nodeToArrayPath``: the offsets, among the element
+ * and text children of each node, of the nodes to follow from the root of the
+ * data tree. The names recorded in some operations allow a server to detect
+ * that the tree it applies the patch to is not the tree on which the patch
+ * was recorded.
+ */
+export type PatchOperation = InsertOperation | DeleteOperation |
+  TextOperation | AttributeOperation;
+
+/**
+ * A patch produced by [[PatchRecorder.makePatch]].
+ */
+export interface Patch {
+  /** The operations to apply, in order. */
+  ops: PatchOperation[];
+
+  /**
+   * The mark to pass to [[PatchRecorder.acknowledge]] once the patch is
+   * saved.
+   */
+  mark: number;
+}
+
+/**
+ * Records the changes made to a data tree, so that they can be sent to a
+ * server as a patch rather than sending the whole document. A patch can be
+ * made only if the server has the document as it was at some earlier point,
+ * and the recorder must be told when this is the case by calling
+ * [[acknowledge]].
+ */
+export class PatchRecorder {
+  private ops: { seq: number; op: PatchOperation; size: number }[] = [];
+
+  /**
+   * The parents whose children changed. We check them before making a patch.
+   */
+  private touched: { seq: number; node: Node }[] = [];
+
+  /** The sequence number of the next operation. */
+  private next: number = 0;
+
+  /**
+   * The changes with a sequence number lower than this one were lost or cannot
+   * be represented in a patch.
+   */
+  private invalidBefore: number | undefined;
+
+  /** The approximate size of the recorded operations, in characters. */
+  private size: number = 0;
+
+  /**
+   * When the size of the recorded operations exceeds this limit, they are
+   * dropped and a patch can be made only after the next acknowledgment. A
+   * patch larger than this is not worth sending.
+   */
+  limit: number = Infinity;
+
+  /**
+   * @param updater The updater through which the data tree is modified.
+   *
+   * @param tree The root of the data tree.
+   */
+  constructor(private readonly updater: TreeUpdater,
+              private readonly tree: Node) {
+    updater.events.subscribe((ev) => {
+      this.record(ev);
+    });
+  }
+
+  /**
+   * Get a mark which represents the current state of the tree.
+   */
+  mark(): number {
+    return this.next;
+  }
+
+  /**
+   * Make a patch that brings the tree from its state at the last
+   * acknowledgment to its current state.
+   *
+   * @returns The patch, or ``undefined`` if a patch cannot be made.
+   */
+  makePatch(): Patch | undefined {
+    if (this.invalidBefore !== undefined) {
+      return undefined;
+    }
+
+    // Once serialized and parsed again, the children of these nodes would be
+    // merged and so would not match the paths of later patches.
+    for (const { node } of this.touched) {
+      if (domutil.contains(this.tree, node) && !isNormalized(node)) {
+        return undefined;
+      }
+    }
+
+    return { ops: this.ops.map((x) => x.op), mark: this.next };
+  }
+
+  /**
+   * Tell the recorder that the server has the tree as it was at ``mark``.
+   *
+   * @param mark A mark obtained from [[mark]] or from a patch.
+   */
+  acknowledge(mark: number): void {
+    this.ops = this.ops.filter((x) => x.seq >= mark);
+    this.touched = this.touched.filter((x) => x.seq >= mark);
+    this.size = this.ops.reduce((acc, x) => acc + x.size, 0);
+    if (this.invalidBefore !== undefined && this.invalidBefore <= mark) {
+      this.invalidBefore = undefined;
+    }
+  }
+
+  private invalidate(): void {
+    this.ops = [];
+    this.touched = [];
+    this.size = 0;
+    // The change that caused the invalidation gets a sequence number so that
+    // marks taken before it do not clear the invalidation.
+    this.invalidBefore = ++this.next;
+  }
+
+  private path(node: Node): number[] {
+    return this.updater.nodeToArrayPath(node) as number[];
+  }
+
+  private push(op: PatchOperation): void {
+    const seq = this.next++;
+    const size = JSON.stringify(op).length;
+    this.ops.push({ seq, op, size });
+    this.size += size;
+    if (this.size > this.limit) {
+      this.invalidate();
+    }
+  }
+
+  private touch(node: Node): void {
+    // The node is touched by the last operation pushed.
+    this.touched.push({ seq: this.next - 1, node });
+  }
+
+  private recordDelete(node: Node): void {
+    const op: DeleteOperation = { op: "delete", path: this.path(node) };
+    if (isElement(node)) {
+      op.name = node.tagName;
+    }
+    this.push(op);
+    this.touch(node.parentNode!);
+  }
+
+  private record(ev: TreeUpdaterEvents): void {
+    // A path cannot be computed for nodes outside the tree, and serialization
+    // throws on nodes it does not support. In either case, we cannot make a
+    // patch anymore.
+    try {
+      switch (ev.name) {
+      case "InsertNodeAt": {
+        const { node } = ev;
+        if (isElement(node)) {
+          if (!isNormalized(node, true)) {
+            this.invalidate();
+            return;
+          }
+          this.push({ op: "insert", path: this.path(node),
+                      xml: serializer.serialize(node) });
+        }
+        else if (isText(node)) {
+          this.push({ op: "insert", path: this.path(node), text: node.data });
+        }
+        else {
+          throw new Error("unsupported node type");
+        }
+        this.touch(ev.parent);
+        break;
+      }
+      case "BeforeInsertNodeAt":
+        // Inserting a node that is already in the tree moves it.
+        if (ev.node.parentNode !== null &&
+            domutil.contains(this.tree, ev.node)) {
+          this.recordDelete(ev.node);
+        }
+        break;
+      case "BeforeDeleteNode":
+        this.recordDelete(ev.node);
+        break;
+      case "SetTextNodeValue":
+        this.push({ op: "text", path: this.path(ev.node), value: ev.value });
+        // The node may now be empty, and an empty text node disappears once
+        // serialized and parsed again.
+        this.touch(ev.node.parentNode!);
+        break;
+      case "SetAttributeNS":
+        this.push({ op: "attr", path: this.path(ev.node),
+                    name: ev.node.tagName, ns: ev.ns,
+                    attribute: ev.attribute, value: ev.newValue });
+        break;
+      default:
+        // Other events do not change the tree.
+      }
+    }
+    catch (ex) {
+      this.invalidate();
+    }
+  }
+}
+
+/**
+ * Check whether the children of a node are the same as they would be after
+ * serializing and parsing the node again: no text node is empty or adjacent to
+ * another text node.
+ *
+ * @param node The node to check.
+ *
+ * @param deep Whether to check the descendants of the node too.
+ */
+function isNormalized(node: Node, deep: boolean = false): boolean {
+  let prevText = false;
+  let child = node.firstChild;
+  while (child !== null) {
+    const text = isText(child);
+    if (text && (prevText || (child as Text).data === "")) {
+      return false;
+    }
+    if (deep && isElement(child) && !isNormalized(child, true)) {
+      return false;
+    }
+    prevText = text;
+    child = child.nextSibling;
+  }
+
+  return true;
+}
+
 export interface Options extends saver.SaverOptions {
   /** The URL location to POST save requests. */
   url: string;
@@ -70,6 +428,13 @@ export interface Options extends saver.SaverOptions {
 
   /** The initial ETag to use. */
   initial_etag?: string;
+
+  /**
+   * Whether autosaves send only the changes made since the last save. The
+   * server must support the ``patch`` command. Manual saves always send the
+   * whole document.
+   */
+  delta?: boolean;
 }
 
 /**
@@ -90,6 +455,13 @@ class AjaxSaver extends saver.Saver {
   private readonly url: string;
   private readonly headers: Record<string, string>;
   private etag: string | undefined;
+  private readonly recorder: PatchRecorder | undefined;
+
+  /**
+   * The encoding with which to compress the data we send, if any. It is
+   * negotiated with the server when we initialize.
+   */
+  private encoding: string | undefined;
 
   constructor(runtime: Runtime, version: string, dataUpdater: TreeUpdater,
               dataTree: Node, options: Options) {
@@ -103,13 +475,28 @@ class AjaxSaver extends saver.Saver {
     this.etag = initial_etag != null ? `"${initial_etag}"` : undefined;
     this.url = options.url;
 
+    if (options.delta === true) {
+      this.recorder = new PatchRecorder(dataUpdater, dataTree);
+    }
+
     // Every 5 minutes.
     this.setAutosaveInterval(5 * 60 * 1000);
   }
 
   init(): Promise<void> {
     return this._post({ command: "check", version: this.version }, "json")
-      .then(() => {
+      .then((reply) => {
+        const msgs = getMessages(reply);
+        const capabilities = msgs !== undefined ?
+          msgs.capabilities as {} as CapabilitiesMessage | undefined :
+          undefined;
+        if (capabilities !== undefined &&
+            capabilities.encodings !== undefined && canCompress()) {
+          const accepted = capabilities.encodings;
+          this.encoding =
+            ENCODINGS.filter((x) => accepted.indexOf(x) !== -1)[0];
+        }
+
         this.initialized = true;
         this.failed = false;
       })
@@ -132,64 +519,155 @@ saving is not possible.`);
       // is saved.
       const savingGeneration = this.currentGeneration;
 
-      let ignore = false;
-      return this._post({
-        command: autosave ? "autosave" : "save",
+      const recorder = this.recorder;
+      const patch = recorder !== undefined && autosave &&
+        this.etag !== undefined ? recorder.makePatch() : undefined;
+      if (patch === undefined) {
+        return this._saveFull(autosave, savingGeneration);
+      }
+
+      const patchData = JSON.stringify(patch.ops);
+      this._recordSize(patchData.length);
+      return this._processSave(this._post({
+        command: "patch",
         version: this.version,
-        data: this.getData(),
-      }, "json")
-        .catch(() => {
-          ignore = true;
-          const error = {
-            msg: "Your browser cannot contact the server",
-            type: "save_disconnected",
-          };
-          this._fail(error);
-          return { messages: [] };
-        })
-          .then((data: Response): void => {
-            if (ignore) {
-              return;
-            }
-
-            const msgs = getMessages(data);
-            if (msgs === undefined) {
-              this._fail();
-              throw new Error(`The server accepted the save request but did \
+        base: this.etag,
+        patch: patchData,
+      }, "json"), autosave, savingGeneration, () => {
+        recorder!.acknowledge(patch.mark);
+      }).then((applied) => {
+        // The server could not apply the patch, so we send everything.
+        if (!applied) {
+          return this._saveFull(autosave, savingGeneration);
+        }
+
+        return undefined;
+      });
+    });
+  }
+
+  private _saveFull(autosave: boolean,
+                    savingGeneration: number): Promise<void> {
+    const recorder = this.recorder;
+    const mark = recorder !== undefined ? recorder.mark() : 0;
+    const data = this.getData();
+    const message: Message = {
+      command: autosave ? "autosave" : "save",
+      version: this.version,
+      data,
+    };
+    return this._processSave(this._encode(message).then(
+      () => this._post(message, "json")), autosave, savingGeneration, () => {
+      if (recorder !== undefined) {
+        recorder.acknowledge(mark);
+        // A patch bigger than half the document is not worth sending.
+        recorder.limit = data.length / 2;
+      }
+    }).then(() => undefined);
+  }
+
+  /**
+   * Compress the data of a message, if the server accepts compressed data and
+   * the data is worth compressing. If compression fails, the message is left
+   * as it is.
+   *
+   * @param message The message to modify.
+   *
+   * @returns A promise that resolves once the message is ready to be sent.
+   */
+  private _encode(message: Message): Promise<void> {
+    const { encoding } = this;
+    const data = message.data;
+    if (encoding === undefined || data === undefined ||
+        data.length < COMPRESSION_THRESHOLD) {
+      return Promise.resolve();
+    }
+
+    return compress(data, encoding)
+      .then((compressed) => {
+        message.data = compressed;
+        message.encoding = encoding;
+      })
+      .catch(() => undefined);
+  }
+
+  /**
+   * Process the response to a save request.
+   *
+   * @param request The request.
+   *
+   * @param autosave Whether this is an autosave.
+   *
+   * @param savingGeneration The generation being saved.
+   *
+   * @param onSuccess Called if the save was successful, before the saver
+   * reports it.
+   *
+   * @returns A promise that resolves to ``false`` if the server rejected a
+   * patch, and ``true`` otherwise.
+   */
+  private _processSave(request: Promise<Response>, autosave: boolean,
+                       savingGeneration: number,
+                       onSuccess: () => void): Promise<boolean> {
+    let ignore = false;
+    return request
+      .catch(() => {
+        ignore = true;
+        const error = {
+          msg: "Your browser cannot contact the server",
+          type: "save_disconnected",
+        };
+        this._fail(error);
+        return { messages: [] };
+      })
+      .then((data: Response): boolean => {
+        if (ignore) {
+          return true;
+        }
+
+        const msgs = getMessages(data);
+        if (msgs === undefined) {
+          this._fail();
+          throw new Error(`The server accepted the save request but did \
 not return any information regarding whether the save was successful or not.`);
-            }
+        }
 
-            if (msgs.save_fatal_error !== undefined) {
-              this._fail();
-              throw new Error(`The server was not able to save the data due to \
+        if (msgs.save_fatal_error !== undefined) {
+          this._fail();
+          throw new Error(`The server was not able to save the data due to \
 a fatal error. Please contact technical support before trying to edit again.`);
-            }
-
-            if (msgs.save_transient_error !== undefined) {
-              this._events.next({ name: "Failed",
-                                  error: msgs.save_transient_error });
-              return;
-            }
-
-            if (msgs.save_edited !== undefined) {
-              this._fail(msgs.save_edited);
-              return;
-            }
-
-            if (msgs.save_successful === undefined) {
-              this._fail();
-              throw new Error(`Unexpected response from the server while \
+        }
+
+        if (msgs.save_patch_rejected !== undefined) {
+          return false;
+        }
+
+        if (msgs.save_transient_error !== undefined) {
+          this._events.next({ name: "Failed",
+                              error: msgs.save_transient_error });
+          return true;
+        }
+
+        if (msgs.save_edited !== undefined) {
+          this._fail(msgs.save_edited);
+          return true;
+        }
+
+        if (msgs.save_successful === undefined) {
+          this._fail();
+          throw new Error(`Unexpected response from the server while \
 saving. Please contact technical support before trying to edit again.`);
-            }
+        }
 
-            if (msgs.version_too_old_error !== undefined) {
-              this._fail({ type: "too_old", msg: "" });
-              return;
-            }
+        if (msgs.version_too_old_error !== undefined) {
+          this._fail({ type: "too_old", msg: "" });
+          return true;
+        }
 
-            this._saveSuccess(autosave, savingGeneration);
-          });
-    });
+        onSuccess();
+        this._saveSuccess(autosave, savingGeneration);
+        return true;
+      });
   }
 
   _recover(): Promise<boolean> {
@@ -279,4 +757,4 @@ saving. Please contact technical support before trying to edit again.`);
 
 export { AjaxSaver as Saver };
 
-//  LocalWords:  MPL ETag runtime etag json url autosave
+//  LocalWords:  MPL ETag runtime etag json url autosave autosaves
@@ -9,6 +9,9 @@
 // Everything from wed must be loaded from "wed".
 import { Runtime, saver, treeUpdater } from "wed";
 
+import { KeyValueStore, saveWithSnapshot, SnapshotOptions,
+         SnapshotStore } from "./snapshots";
+
 import TreeUpdater = treeUpdater.TreeUpdater;
 
 export interface Store {
@@ -22,6 +25,19 @@ export interface Options extends saver.SaverOptions {
   name: string;
 
   getStore(): Store;
+
+  /**
+   * If set, each save also stores a snapshot of the file in the store returned
+   * by ``getSnapshotStore``.
+   */
+  snapshots?: SnapshotOptions;
+
+  /**
+   * Get the store in which to keep snapshots. It is required if ``snapshots``
+   * is set. Code that needs to list or load the snapshots can create a
+   * [["wed/savers/snapshots".SnapshotStore]] on the same store.
+   */
+  getSnapshotStore?(): KeyValueStore;
 }
 
 /**
@@ -43,6 +59,7 @@ export interface Options extends saver.SaverOptions {
 export class Saver extends saver.Saver {
   private readonly name: string;
   private readonly store: Store;
+  private readonly snapshots: SnapshotStore | undefined;
   private readonly initPromise: Promise<void> = Promise.resolve();
 
   /**
@@ -64,6 +81,14 @@ export class Saver extends saver.Saver {
     this.name = options.name;
 
     this.store = options.getStore();
+    if (options.snapshots !== undefined) {
+      if (options.getSnapshotStore === undefined) {
+        throw new Error("snapshots requires getSnapshotStore");
+      }
+
+      this.snapshots = new SnapshotStore(options.getSnapshotStore(),
+                                         options.snapshots);
+    }
     this.setAutosaveInterval(5 * 60 * 1000);
   }
 
@@ -78,8 +103,11 @@ export class Saver extends saver.Saver {
         return;
       }
 
-      return this._update(this.name, this.getData(), autosave,
-                          this.currentGeneration)
+      const data = this.getData();
+      const savingGeneration = this.currentGeneration;
+      return saveWithSnapshot(
+        this.snapshots, this.name, data, autosave,
+        () => this._update(this.name, data, autosave, savingGeneration))
       // All save errors produced by this saver are handled with this._fail.
         .catch(() => undefined);
     });
@@ -12,6 +12,8 @@ import * as localforage from "localforage";
 // Everything from wed must be loaded from "wed".
 import { Runtime, saver, treeUpdater } from "wed";
 
+import { saveWithSnapshot, SnapshotOptions, SnapshotStore } from "./snapshots";
+
 import TreeUpdater = treeUpdater.TreeUpdater;
 
 /**
@@ -28,6 +30,20 @@ export function config(): LocalForage {
   });
 }
 
+/**
+ * Create the localforage store instance in which snapshots are kept. If you
+ * have code that needs to list or load the snapshots that this saver makes,
+ * create a [["wed/savers/snapshots".SnapshotStore]] on this instance.
+ *
+ * @returns A configured localforage instance.
+ */
+export function configSnapshots(): LocalForage {
+  return localforage.createInstance({
+    name: "wed",
+    storeName: "snapshots",
+  });
+}
+
 /**
  * @typedef Options
  * @type {Object}
@@ -40,6 +56,12 @@ export interface Options extends saver.SaverOptions {
    * localforage.
    */
   name: string;
+
+  /**
+   * If set, each save also stores a snapshot of the file in the store created
+   * by [[configSnapshots]].
+   */
+  snapshots?: SnapshotOptions;
 }
 
 export interface FileRecord {
@@ -92,6 +114,7 @@ export function makeFileRecord(name: string, data: string): FileRecord {
 export class Saver extends saver.Saver {
   private readonly name: string;
   private readonly store: LocalForage;
+  private readonly snapshots: SnapshotStore | undefined;
   private readonly initPromise: Promise<void> = Promise.resolve();
 
   /**
@@ -114,6 +137,9 @@ export class Saver extends saver.Saver {
     this.name = options.name;
 
     this.store = config();
+    if (options.snapshots !== undefined) {
+      this.snapshots = new SnapshotStore(configSnapshots(), options.snapshots);
+    }
 
     this.setAutosaveInterval(5 * 60 * 1000);
   }
@@ -129,8 +155,11 @@ export class Saver extends saver.Saver {
         return;
       }
 
-      return this._update(this.name, this.getData(), autosave,
-                          this.currentGeneration)
+      const data = this.getData();
+      const savingGeneration = this.currentGeneration;
+      return saveWithSnapshot(
+        this.snapshots, this.name, data, autosave,
+        () => this._update(this.name, data, autosave, savingGeneration))
       // All save errors produced by this saver are handled with this._fail.
         .catch(() => undefined);
     });
@@ -0,0 +1,463 @@
+/**
+ * Chunked, versioned storage of documents, for the savers which save in the
+ * browser.
+ *
+ * @author Louis-Dominique Dubeau
+ * @license MPL 2.0
+ * @copyright Mangalam Research Center for Buddhist Languages
+ */
+
+/**
+ * The store in which snapshots are kept. The API is a subset of localforage's
+ * API, so a localforage instance can be used as a store.
+ */
+export interface KeyValueStore {
+  getItem<T>(key: string): Promise<T | null>;
+  setItem<T>(key: string, value: T): Promise<T>;
+  removeItem(key: string): Promise<void>;
+}
+
+export interface SnapshotOptions {
+  /**
+   * The number of snapshots to keep for each document. When a save makes more
+   * snapshots than this, the oldest ones are deleted, along with the chunks
+   * that only they use. The default is 10.
+   */
+  keep?: number;
+}
+
+/**
+ * Describes a snapshot.
+ */
+export interface SnapshotInfo {
+  /** The number of the snapshot. Later snapshots have higher numbers. */
+  seq: number;
+
+  /** The date at which the snapshot was made. */
+  date: Date;
+
+  /** Whether the snapshot was made by an autosave. */
+  autosave: boolean;
+
+  /** The length of the document, in characters. */
+  length: number;
+}
+
+/**
+ * The record listing the snapshots of a document.
+ */
+interface Index {
+  /** The format version of the record. */
+  version: number;
+
+  /** The number of the next snapshot. */
+  next: number;
+
+  /** The snapshots, oldest first. */
+  snapshots: SnapshotInfo[];
+}
+
+/**
+ * The record listing the chunks of a snapshot.
+ */
+interface Manifest {
+  /** The format version of the record. */
+  version: number;
+
+  /** The hashes of the chunks of the document, in order. */
+  chunks: string[];
+}
+
+/**
+ * Chunks are never shorter than this, except for the last chunk of a document.
+ */
+const MIN_CHUNK = 2048;
+
+/**
+ * Chunks are never longer than this.
+ */
+const MAX_CHUNK = 65536;
+
+/**
+ * A chunk ends where the rolling hash has all these bits at 0. It has 13 bits,
+ * which gives chunks of about 8192 characters past the minimum. We use the high
+ * bits because they depend on more of the preceding characters than the low
+ * bits.
+ */
+const BOUNDARY_MASK = 0xFFF80000 | 0;
+
+/**
+ * The random values used by the rolling hash. They must not change from one
+ * run to the next, otherwise documents would be cut differently and chunks
+ * would not be shared anymore.
+ */
+const GEAR: number[] = (() => {
+  const ret: number[] = [];
+  // A xorshift generator with a fixed seed.
+  let x = 2463534242;
+  for (let i = 0; i < 256; ++i) {
+    x ^= x << 13;
+    x ^= x >>> 17;
+    x ^= x << 5;
+    ret.push(x | 0);
+  }
+
+  return ret;
+})();
+
+/**
+ * Cut a document into chunks. The chunks end where the content has specific
+ * properties rather than at fixed offsets, so that an edit changes only the
+ * chunks around it.
+ *
+ * @param data The document.
+ *
+ * @returns The chunks, which joined together give the document.
+ */
+export function chunk(data: string): string[] {
+  const ret: string[] = [];
+  const length = data.length;
+  let start = 0;
+  let hash = 0;
+  for (let i = 0; i < length; ++i) {
+    hash = ((hash << 1) + GEAR[data.charCodeAt(i) & 0xFF]) | 0;
+    const size = i + 1 - start;
+    if ((size >= MIN_CHUNK && (hash & BOUNDARY_MASK) === 0) ||
+        size >= MAX_CHUNK) {
+      ret.push(data.slice(start, i + 1));
+      start = i + 1;
+      hash = 0;
+    }
+  }
+
+  if (start < length) {
+    ret.push(data.slice(start));
+  }
+
+  return ret;
+}
+
+/**
+ * Compute the key under which a chunk is stored. It combines two 32-bit FNV-1a
+ * hashes with different offsets, and the length of the chunk.
+ *
+ * @param data The chunk.
+ *
+ * @returns The key.
+ */
+export function hashChunk(data: string): string {
+  let h1 = 0x811C9DC5 | 0;
+  let h2 = 0x050C5D1F | 0;
+  for (let i = 0; i < data.length; ++i) {
+    const code = data.charCodeAt(i);
+    h1 = Math.imul(h1 ^ code, 0x01000193);
+    h2 = Math.imul(h2 ^ code, 0x01000193);
+  }
+
+  return `${(h1 >>> 0).toString(16)}${(h2 >>> 0).toString(16)}-${data.length}`;
+}
+
+function indexKey(name: string): string {
+  return `${name}/index`;
+}
+
+function manifestKey(name: string, seq: number): string {
+  return `${name}/manifest/${seq}`;
+}
+
+function chunkKey(name: string, hash: string): string {
+  return `${name}/chunk/${hash}`;
+}
+
+/**
+ * Stores successive versions of documents. Each version is a snapshot made of
+ * chunks, which are stored under a hash of their content. Consecutive versions
+ * of a document share the chunks they have in common, so that making a
+ * snapshot of a document after a small edit writes only a few chunks.
+ *
+ * The store must not be modified by anything else than this object while it
+ * exists, as it caches some of the data of the store.
+ */
+export class SnapshotStore {
+  private readonly keep: number;
+
+  /**
+   * The chunk lists of the snapshots we know of, by document name and then by
+   * snapshot number.
+   */
+  private readonly manifests: Record<string, Record<number, string[]>> =
+    Object.create(null);
+
+  /**
+   * The last operation started. Operations are performed one after the other.
+   */
+  private last: Promise<void> = Promise.resolve();
+
+  /**
+   * @param store The store in which to keep the snapshots.
+   *
+   * @param options The options governing the snapshots.
+   */
+  constructor(private readonly store: KeyValueStore,
+              options: SnapshotOptions = {}) {
+    const keep = options.keep !== undefined ? options.keep : 10;
+    if (keep < 1) {
+      throw new Error("keep must be at least 1");
+    }
+    this.keep = keep;
+  }
+
+  private queue<T>(op: () => Promise<T>): Promise<T> {
+    const ret = this.last.then(op);
+    this.last = ret.then(() => undefined, () => undefined);
+    return ret;
+  }
+
+  private getIndex(name: string): Promise<Index> {
+    return this.store.getItem<Index>(indexKey(name)).then((index) => {
+      if (index === null) {
+        return { version: 1, next: 0, snapshots: [] };
+      }
+
+      if (index.version !== 1) {
+        throw new Error(`unexpected record version number: ${index.version}`);
+      }
+
+      return index;
+    });
+  }
+
+  private manifestsOf(name: string): Record<number, string[]> {
+    let manifests = this.manifests[name];
+    if (manifests === undefined) {
+      manifests = this.manifests[name] = Object.create(null);
+    }
+
+    return manifests;
+  }
+
+  private getManifest(name: string, seq: number): Promise<string[]> {
+    const manifests = this.manifestsOf(name);
+    const cached = manifests[seq];
+    if (cached !== undefined) {
+      return Promise.resolve(cached);
+    }
+
+    return this.store.getItem<Manifest>(manifestKey(name, seq))
+      .then((manifest) => {
+        if (manifest === null) {
+          throw new Error(`missing manifest ${seq} for ${name}`);
+        }
+
+        if (manifest.version !== 1) {
+          throw new Error(
+            `unexpected record version number: ${manifest.version}`);
+        }
+
+        manifests[seq] = manifest.chunks;
+        return manifest.chunks;
+      });
+  }
+
+  /**
+   * Get the chunks used by some snapshots.
+   *
+   * @param name The name of the document.
+   *
+   * @param snapshots The snapshots.
+   *
+   * @returns A promise that resolves to an object whose keys are the hashes of
+   * the chunks.
+   */
+  private getChunks(name: string,
+                    snapshots: SnapshotInfo[]): Promise<Record<string, true>> {
+    return Promise.all(snapshots.map((x) => this.getManifest(name, x.seq)))
+      .then((lists) => {
+        const ret: Record<string, true> = Object.create(null);
+        for (const list of lists) {
+          for (const hash of list) {
+            ret[hash] = true;
+          }
+        }
+
+        return ret;
+      });
+  }
+
+  /**
+   * Save a new snapshot of a document. Only the chunks that are not already
+   * stored are written. Then the snapshots in excess of the number to keep
+   * are deleted.
+   *
+   * @param name The name of the document.
+   *
+   * @param data The document.
+   *
+   * @param autosave Whether the snapshot is made by an autosave.
+   *
+   * @returns A promise that resolves to the information about the new
+   * snapshot, once it is saved.
+   */
+  save(name: string, data: string, autosave: boolean): Promise<SnapshotInfo> {
+    return this.queue(() => this.getIndex(name).then((index) =>
+      this.getChunks(name, index.snapshots).then((stored) => {
+        const chunks = chunk(data);
+        const hashes = chunks.map(hashChunk);
+        const writes: Promise<string>[] = [];
+        for (let i = 0; i < chunks.length; ++i) {
+          const hash = hashes[i];
+          if (stored[hash] === undefined) {
+            stored[hash] = true;
+            writes.push(this.store.setItem(chunkKey(name, hash), chunks[i]));
+          }
+        }
+
+        const info: SnapshotInfo = {
+          seq: index.next,
+          date: new Date(),
+          autosave,
+          length: data.length,
+        };
+
+        // The index is written last, so that it never refers to a snapshot
+        // which is not completely saved.
+        return Promise.all(writes)
+          .then(() => this.store.setItem<Manifest>(
+            manifestKey(name, info.seq), { version: 1, chunks: hashes }))
+          .then(() => {
+            this.manifestsOf(name)[info.seq] = hashes;
+            const snapshots = index.snapshots.concat(info);
+            const dropped = snapshots.splice(
+              0, Math.max(0, snapshots.length - this.keep));
+            return this.store.setItem<Index>(indexKey(name), {
+              version: 1,
+              next: info.seq + 1,
+              snapshots,
+            }).then(() => this.compact(name, snapshots, dropped));
+          })
+          .then(() => info);
+      })));
+  }
+
+  /**
+   * Delete snapshots, and the chunks which the snapshots that remain do not
+   * use.
+   *
+   * @param name The name of the document.
+   *
+   * @param kept The snapshots that remain.
+   *
+   * @param dropped The snapshots to delete.
+   */
+  private compact(name: string, kept: SnapshotInfo[],
+                  dropped: SnapshotInfo[]): Promise<void> {
+    if (dropped.length === 0) {
+      return Promise.resolve();
+    }
+
+    return Promise.all([this.getChunks(name, kept),
+                        this.getChunks(name, dropped)])
+      .then(([used, unused]) => {
+        const removals: Promise<void>[] = [];
+        for (const hash of Object.keys(unused)) {
+          if (used[hash] === undefined) {
+            removals.push(this.store.removeItem(chunkKey(name, hash)));
+          }
+        }
+
+        const manifests = this.manifestsOf(name);
+        for (const { seq } of dropped) {
+          delete manifests[seq];
+          removals.push(this.store.removeItem(manifestKey(name, seq)));
+        }
+
+        return Promise.all(removals);
+      })
+      .then(() => undefined);
+  }
+
+  /**
+   * List the snapshots of a document.
+   *
+   * @param name The name of the document.
+   *
+   * @returns A promise that resolves to the snapshots, oldest first.
+   */
+  list(name: string): Promise<SnapshotInfo[]> {
+    return this.queue(() => this.getIndex(name)
+                      .then((index) => index.snapshots));
+  }
+
+  /**
+   * Load a snapshot of a document.
+   *
+   * @param name The name of the document.
+   *
+   * @param seq The number of the snapshot to load. If omitted, the latest
+   * snapshot is loaded.
+   *
+   * @returns A promise that resolves to the document, or ``undefined`` if
+   * there is no such snapshot.
+   */
+  load(name: string, seq?: number): Promise<string | undefined> {
+    return this.queue(() => this.getIndex(name).then((index) => {
+      const snapshots = index.snapshots;
+      const info = seq === undefined ? snapshots[snapshots.length - 1] :
+        snapshots.filter((x) => x.seq === seq)[0];
+      if (info === undefined) {
+        return undefined;
+      }
+
+      return this.getManifest(name, info.seq)
+        .then((hashes) => Promise.all(hashes.map(
+          (hash) => this.store.getItem<string>(chunkKey(name, hash))
+            .then((data) => {
+              if (data === null) {
+                throw new Error(`missing chunk ${hash} for ${name}`);
+              }
+
+              return data;
+            }))))
+        .then((chunks) => chunks.join(""));
+    }));
+  }
+}
+
+/**
+ * Save a document and then make a snapshot of it. The file that the saver
+ * writes must always hold the latest data, because that is what the code which
+ * loads documents reads. So a snapshot is made in addition to saving the file,
+ * never instead of it, and snapshots add to what a save writes. If the
+ * snapshot cannot be made, the save still counts as successful.
+ *
+ * @param snapshots The store in which to make the snapshot. If undefined, no
+ * snapshot is made.
+ *
+ * @param name The name of the document.
+ *
+ * @param data The document.
+ *
+ * @param autosave Whether the save is an autosave.
+ *
+ * @param save A function which saves the file.
+ *
+ * @returns A promise that resolves once the file is saved and the snapshot
+ * made.
+ */
+export function saveWithSnapshot(snapshots: SnapshotStore | undefined,
+                                 name: string, data: string,
+                                 autosave: boolean,
+                                 save: () => Promise<void>): Promise<void> {
+  return save().then(() => {
+    if (snapshots === undefined) {
+      return undefined;
+    }
+
+    return snapshots.save(name, data, autosave).then(() => undefined, (err) => {
+      // tslint:disable-next-line:no-console
+      console.warn(`could not make a snapshot of ${name}`, err);
+    });
+  });
+}
+
+//  LocalWords:  localforage MPL FNV xorshift
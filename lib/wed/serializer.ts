@@ -1,10 +1,14 @@
 /**
- * An XML serializer for platforms that produce erratic results.
+ * An XML serializer for platforms that produce erratic results, and an
+ * incremental serializer which caches the serializations of elements.
  * @author Louis-Dominique Dubeau
  * @license MPL 2.0
  * @copyright Mangalam Research Center for Buddhist Languages
  */
 
+import { isElement } from "./domtypeguards";
+import { TreeUpdater } from "./tree-updater";
+
 /**
  * Escape characters that cannot be represented literally in XML.
  *
@@ -43,7 +47,7 @@ function serializeDocument(out: string[], node: Document): void {
   _serialize(out, node.firstChild);
 }
 
-function serializeElement(out: string[], node: Element): void {
+function serializeStartTag(out: string[], node: Element): void {
   out.push("<", node.tagName);
 
   const attributes = node.attributes;
@@ -51,6 +55,10 @@ function serializeElement(out: string[], node: Element): void {
     const attr = attributes[i];
     out.push(" ", attr.name, "=\"", escape(attr.value, true), "\"");
   }
+}
+
+function serializeElement(out: string[], node: Element): void {
+  serializeStartTag(out, node);
   if (node.childNodes.length === 0) {
     out.push("/>");
   }
@@ -99,4 +107,122 @@ export function serialize(root: Element | Document | DocumentFragment): string {
   return out.join("");
 }
 
-//  LocalWords:  MPL lt nodeType CDATA
+/**
+ * A serializer which caches the serialization of each element it serializes,
+ * so that serializing a tree again after a small change serializes only the
+ * elements that contain the change. The tree must be modified only through
+ * the [["wed/tree-updater".TreeUpdater]] passed to the serializer, which tells
+ * it which elements have changed. The output is the same as that of
+ * [[serialize]].
+ */
+export class IncrementalSerializer {
+  /**
+   * Maps an element to its serialization. If an element has an entry here,
+   * so do all its descendants.
+   */
+  private readonly cache: WeakMap<Element, string> = new WeakMap();
+
+  /**
+   * @param updater The updater through which the tree is modified.
+   */
+  constructor(updater: TreeUpdater) {
+    updater.events.subscribe((ev) => {
+      switch (ev.name) {
+      case "BeforeInsertNodeAt":
+        // The node may be moved from its current parent.
+        this.invalidate(ev.node.parentNode);
+        break;
+      case "InsertNodeAt":
+        this.entering(ev.node);
+        this.invalidate(ev.parent);
+        break;
+      case "BeforeDeleteNode":
+        this.invalidate(ev.node.parentNode);
+        break;
+      case "SetTextNodeValue":
+        this.invalidate(ev.node.parentNode);
+        break;
+      case "SetAttributeNS":
+        this.invalidate(ev.node);
+        break;
+      default:
+        // Other events do not change the tree.
+      }
+    });
+  }
+
+  /**
+   * Forget the serializations of a node and its ancestors.
+   *
+   * @param node The node that has changed.
+   */
+  private invalidate(node: Node | null): void {
+    // Since an element that has a serialization has descendants that have
+    // one too, we can stop at the first ancestor that has none.
+    while (node !== null && isElement(node) && this.cache.delete(node)) {
+      node = node.parentNode;
+    }
+  }
+
+  /**
+   * Forget the serializations of a node entering the tree and of its
+   * descendants. Nodes outside the tree may be modified without the updater
+   * telling us.
+   *
+   * @param node The node entering the tree.
+   */
+  private entering(node: Node): void {
+    if (isElement(node)) {
+      this.cache.delete(node);
+      const descendants = node.getElementsByTagName("*");
+      for (let i = 0; i < descendants.length; ++i) {
+        this.cache.delete(descendants[i]);
+      }
+    }
+  }
+
+  /**
+   * Serialize an element.
+   *
+   * @param root The element to serialize.
+   *
+   * @returns The serialized element.
+   */
+  serialize(root: Element): string {
+    let ret = this.cache.get(root);
+    if (ret !== undefined) {
+      return ret;
+    }
+
+    const out: string[] = [];
+    serializeStartTag(out, root);
+    ret = out.join("");
+    if (root.childNodes.length === 0) {
+      ret += "/>";
+    }
+    else {
+      ret += ">";
+      let child = root.firstChild;
+      while (child !== null) {
+        if (isElement(child)) {
+          // We concatenate rather than join so that engines which represent
+          // strings as ropes can share the serializations of the children
+          // with that of their parent.
+          ret += this.serialize(child);
+        }
+        else {
+          const childOut: string[] = [];
+          _serialize(childOut, child);
+          ret += childOut.join("");
+        }
+        child = child.nextSibling;
+      }
+      ret += `</${root.tagName}>`;
+    }
+    this.cache.set(root, ret);
+
+    return ret;
+  }
+}
+
+//  LocalWords:  MPL lt nodeType CDATA updater
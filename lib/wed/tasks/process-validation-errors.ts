@@ -12,6 +12,7 @@ export interface Controller {
   processError(error: GUIValidationError): boolean;
   appendItems(items: HTMLElement[]): void;
   appendMarkers(markers: HTMLElement[]): void;
+  flushMarkerPositions(): void;
 }
 
 /**
@@ -62,6 +63,7 @@ export class ProcessValidationErrors implements Task {
       }
     }
 
+    controller.flushMarkerPositions();
     controller.appendItems(items);
     controller.appendMarkers(markers);
     return errors.length !== 0;
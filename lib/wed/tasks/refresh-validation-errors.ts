@@ -9,7 +9,8 @@ import { Task } from "../task-runner";
 
 export interface Controller {
   copyErrorList(): GUIValidationError[];
-  processError(error: GUIValidationError): boolean;
+  refreshError(error: GUIValidationError): boolean;
+  flushMarkerPositions(): void;
 }
 
 /**
@@ -36,11 +37,12 @@ export class RefreshValidationErrors implements Task {
       const error = errors[ix];
       // We work only on those that already have a marker.
       if (error.marker != null) {
-        this.controller.processError(error);
+        this.controller.refreshError(error);
       }
 
       ix++;
     }
+    this.controller.flushMarkerPositions();
 
     this.resumeAt = ix;
     return ix < errors.length;
@@ -7,7 +7,7 @@
 
 import { Observable, Subject } from "rxjs";
 
-import { DLoc, DLocRoot, findRoot } from "./dloc";
+import { ArrayPath, DLoc, DLocRoot, findRoot } from "./dloc";
 import { isDocumentFragment, isElement, isNode, isText } from "./domtypeguards";
 import * as domutil from "./domutil";
 
@@ -579,8 +579,17 @@ export class TreeUpdater {
     }
 
     this._emit({ name: "BeforeInsertNodeAt", parent, index, node });
+    const positionIndex = this.dlocRoot.positionIndex;
+    if (positionIndex !== undefined && node.parentNode !== null) {
+      // The node is being moved from its current parent.
+      positionIndex.childrenChanged(node.parentNode);
+    }
     const child = parent.childNodes[index];
     parent.insertBefore(node,  child != null ? child : null);
+    if (positionIndex !== undefined) {
+      positionIndex.childrenChanged(parent);
+      positionIndex.entering(node);
+    }
     this._emit({ name: "InsertNodeAt", parent, index, node });
   }
 
@@ -814,6 +823,10 @@ export class TreeUpdater {
     }
 
     parent.removeChild(node);
+    const positionIndex = this.dlocRoot.positionIndex;
+    if (positionIndex !== undefined) {
+      positionIndex.childrenChanged(parent);
+    }
     this._emit({ name: "DeleteNode", node, formerParent: parent });
   }
 
@@ -902,6 +915,29 @@ export class TreeUpdater {
   pathToNode(path: string): Node | null {
     return this.dlocRoot.pathToNode(path);
   }
+
+  /**
+   * Converts a node to a path in array form.
+   *
+   * @param node The node for which to return a path.
+   *
+   * @returns The path of the node relative to the root of the tree we are
+   * updating.
+   */
+  nodeToArrayPath(node: Node): ArrayPath {
+    return this.dlocRoot.nodeToArrayPath(node);
+  }
+
+  /**
+   * Converts a path in array form to a node.
+   *
+   * @param path The path to convert.
+   *
+   * @returns The node corresponding to the path passed.
+   */
+  arrayPathToNode(path: ArrayPath): Node | null {
+    return this.dlocRoot.arrayPathToNode(path);
+  }
 }
 
 //  LocalWords:  domutil splitAt insertAt insertText insertBefore deleteText cd
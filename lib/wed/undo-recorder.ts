@@ -6,8 +6,11 @@
  * @license MPL 2.0
  * @copyright Mangalam Research Center for Buddhist Languages
  */
+import { ArrayPath, arrayPathToPath } from "./dloc";
+import { isElement, isText } from "./domtypeguards";
 import { indexOf } from "./domutil";
 import { Editor } from "./editor";
+import { serialize } from "./serializer";
 import { BeforeDeleteNodeEvent, InsertNodeAtEvent, SetAttributeNSEvent,
          SetTextNodeValueEvent, TreeUpdater } from "./tree-updater";
 import * as undo from "./undo";
@@ -16,6 +19,225 @@ function getOuterHTML(node: Node | undefined | null): string {
   return (node == null) ? "undefined" : (node as Element).outerHTML;
 }
 
+/**
+ * The estimated cost of a node, in characters, apart from its text and the
+ * values of its attributes. This is used to estimate the memory used by
+ * snapshots which are kept as nodes.
+ */
+const NODE_COST = 50;
+
+/**
+ * Estimate the memory used by a tree.
+ *
+ * @param node The root of the tree.
+ *
+ * @returns The estimate, in characters.
+ */
+function estimateSize(node: Node): number {
+  if (!isElement(node)) {
+    const value = node.nodeValue;
+    return NODE_COST + (value !== null ? value.length : 0);
+  }
+
+  let ret = NODE_COST;
+  const attributes = node.attributes;
+  for (let i = 0; i < attributes.length; ++i) {
+    const attr = attributes[i];
+    ret += attr.name.length + attr.value.length;
+  }
+
+  let child = node.firstChild;
+  while (child !== null) {
+    ret += estimateSize(child);
+    child = child.nextSibling;
+  }
+
+  return ret;
+}
+
+/**
+ * Record the namespaces that the elements and attributes of a tree use.
+ *
+ * @param node The root of the tree.
+ *
+ * @param namespaces The prefixes found so far, mapped to their namespaces. The
+ * default namespace is recorded under the empty string.
+ *
+ * @returns False if a prefix is used for two different namespaces.
+ */
+function gatherNamespaces(node: Element,
+                          namespaces: Record<string, string>): boolean {
+  const record = (prefix: string | null, ns: string | null) => {
+    const key = prefix === null ? "" : prefix;
+    const uri = ns === null ? "" : ns;
+    const prev = namespaces[key];
+    namespaces[key] = uri;
+    return prev === undefined || prev === uri;
+  };
+
+  if (!record(node.prefix, node.namespaceURI)) {
+    return false;
+  }
+
+  const attributes = node.attributes;
+  for (let i = 0; i < attributes.length; ++i) {
+    const attr = attributes[i];
+    if (attr.prefix !== null && attr.prefix !== "xml" &&
+        attr.prefix !== "xmlns" && !record(attr.prefix, attr.namespaceURI)) {
+      return false;
+    }
+  }
+
+  let child = node.firstElementChild;
+  while (child !== null) {
+    if (!gatherNamespaces(child, namespaces)) {
+      return false;
+    }
+    child = child.nextElementSibling;
+  }
+
+  return true;
+}
+
+/**
+ * Check whether two trees have the same structure and namespaces.
+ */
+function sameStructure(a: Node, b: Node): boolean {
+  if (a.nodeType !== b.nodeType ||
+      a.childNodes.length !== b.childNodes.length ||
+      (isElement(a) && a.namespaceURI !== (b as Element).namespaceURI)) {
+    return false;
+  }
+
+  let achild = a.firstChild;
+  let bchild = b.firstChild;
+  while (achild !== null) {
+    if (!sameStructure(achild, bchild!)) {
+      return false;
+    }
+    achild = achild.nextSibling;
+    bchild = bchild!.nextSibling;
+  }
+
+  return true;
+}
+
+/**
+ * An immutable copy of a subtree, which undo operations use to restore nodes.
+ * The copy itself is never put into a tree: a fresh copy is made from it each
+ * time it is restored, so that a single snapshot serves all the undo and redo
+ * cycles of an operation.
+ *
+ * A snapshot may be compacted, in which case it keeps the serialization of the
+ * subtree rather than nodes. A serialization is much smaller than the nodes
+ * it stands for.
+ */
+class Snapshot {
+  private node: Node | undefined;
+  private xml: string | undefined;
+  private namespaces: Record<string, string> | undefined;
+  private size: number | undefined;
+
+  /**
+   * @param node The root of the subtree to copy.
+   */
+  constructor(node: Node) {
+    this.node = node.cloneNode(true);
+  }
+
+  /**
+   * @param doc The document in which the copy is to be inserted.
+   *
+   * @returns A new copy of the subtree.
+   */
+  restore(doc: Document): Node {
+    if (this.node !== undefined) {
+      return this.node.cloneNode(true);
+    }
+
+    if (this.namespaces === undefined) {
+      return doc.createTextNode(this.xml!);
+    }
+
+    return doc.importNode(Snapshot.parse(this.xml!, this.namespaces)!, true);
+  }
+
+  /**
+   * @returns The estimated memory used by this snapshot, in characters.
+   */
+  getSize(): number {
+    if (this.size === undefined) {
+      this.size = this.node !== undefined ? estimateSize(this.node) :
+        this.xml!.length;
+    }
+
+    return this.size;
+  }
+
+  /**
+   * Replace the copy with its serialization. The snapshot remains as it is if
+   * the serialization would not restore the same subtree.
+   */
+  compact(): void {
+    const node = this.node;
+    if (node === undefined) {
+      return;
+    }
+
+    if (isText(node)) {
+      this.xml = node.data;
+    }
+    else if (isElement(node)) {
+      const namespaces: Record<string, string> = Object.create(null);
+      if (!gatherNamespaces(node, namespaces)) {
+        return;
+      }
+
+      let xml;
+      try {
+        xml = serialize(node);
+      }
+      catch (ex) {
+        // The subtree contains nodes that the serializer does not handle.
+        return;
+      }
+
+      // Adjacent or empty text nodes do not survive a serialization, and the
+      // paths stored by later undo operations depend on the exact structure
+      // of the tree.
+      const parsed = Snapshot.parse(xml, namespaces);
+      if (parsed === null || !sameStructure(node, parsed)) {
+        return;
+      }
+
+      this.xml = xml;
+      this.namespaces = namespaces;
+    }
+    else {
+      return;
+    }
+
+    this.node = undefined;
+    this.size = undefined;
+  }
+
+  toString(): string {
+    return this.node !== undefined ? getOuterHTML(this.node) : this.xml!;
+  }
+
+  private static parse(xml: string,
+                       namespaces: Record<string, string>): Node | null {
+    const decls = Object.keys(namespaces).map((prefix) => {
+      const attr = prefix === "" ? "xmlns" : `xmlns:${prefix}`;
+      return ` ${attr}="${namespaces[prefix].replace(/&/g, "&amp;")
+        .replace(/"/g, "&quot;").replace(/</g, "&lt;")}"`;
+    }).join("");
+    const doc = new DOMParser().parseFromString(`<_${decls}>${xml}</_>`,
+                                                "text/xml");
+    return doc.documentElement.firstChild;
+  }
+}
+
 /**
  * Undo operation for [["wed/tree-updater".InsertNodeAtEvent]].
  *
@@ -25,8 +247,9 @@ function getOuterHTML(node: Node | undefined | null): string {
  * @private
  */
 class InsertNodeAtUndo extends undo.Undo {
-  private readonly parentPath: string;
-  private node: Node | undefined;
+  private readonly parentPath: ArrayPath;
+  private snapshot: Snapshot | undefined;
+  private undone: boolean = false;
 
   /**
    * @param treeUpdater The tree updater to use to perform undo or redo
@@ -38,38 +261,57 @@ class InsertNodeAtUndo extends undo.Undo {
   constructor(private readonly treeUpdater: TreeUpdater,
               parent: Node, private readonly index: number) {
     super("InsertNodeAtUndo");
-    this.parentPath = treeUpdater.nodeToPath(parent);
+    this.parentPath = treeUpdater.nodeToArrayPath(parent);
 
     // We do not take a node parameter and save it here because further
     // manipulations could take the node out of the tree. So we cannot rely in a
     // reference to a node. What we do instead is keep a path to the parent and
-    // the index. The ``node`` property will be filled as needed when
-    // undoing/redoing.
+    // the index. The ``snapshot`` property will be filled as needed when
+    // undoing.
   }
 
   performUndo(): void {
-    if (this.node !== undefined) {
+    if (this.undone) {
       throw new Error("undo called twice in a row");
     }
-    const parent = this.treeUpdater.pathToNode(this.parentPath)!;
-    this.node = parent.childNodes[this.index].cloneNode(true);
-    this.treeUpdater.deleteNode(parent.childNodes[this.index]);
+    const parent = this.treeUpdater.arrayPathToNode(this.parentPath)!;
+    const node = parent.childNodes[this.index];
+    // The history is linear, so whenever this operation is undone again, the
+    // node is in the state it was in the first time around, and the snapshot
+    // we took then is still good.
+    if (this.snapshot === undefined) {
+      this.snapshot = new Snapshot(node);
+    }
+    this.treeUpdater.deleteNode(node);
+    this.undone = true;
   }
 
   performRedo(): void {
-    if (this.node === undefined) {
+    if (!this.undone) {
       throw new Error("redo called twice in a row");
     }
-    const parent = this.treeUpdater.pathToNode(this.parentPath)!;
-    this.treeUpdater.insertNodeAt(parent, this.index, this.node);
-    this.node = undefined;
+    const parent = this.treeUpdater.arrayPathToNode(this.parentPath)!;
+    this.treeUpdater.insertNodeAt(parent, this.index,
+                                  this.snapshot!.restore(parent.ownerDocument));
+    this.undone = false;
+  }
+
+  getSize(): number {
+    return super.getSize() +
+      (this.snapshot !== undefined ? this.snapshot.getSize() : 0);
+  }
+
+  compact(): void {
+    if (this.snapshot !== undefined) {
+      this.snapshot.compact();
+    }
   }
 
   toString(): string {
     return [this.desc, "\n",
-            " Parent path: ", this.parentPath, "\n",
+            " Parent path: ", arrayPathToPath(this.parentPath), "\n",
             " Index: ", this.index, "\n",
-            " Node: ", getOuterHTML(this.node), "\n"].join("");
+            " Node: ", String(this.snapshot), "\n"].join("");
   }
 }
 
@@ -79,7 +321,7 @@ class InsertNodeAtUndo extends undo.Undo {
  * @private
  */
 class SetTextNodeValueUndo extends undo.Undo {
-  private readonly nodePath: string;
+  private readonly nodePath: ArrayPath;
 
   /**
    * @param treeUpdater The tree updater to use to perform undo or redo
@@ -89,24 +331,28 @@ class SetTextNodeValueUndo extends undo.Undo {
               node: Text, private readonly value: string,
               private readonly oldValue: string) {
     super("SetTextNodeValueUndo");
-    this.nodePath = treeUpdater.nodeToPath(node);
+    this.nodePath = treeUpdater.nodeToArrayPath(node);
   }
 
   performUndo(): void {
     // The node is necessarily a text node.
-    const node = this.treeUpdater.pathToNode(this.nodePath) as Text;
+    const node = this.treeUpdater.arrayPathToNode(this.nodePath) as Text;
     this.treeUpdater.setTextNodeValue(node, this.oldValue);
   }
 
   performRedo(): void {
     // The node is necessarily a text node.
-    const node = this.treeUpdater.pathToNode(this.nodePath) as Text;
+    const node = this.treeUpdater.arrayPathToNode(this.nodePath) as Text;
     this.treeUpdater.setTextNodeValue(node, this.value);
   }
 
+  getSize(): number {
+    return super.getSize() + this.value.length + this.oldValue.length;
+  }
+
   toString(): string {
     return [this.desc, "\n",
-            " Node path: ", this.nodePath, "\n",
+            " Node path: ", arrayPathToPath(this.nodePath), "\n",
             " Value: ", this.value, "\n",
             " Old value: ", this.oldValue, "\n"].join("");
   }
@@ -118,9 +364,10 @@ class SetTextNodeValueUndo extends undo.Undo {
  * @private
  */
 class DeleteNodeUndo extends undo.Undo {
-  private readonly parentPath: string;
+  private readonly parentPath: ArrayPath;
   private readonly index: number;
-  private node: Node | undefined;
+  private readonly snapshot: Snapshot;
+  private undone: boolean = false;
 
   /**
    * @param treeUpdater The tree updater to use to perform undo or redo
@@ -129,34 +376,45 @@ class DeleteNodeUndo extends undo.Undo {
   constructor(private readonly treeUpdater: TreeUpdater, node: Node) {
     super("DeleteNodeUndo");
     const parent = node.parentNode!;
-    this.parentPath = treeUpdater.nodeToPath(parent);
+    this.parentPath = treeUpdater.nodeToArrayPath(parent);
     this.index = indexOf(parent.childNodes, node);
-    this.node = node.cloneNode(true);
+    this.snapshot = new Snapshot(node);
   }
 
   performUndo(): void {
-    if (this.node === undefined) {
+    if (this.undone) {
       throw new Error("undo called twice in a row");
     }
-    const parent = this.treeUpdater.pathToNode(this.parentPath)!;
-    this.treeUpdater.insertNodeAt(parent, this.index, this.node);
-    this.node = undefined;
+    const parent = this.treeUpdater.arrayPathToNode(this.parentPath)!;
+    this.treeUpdater.insertNodeAt(parent, this.index,
+                                  this.snapshot.restore(parent.ownerDocument));
+    this.undone = true;
   }
 
   performRedo(): void {
-    if (this.node !== undefined) {
+    if (!this.undone) {
       throw new Error("redo called twice in a row");
     }
-    const parent = this.treeUpdater.pathToNode(this.parentPath)!;
-    this.node = parent.childNodes[this.index].cloneNode(true);
+    // The history is linear, so the node we delete is in the state the
+    // snapshot recorded, and we do not need a new snapshot.
+    const parent = this.treeUpdater.arrayPathToNode(this.parentPath)!;
     this.treeUpdater.deleteNode(parent.childNodes[this.index]);
+    this.undone = false;
+  }
+
+  getSize(): number {
+    return super.getSize() + this.snapshot.getSize();
+  }
+
+  compact(): void {
+    this.snapshot.compact();
   }
 
   toString(): string {
     return [this.desc, "\n",
-            " Parent path: ", this.parentPath, "\n",
+            " Parent path: ", arrayPathToPath(this.parentPath), "\n",
             " Index: ", this.index, "\n",
-            " Node: ", getOuterHTML(this.node), "\n"].join("");
+            " Node: ", String(this.snapshot), "\n"].join("");
   }
 }
 
@@ -166,7 +424,7 @@ class DeleteNodeUndo extends undo.Undo {
  * @private
  */
 class SetAttributeNSUndo extends undo.Undo {
-  private readonly nodePath: string;
+  private readonly nodePath: ArrayPath;
 
   /**
    * @param treeUpdater The tree updater to use to perform undo or redo
@@ -178,24 +436,30 @@ class SetAttributeNSUndo extends undo.Undo {
               private readonly oldValue: string | null,
               private readonly newValue: string | null) {
     super("SetAttributeNSUndo");
-    this.nodePath = treeUpdater.nodeToPath(node);
+    this.nodePath = treeUpdater.nodeToArrayPath(node);
   }
 
   performUndo(): void {
-    const node = this.treeUpdater.pathToNode(this.nodePath) as Element;
+    const node = this.treeUpdater.arrayPathToNode(this.nodePath) as Element;
     this.treeUpdater.setAttributeNS(node, this.ns, this.attribute,
                                     this.oldValue);
   }
 
   performRedo(): void {
-    const node = this.treeUpdater.pathToNode(this.nodePath) as Element;
+    const node = this.treeUpdater.arrayPathToNode(this.nodePath) as Element;
     this.treeUpdater.setAttributeNS(node, this.ns, this.attribute,
                                     this.newValue);
   }
 
+  getSize(): number {
+    return super.getSize() +
+      (this.oldValue !== null ? this.oldValue.length : 0) +
+      (this.newValue !== null ? this.newValue.length : 0);
+  }
+
   toString(): string {
     return [this.desc, "\n",
-            " Node path: ", this.nodePath, "\n",
+            " Node path: ", arrayPathToPath(this.nodePath), "\n",
             " Namespace: ", this.ns, "\n",
             " Attribute Name: ", this.attribute, "\n",
             " New value: ", this.newValue, "\n",
@@ -289,4 +553,4 @@ export class UndoRecorder {
 //  LocalWords:  domutil insertNodeAt setTextNodeValue deleteNode ev param MPL
 //  LocalWords:  InsertNodeAtUndo SetTextNodeValueUndo DeleteNodeUndo Dubeau
 //  LocalWords:  pathToNode nodeToPath Mangalam SetAttributeNSUndo
-//  LocalWords:  BeforeDeleteNode SetAttributeNS suppressRecording
+//  LocalWords:  BeforeDeleteNode SetAttributeNS suppressRecording xmlns
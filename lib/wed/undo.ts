@@ -24,8 +24,36 @@ interface ListItem {
   undo: Undo;
 
   subscription: Subscription;
+
+  /** The size of the operation the last time we checked. */
+  size: number;
+
+  /** Whether the operation has been compacted. */
+  compacted: boolean;
+}
+
+export interface UndoListOptions {
+  /**
+   * The estimated memory, in characters, that the operations in the list may
+   * use. When the operations use more than this, the oldest ones are
+   * forgotten, though the latest operation is always kept. By default, there
+   * is no limit.
+   */
+  budget?: number;
+
+  /**
+   * The number of recent operations which are kept as they are. The operations
+   * older than this are compacted. By default, operations are never compacted.
+   */
+  compactAfter?: number;
 }
 
+/**
+ * The estimated memory used by an undo operation, in characters, apart from
+ * the data it holds.
+ */
+const UNDO_COST = 100;
+
 /**
  * Records operations that may be undone or redone. It maintains a single list
  * of [[Undo]] objects in the order by which they are passed to the
@@ -34,17 +62,40 @@ interface ListItem {
  * This object maintains a single history. So if operations A, B, C, D are
  * recorded, C and D are undone and then E is recorded, the list of recorded
  * operations will then be A, B, E.
+ *
+ * The memory that the list uses may be bounded, by compacting old operations,
+ * and by forgetting the oldest operations. See [[UndoListOptions]].
  */
 export class UndoList {
   private readonly stack: UndoGroup[] = [];
   private list: ListItem[] = [];
   private index: number = -1;
   private _undoingOrRedoing: boolean = false;
+  private readonly budget: number | undefined;
+  private readonly compactAfter: number | undefined;
+
+  /** The sum of the sizes of the operations in the list. */
+  private total: number = 0;
 
   private readonly _events: Subject<UndoEvents> = new Subject();
 
   readonly events: Observable<UndoEvents> = this._events.asObservable();
 
+  /**
+   * @param options The options governing the memory used by the list.
+   */
+  constructor(options: UndoListOptions = {}) {
+    const { budget, compactAfter } = options;
+    if (budget !== undefined && budget < 0) {
+      throw new Error("budget cannot be negative");
+    }
+    if (compactAfter !== undefined && compactAfter < 0) {
+      throw new Error("compactAfter cannot be negative");
+    }
+    this.budget = budget;
+    this.compactAfter = compactAfter;
+  }
+
   /**
    * Reset the list to its initial state **without** undoing operations. The
    * list effectively forgets old undo operations.
@@ -62,6 +113,7 @@ export class UndoList {
       subscription.unsubscribe();
     }
     this.list = [];
+    this.total = 0;
   }
 
   /**
@@ -82,19 +134,65 @@ export class UndoList {
       this.list = this.list.splice(0, this.index + 1);
 
       // We need to cleanup the old subscriptions.
-      for (const { subscription } of oldList) {
+      for (const { subscription, size } of oldList) {
         subscription.unsubscribe();
+        this.total -= size;
       }
 
       // This is the only place we need to subscribe. We do not need to
       // subscribe to individual object that are in undo groups because the
       // groups forward events that happen on their inner objects. Also, a group
       // need not be subscribed to until ``record`` is called for it.
+      const size = obj.getSize();
       this.list.push({
         undo: obj,
         subscription: obj.events.subscribe(this._events),
+        size,
+        compacted: false,
       });
+      this.total += size;
       this.index++;
+      this.trim();
+    }
+  }
+
+  /**
+   * Update the size we have recorded for an operation.
+   */
+  private resize(item: ListItem): void {
+    const size = item.undo.getSize();
+    this.total += size - item.size;
+    item.size = size;
+  }
+
+  /**
+   * Compact the old operations and forget the oldest ones, as the options
+   * require.
+   */
+  private trim(): void {
+    const list = this.list;
+    if (this.compactAfter !== undefined) {
+      // The compacted operations are always at the start of the list, so we
+      // can stop at the first operation that is already compacted.
+      for (let i = list.length - this.compactAfter - 1;
+           i >= 0 && !list[i].compacted; --i) {
+        const item = list[i];
+        item.undo.compact();
+        item.compacted = true;
+        this.resize(item);
+      }
+    }
+
+    if (this.budget !== undefined) {
+      // We forget only operations that may be undone, as redoing operations
+      // after an operation that is gone would not work. And we always keep the
+      // latest one.
+      while (this.total > this.budget && this.index > 0) {
+        const { subscription, size } = list.shift()!;
+        subscription.unsubscribe();
+        this.total -= size;
+        this.index--;
+      }
     }
   }
 
@@ -117,7 +215,15 @@ export class UndoList {
       this.endGroup();
     }
     if (this.index >= 0) {
-      this.list[this.index--].undo.undo();
+      const item = this.list[this.index--];
+      item.undo.undo();
+      // Undoing may change the data that the operation holds, and new data
+      // must be compacted too if the operation is old.
+      if (item.compacted) {
+        item.undo.compact();
+      }
+      this.resize(item);
+      this.trim();
     }
     this._undoingOrRedoing = false;
   }
@@ -136,7 +242,13 @@ export class UndoList {
     }
     this._undoingOrRedoing = true;
     if (this.index < this.list.length - 1) {
-      this.list[++this.index].undo.redo();
+      const item = this.list[++this.index];
+      item.undo.redo();
+      if (item.compacted) {
+        item.undo.compact();
+      }
+      this.resize(item);
+      this.trim();
     }
     this._undoingOrRedoing = false;
   }
@@ -280,6 +392,24 @@ export abstract class Undo {
    */
   protected abstract performRedo(): void;
 
+  /**
+   * @returns The estimated memory used by this operation, in characters.
+   * Operations which hold data should add the size of the data to what the
+   * default implementation returns.
+   */
+  getSize(): number {
+    return UNDO_COST + this.desc.length;
+  }
+
+  /**
+   * Reduce the memory used by this operation, possibly at the cost of making
+   * undoing or redoing it slower. [[UndoList]] calls this on operations that
+   * have grown old. The default implementation does nothing.
+   */
+  compact(): void {
+    // by default we do nothing
+  }
+
   /**
    * @returns The description of this object.
    */
@@ -314,6 +444,20 @@ export class UndoGroup extends Undo {
     }
   }
 
+  getSize(): number {
+    let ret = super.getSize();
+    for (const it of this.list) {
+      ret += it.getSize();
+    }
+    return ret;
+  }
+
+  compact(): void {
+    for (const it of this.list) {
+      it.compact();
+    }
+  }
+
   /**
    * Records an operation as part of this group.
    *
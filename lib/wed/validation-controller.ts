@@ -117,6 +117,27 @@ function convertNames(error: ValidationError,
   return convertedNames;
 }
 
+/**
+ * The position of an error marker, computed but not yet applied to the marker.
+ */
+interface MarkerPosition {
+  marker: HTMLElement;
+  top: number;
+  left: number;
+  height: number;
+}
+
+/**
+ * The geometry of the scroller, read once per batch of markers.
+ */
+interface ScrollerGeometry {
+  top: number;
+  left: number;
+  bottom: number;
+  scrollTop: number;
+  scrollLeft: number;
+}
+
 /**
  * The click event handler to use on list items created by the controller.
  */
@@ -142,6 +163,43 @@ export class ValidationController {
   private processErrorsDelay: number = 500;
   private _errors: GUIValidationError[] = [];
 
+  /**
+   * The marker positions that have been computed but not yet written to the
+   * markers. We compute the positions of a whole batch of markers before
+   * writing any of them so that the browser does not have to lay out the page
+   * anew for each marker.
+   */
+  private pendingPositions: MarkerPosition[] = [];
+
+  /**
+   * The geometry of the scroller. It is read once for all the markers of a
+   * batch, and discarded once the positions of the batch are written.
+   */
+  private scrollerGeometry: ScrollerGeometry | undefined;
+
+  /**
+   * The font sizes of the elements on which markers are placed. The cache is
+   * emptied when the errors are cleared or recreated.
+   */
+  private fontSizes: WeakMap<Element, number> = new WeakMap();
+
+  /**
+   * Whether some markers were not repositioned because they were too far from
+   * the visible part of the document.
+   */
+  private staleMarkers: boolean = false;
+
+  /**
+   * Whether the validator is done validating the document.
+   */
+  private validated: boolean = false;
+
+  /**
+   * The functions to call once the validator is done and the errors it
+   * reported have been processed.
+   */
+  private validationCompleteResolvers: (() => void)[] = [];
+
   private readonly $errorList: JQuery;
 
   /**
@@ -190,6 +248,13 @@ export class ValidationController {
       "error", this.onValidatorError.bind(this));
     this.validator.events.addEventListener(
       "reset-errors", this.onResetErrors.bind(this));
+    this.scroller.events.subscribe(() => {
+      // Markers that were skipped during the last refresh may now be visible.
+      if (this.staleMarkers) {
+        this.staleMarkers = false;
+        this.refreshErrors();
+      }
+    });
   }
 
   /**
@@ -223,15 +288,28 @@ export class ValidationController {
    */
   private onValidatorStateChange(workingState: WorkingStateData): void {
     const { state, partDone } = workingState;
+    this.validated = state === WorkingState.VALID ||
+      state === WorkingState.INVALID;
     if (state === WorkingState.WORKING) {
       // Do not show changes less than 5%
       if (partDone - this.lastDoneShown < 0.05) {
         return;
       }
     }
-    else if (state === WorkingState.VALID || state === WorkingState.INVALID) {
+    else if (this.validated) {
       // We're done so we might as well process the errors right now.
       this.processErrors();
+
+      const resolvers = this.validationCompleteResolvers;
+      if (resolvers.length !== 0) {
+        this.validationCompleteResolvers = [];
+        // tslint:disable-next-line:no-floating-promises
+        this.processErrorsRunner.onCompleted().then(() => {
+          for (const resolve of resolvers) {
+            resolve();
+          }
+        });
+      }
     }
 
     this.lastDoneShown = partDone;
@@ -244,6 +322,22 @@ export class ValidationController {
     this.validationMessage.textContent = stateToStr[state];
   }
 
+  /**
+   * @returns A promise that resolves once the validator is done validating the
+   * document and the errors it reported are shown. If the validator is done
+   * now, the promise resolves once the errors are shown. Otherwise, it
+   * resolves after the validator is next done.
+   */
+  validationComplete(): Promise<void> {
+    if (this.validated) {
+      return this.processErrorsRunner.onCompleted().then(() => undefined);
+    }
+
+    return new Promise((resolve) => {
+      this.validationCompleteResolvers.push(resolve);
+    });
+  }
+
   /**
    * Handles a validation error reported by the validator. It records the error
    * and schedule future processing of the errors.
@@ -439,22 +533,22 @@ export class ValidationController {
       }
     }
 
-    // Update the marker's location.
+    // Compute the marker's location. It is written to the marker by
+    // flushMarkerPositions.
     if (marker !== undefined) {
       const { top, left } = boundaryXY(insertAt);
-      const { scrollTop, scrollLeft } = this.scroller;
-      const scrollerPos = this.scroller.getBoundingClientRect();
-      const fontSize =
-        parseFloat(this.editor.window.getComputedStyle(closestElement)
-                   .fontSize!);
+      const scroller = this.getScrollerGeometry();
+      const fontSize = this.getFontSize(closestElement);
       const height = fontSize * 0.2;
-      marker.style.height = `${height}px`;
-      // We move down from the top of the box produced by boundaryXY because
-      // when targeting parent, it may return a box which is as high as the
-      // parent's contents.
-      marker.style.top =
-        `${top + fontSize - height - scrollerPos.top + scrollTop}px`;
-      marker.style.left = `${left - scrollerPos.left + scrollLeft}px`;
+      this.pendingPositions.push({
+        marker,
+        height,
+        // We move down from the top of the box produced by boundaryXY because
+        // when targeting parent, it may return a box which is as high as the
+        // parent's contents.
+        top: top + fontSize - height - scroller.top + scroller.scrollTop,
+        left: left - scroller.left + scroller.scrollLeft,
+      });
     }
 
     if (err.item === undefined) {
@@ -465,12 +559,97 @@ export class ValidationController {
     return true;
   }
 
+  /**
+   * Refresh the location of the marker of an error that has already been
+   * processed. The marker is left alone if the location of the error is not
+   * within one screen of the visible part of the document. It will be
+   * refreshed when the document is scrolled.
+   *
+   * @param err The error to refresh.
+   *
+   * @returns ``false`` if the error was not refreshed. ``true`` otherwise.
+   */
+  refreshError(err: GUIValidationError): boolean {
+    const { node: dataNode } = err.ev;
+    if (dataNode != null) {
+      const guiNode = getGUINodeIfExists(this.editor, dataNode);
+      const element = guiNode !== undefined && !isElement(guiNode) ?
+        guiNode.parentNode : guiNode;
+      if (isElement(element)) {
+        const scroller = this.getScrollerGeometry();
+        const margin = scroller.bottom - scroller.top;
+        const rect = element.getBoundingClientRect();
+        if (rect.bottom < scroller.top - margin ||
+            rect.top > scroller.bottom + margin) {
+          this.staleMarkers = true;
+          return false;
+        }
+      }
+    }
+
+    return this.processError(err);
+  }
+
+  /**
+   * Write to the markers the positions computed by [[processError]] since the
+   * last time this method was called.
+   */
+  flushMarkerPositions(): void {
+    for (const { marker, top, left, height } of this.pendingPositions) {
+      const style = marker.style;
+      style.height = `${height}px`;
+      style.top = `${top}px`;
+      style.left = `${left}px`;
+    }
+
+    this.pendingPositions = [];
+    this.scrollerGeometry = undefined;
+  }
+
+  /**
+   * Get the geometry of the scroller, reading it if it has not yet been read
+   * for the current batch of markers.
+   */
+  private getScrollerGeometry(): ScrollerGeometry {
+    let geometry = this.scrollerGeometry;
+    if (geometry === undefined) {
+      const { scrollTop, scrollLeft } = this.scroller;
+      const { top, left, bottom } = this.scroller.getBoundingClientRect();
+      geometry = this.scrollerGeometry =
+        { top, left, bottom, scrollTop, scrollLeft };
+    }
+
+    return geometry;
+  }
+
+  /**
+   * Get the font size of an element.
+   *
+   * @param element The element.
+   *
+   * @returns The font size in pixels.
+   */
+  private getFontSize(element: Element): number {
+    let fontSize = this.fontSizes.get(element);
+    if (fontSize === undefined) {
+      fontSize = parseFloat(this.editor.window.getComputedStyle(element)
+                            .fontSize!);
+      this.fontSizes.set(element, fontSize);
+    }
+
+    return fontSize;
+  }
+
   /**
    * Clear all validation errors. This makes the editor forget and updates the
    * GUI to remove all displayed errors.
    */
   private clearErrors(): void {
     this._errors = [];
+    this.pendingPositions = [];
+    this.scrollerGeometry = undefined;
+    this.fontSizes = new WeakMap();
+    this.staleMarkers = false;
     this.refreshErrorsRunner.stop();
     this.processErrorsRunner.stop();
 
@@ -510,6 +689,11 @@ export class ValidationController {
    */
   recreateErrors(): void {
     this.errorLayer.clear();
+    this.pendingPositions = [];
+    this.scrollerGeometry = undefined;
+    // The errors are recreated when the display of the document has changed,
+    // which may have changed the font sizes.
+    this.fontSizes = new WeakMap();
 
     const list = this.errorList;
     while (list.lastChild !== null) {
@@ -25,6 +25,18 @@ export interface ModeValidator {
  * A document validator.
  */
 export class Validator extends BaseValidator {
+  /**
+   * The number of times [[deferResets]] has been called without a matching
+   * call to [[flushResets]].
+   */
+  private resetDeferral: number = 0;
+
+  /**
+   * The node to which the validator must be reset once resets are no longer
+   * deferred.
+   */
+  private pendingReset: Node | undefined;
+
   /**
    * @param schema A path to the schema to pass to salve for validation. This is
    * a path that will be interpreted by RequireJS. The schema must have already
@@ -36,15 +48,86 @@ export class Validator extends BaseValidator {
    * document to validate but is not **part** of it.
    *
    * @param modeValidators The mode-specific validators to use.
+   *
+   * @param maxTimespan The maximum number of milliseconds a validation cycle
+   * may run before relinquishing control.
    */
   constructor(schema: Grammar, root: Element | Document,
-              private readonly modeValidators: ModeValidator[]) {
+              private readonly modeValidators: ModeValidator[],
+              maxTimespan: number = 100) {
     super(schema, root, {
       timeout: 0,
-      maxTimespan: 100,
+      maxTimespan,
     });
   }
 
+  /**
+   * Enter a state in which calls to [[resetTo]] are recorded rather than
+   * performed. Every reset throws away the validation work done past the point
+   * of reset, and tells listeners to clear the errors they know about. When a
+   * single operation changes the tree in many places, it is wasteful to reset
+   * for each change. Deferring the resets makes it so that only one reset, to
+   * the earliest node recorded, is performed when the state is exited.
+   *
+   * This method may be called multiple times, and [[flushResets]] must be
+   * called the same number of times to exit the state.
+   */
+  deferResets(): void {
+    this.resetDeferral++;
+  }
+
+  /**
+   * Exit the state entered by [[deferResets]]. If this call exits the state,
+   * the pending reset, if any, is performed.
+   */
+  flushResets(): void {
+    this.resetDeferral--;
+    if (this.resetDeferral < 0) {
+      throw new Error("flushResets underflow");
+    }
+
+    if (this.resetDeferral === 0) {
+      this.performPendingReset();
+    }
+  }
+
+  resetTo(node: Node): void {
+    // This method may be called by our parent's constructor, before our own
+    // fields are initialized. So we do not test for ``!== 0``.
+    if (!(this.resetDeferral > 0)) {
+      super.resetTo(node);
+      return;
+    }
+
+    const pending = this.pendingReset;
+    // We keep the node which comes first in document order. Note that
+    // ancestors precede their descendants.
+    if (pending === undefined ||
+        // tslint:disable-next-line:no-bitwise
+        (pending.compareDocumentPosition(node) &
+         Node.DOCUMENT_POSITION_PRECEDING) !== 0) {
+      this.pendingReset = node;
+    }
+  }
+
+  /**
+   * Perform the reset recorded while resets were deferred, if any. This must
+   * be done before querying the validator, because its state is stale until
+   * the reset is performed.
+   */
+  private performPendingReset(): void {
+    const pending = this.pendingReset;
+    if (pending !== undefined) {
+      this.pendingReset = undefined;
+      super.resetTo(pending);
+    }
+  }
+
+  start(): void {
+    this.performPendingReset();
+    super.start();
+  }
+
   /**
    * Runs document-wide validation specific to the mode passed to
    * the validator.
@@ -94,6 +177,8 @@ export class Validator extends BaseValidator {
     if (typeof index !== "number") {
       throw new Error("index must be a number");
     }
+
+    this.performPendingReset();
     return super.possibleAt(container, index, attributes);
   }
 
@@ -140,6 +225,7 @@ export class Validator extends BaseValidator {
       throw new Error("toParse must be defined");
     }
 
+    this.performPendingReset();
     return super.speculativelyValidate(container, index, toParse);
   }
 
@@ -189,6 +275,7 @@ export class Validator extends BaseValidator {
       throw new Error("toParse must be defined");
     }
 
+    this.performPendingReset();
     return super.speculativelyValidateFragment(container, index, toParse);
   }
 }
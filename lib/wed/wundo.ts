@@ -5,10 +5,11 @@
  * @copyright Mangalam Research Center for Buddhist Languages
  */
 
+import { ArrayPath } from "./dloc";
 import { Editor } from "./editor";
 import * as undo from "./undo";
 
-export type Caret = [string | undefined, number | undefined];
+export type Caret = [ArrayPath | undefined, number | undefined];
 
 /**
  * This class extends the vanilla UndoGroup class by recording the
@@ -58,7 +59,8 @@ corrupted state and thus an internal error`);
       // trap stupid mistakes in managing the data.
       return [undefined, undefined];
     }
-    return [this.editor.dataUpdater.nodeToPath(caret.node), caret.offset];
+    return [this.editor.dataUpdater.nodeToArrayPath(caret.node),
+            caret.offset];
   }
 
   /**
@@ -72,7 +74,7 @@ corrupted state and thus an internal error`);
       return;
     }
     this.editor.caretManager.setCaret(
-      this.editor.dataUpdater.pathToNode(caret[0]!), caret[1]);
+      this.editor.dataUpdater.arrayPathToNode(caret[0]!), caret[1]);
   }
 
   /**
@@ -0,0 +1,380 @@
+"""
+Generate large synthetic TEI or DocBook documents for load and
+performance testing.
+
+The documents are made of nested divisions (TEI ``div``, DocBook
+``chapter`` and ``section``) which contain a heading and paragraphs of
+mixed content. The header of the document and the words used in the
+text are taken from a sample document. The names of the elements and
+attributes used are checked against the schema of the vocabulary so
+that the documents are valid, except for the errors that are
+deliberately added.
+
+The output is written as it is generated so that documents of any size
+can be generated in constant memory.
+"""
+# The words of the sample are unicode, so the strings we format them
+# into must be unicode too under Python 2.
+from __future__ import unicode_literals
+
+import os
+import re
+import sys
+import random
+import argparse
+from xml.dom import minidom
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape, quoteattr
+
+_dirname = os.path.dirname(os.path.abspath(__file__))
+_topdir = os.path.dirname(_dirname)
+
+RNG_NS = "http://relaxng.org/ns/structure/1.0"
+
+# The name of an element and of an attribute that are not defined by
+# any of the schemas, and which we use to make errors.
+ERROR_ELEMENT = "bogus"
+ERROR_ATTRIBUTE = "bogus"
+
+
+class Vocabulary(object):
+    """
+    Describes how to generate a document in a specific XML vocabulary.
+    """
+
+    def __init__(self, namespace, root, sample, schema, top_division,
+                 division, heading, paragraph, inline, attributes,
+                 body_start, body_end):
+        self.namespace = namespace
+        # The name of the root element.
+        self.root = root
+        # The default sample and schema.
+        self.sample = sample
+        self.schema = schema
+        # The name of the divisions at the top level and the name of
+        # the divisions nested in other divisions.
+        self.top_division = top_division
+        self.division = division
+        self.heading = heading
+        self.paragraph = paragraph
+        # The elements that may appear in paragraphs.
+        self.inline = inline
+        # The attributes that may appear on all the elements we generate,
+        # apart from xml:id, which is always allowed.
+        self.attributes = attributes
+        # The markup that goes between the header and the divisions, and
+        # after the divisions.
+        self.body_start = body_start
+        self.body_end = body_end
+
+    def element_names(self):
+        return set([self.root, self.top_division, self.division,
+                    self.heading, self.paragraph] + list(self.inline))
+
+    def header(self, sample):
+        """
+        :returns: The serialization of the children of the root of the
+        sample that precede the body of the document.
+        """
+        doc = minidom.parse(sample)
+        parts = []
+        for child in doc.documentElement.childNodes:
+            if child.nodeType != child.ELEMENT_NODE:
+                continue
+            if child.localName in ("text", self.top_division):
+                break
+            strip_whitespace(child)
+            parts.append(child.toxml())
+        return "".join(parts)
+
+
+VOCABULARIES = {
+    "tei": Vocabulary(
+        namespace="http://www.tei-c.org/ns/1.0",
+        root="TEI",
+        sample=os.path.join(_topdir, "sample_documents",
+                            "sketch_for_a_medical_education.xml"),
+        schema=os.path.join(_topdir, "schemas", "myTEI.rng"),
+        top_division="div",
+        division="div",
+        heading="head",
+        paragraph="p",
+        inline=("hi", "term"),
+        attributes={
+            "n": lambda rand: str(rand.randint(1, 1000)),
+            "rend": lambda rand: rand.choice(["bold", "italic", "small"]),
+            "xml:lang": lambda rand: rand.choice(["en", "fr", "la"]),
+        },
+        body_start="<text><body>",
+        body_end="</body></text>"),
+    "docbook": Vocabulary(
+        namespace="http://docbook.org/ns/docbook",
+        root="book",
+        sample=os.path.join(_topdir, "sample_documents", "docbook_book.xml"),
+        schema=os.path.join(_topdir, "schemas", "docbook.rng"),
+        top_division="chapter",
+        division="section",
+        heading="title",
+        paragraph="para",
+        inline=("emphasis", "phrase"),
+        attributes={
+            "role": lambda rand: rand.choice(["note", "summary", "detail"]),
+            "xml:lang": lambda rand: rand.choice(["en", "fr", "la"]),
+        },
+        body_start="",
+        body_end=""),
+}
+
+# These elements may contain significant whitespace, so we do not
+# strip whitespace from them.
+PRESERVE_SPACE = frozenset(["p", "para", "cit", "quote", "lbl", "title"])
+
+
+def strip_whitespace(node):
+    """
+    Remove the text nodes that contain only whitespace, except in the
+    elements that may contain significant whitespace. This produces the
+    same result as the conversion applied to the test files.
+    """
+    if node.localName in PRESERVE_SPACE:
+        return
+    for child in list(node.childNodes):
+        if child.nodeType == child.TEXT_NODE:
+            if child.data.strip() == "":
+                node.removeChild(child)
+        elif child.nodeType == child.ELEMENT_NODE:
+            strip_whitespace(child)
+
+
+def schema_names(schema):
+    """
+    :returns: The set of the names of the elements and attributes
+    declared in a Relax NG schema in XML syntax.
+    """
+    names = set()
+    element = "{" + RNG_NS + "}element"
+    attribute = "{" + RNG_NS + "}attribute"
+    for _, el in ElementTree.iterparse(schema):
+        if el.tag in (element, attribute):
+            name = el.get("name")
+            if name is not None:
+                names.add(name)
+        el.clear()
+    return names
+
+
+def sample_words(sample):
+    """
+    :returns: The list of the words that appear in the text of a
+    sample document.
+    """
+    words = []
+    for _, el in ElementTree.iterparse(sample):
+        for text in (el.text, el.tail):
+            if text:
+                words.extend(re.findall(r"\w+", text, re.UNICODE))
+    if not words:
+        raise ValueError("there is no text in " + sample)
+    return words
+
+
+def parse_size(value):
+    """
+    Parse a size in bytes, which may be suffixed with K, M or G.
+    """
+    match = re.match(r"^(\d+)([KMG]?)$", value.upper())
+    if not match:
+        raise argparse.ArgumentTypeError("invalid size: " + value)
+    return int(match.group(1)) * \
+        {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}[match.group(2)]
+
+
+def fraction(value):
+    ret = float(value)
+    if ret < 0 or ret > 1:
+        raise argparse.ArgumentTypeError("must be between 0 and 1: " + value)
+    return ret
+
+
+class Writer(object):
+    """
+    Writes text to a binary stream and counts the bytes written.
+    """
+
+    def __init__(self, out):
+        self.out = out
+        self.size = 0
+
+    def write(self, text):
+        data = text.encode("utf-8")
+        self.size += len(data)
+        self.out.write(data)
+
+
+class Generator(object):
+    """
+    Generates a document.
+
+    :param vocabulary: The :class:`Vocabulary` of the document.
+    :param header: The serialized header of the document.
+    :param words: The words to use in the text.
+    :param args: The parsed command line arguments.
+    """
+
+    def __init__(self, vocabulary, header, words, args):
+        self.vocabulary = vocabulary
+        self.header = header
+        self.words = words
+        self.args = args
+        self.rand = random.Random(args.seed)
+        self.next_id = 0
+
+    def text(self, low, high):
+        return escape(" ".join(self.rand.choice(self.words)
+                               for _ in range(self.rand.randint(low, high))))
+
+    def attributes(self):
+        """
+        :returns: The serialized attributes of an element.
+        """
+        args = self.args
+        rand = self.rand
+        ret = []
+        if rand.random() < args.attribute_density:
+            self.next_id += 1
+            ret.append(("xml:id", "gen-{0}".format(self.next_id)))
+            for name, make in sorted(self.vocabulary.attributes.items()):
+                if rand.random() < args.attribute_density:
+                    ret.append((name, make(rand)))
+        return "".join(" {0}={1}".format(name, quoteattr(value))
+                       for name, value in ret)
+
+    def paragraph(self, out):
+        vocabulary = self.vocabulary
+        rand = self.rand
+        error = rand.random() < self.args.error_rate
+        # We produce two kinds of errors: an attribute that is not allowed
+        # or an element that is not allowed.
+        bad_attribute = error and rand.random() < 0.5
+        bad_element = error and not bad_attribute
+        attributes = self.attributes()
+        if bad_attribute:
+            attributes += ' {0}="1"'.format(ERROR_ATTRIBUTE)
+        out.write("<{0}{1}>".format(vocabulary.paragraph, attributes))
+        runs = rand.randint(3, 8)
+        error_at = rand.randint(0, runs - 1) if bad_element else None
+        for ix in range(runs):
+            if ix == error_at:
+                out.write("<{0}>{1}</{0}>".format(ERROR_ELEMENT,
+                                                  self.text(1, 3)))
+            if rand.random() < self.args.mixed_content:
+                name = rand.choice(vocabulary.inline)
+                out.write("<{0}{1}>{2}</{0}>".format(name, self.attributes(),
+                                                     self.text(1, 4)))
+            else:
+                out.write(self.text(3, 12))
+            out.write(" ")
+        out.write("</{0}>".format(vocabulary.paragraph))
+
+    def division(self, out, name, depth):
+        vocabulary = self.vocabulary
+        args = self.args
+        out.write("<{0}{1}>".format(name, self.attributes()))
+        out.write("<{0}>{1}</{0}>".format(vocabulary.heading,
+                                          self.text(2, 6)))
+        for _ in range(args.paragraphs):
+            self.paragraph(out)
+        if depth > 1:
+            for _ in range(args.branching):
+                self.division(out, vocabulary.division, depth - 1)
+        out.write("</{0}>".format(name))
+
+    def generate(self, out):
+        vocabulary = self.vocabulary
+        args = self.args
+        out.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        out.write('<{0} xmlns="{1}">'.format(vocabulary.root,
+                                             vocabulary.namespace))
+        out.write(self.header)
+        out.write(vocabulary.body_start)
+        # We always produce at least one division.
+        while True:
+            self.division(out, vocabulary.top_division, args.depth)
+            if out.size >= args.size:
+                break
+        out.write(vocabulary.body_end)
+        out.write("</{0}>\n".format(vocabulary.root))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate a synthetic document for testing wed.")
+    parser.add_argument("vocabulary", choices=sorted(VOCABULARIES.keys()),
+                        help="The vocabulary of the document.")
+    parser.add_argument("--size", type=parse_size, default=parse_size("1M"),
+                        help="The approximate size of the document in bytes. "
+                        "The suffixes K, M and G are allowed. "
+                        "(Default: 1M.)")
+    parser.add_argument("--depth", type=int, default=2,
+                        help="The depth to which divisions are nested. "
+                        "(Default: 2.)")
+    parser.add_argument("--branching", type=int, default=2,
+                        help="The number of divisions in each division that "
+                        "is not at the maximum depth. (Default: 2.)")
+    parser.add_argument("--paragraphs", type=int, default=5,
+                        help="The number of paragraphs in each division. "
+                        "(Default: 5.)")
+    parser.add_argument("--attribute-density", type=fraction, default=0.2,
+                        help="The probability that an element has "
+                        "attributes. (Default: 0.2.)")
+    parser.add_argument("--mixed-content", type=fraction, default=0.3,
+                        help="The probability that a run of text in a "
+                        "paragraph is an element rather than plain text. "
+                        "(Default: 0.3.)")
+    parser.add_argument("--error-rate", type=fraction, default=0,
+                        help="The probability that a paragraph is invalid. "
+                        "(Default: 0.)")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="The seed of the random number generator. "
+                        "(Default: 0.)")
+    parser.add_argument("--sample",
+                        help="The document from which the header and the "
+                        "words are taken. (Default: a document in "
+                        "sample_documents.)")
+    parser.add_argument("--schema",
+                        help="The Relax NG schema, in XML syntax, of the "
+                        "vocabulary. (Default: a schema in schemas.)")
+    parser.add_argument("-o", "--output",
+                        help="The file to write. (Default: stdout.)")
+    args = parser.parse_args()
+
+    if args.depth < 1:
+        parser.error("the depth must be at least 1")
+
+    vocabulary = VOCABULARIES[args.vocabulary]
+    sample = args.sample or vocabulary.sample
+    schema = args.schema or vocabulary.schema
+
+    names = schema_names(schema)
+    missing = [name for name in sorted(vocabulary.element_names() |
+                                       set(vocabulary.attributes.keys()) |
+                                       set(["xml:id"]))
+               if name not in names]
+    if missing:
+        parser.error("{0} does not declare: {1}"
+                     .format(schema, " ".join(missing)))
+    if ERROR_ELEMENT in names:
+        parser.error("{0} declares {1}, which we use to make errors"
+                     .format(schema, ERROR_ELEMENT))
+
+    generator = Generator(vocabulary, vocabulary.header(sample),
+                          sample_words(sample), args)
+    if args.output:
+        with open(args.output, "wb") as out:
+            generator.generate(Writer(out))
+    else:
+        generator.generate(Writer(getattr(sys.stdout, "buffer", sys.stdout)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,611 @@
+"""
+Simulate many editors saving documents at once, to measure how a server
+implementing wed's save protocol behaves under load.
+
+The simulated editors speak the protocol that ``AjaxSaver`` (see
+``lib/wed/savers/ajax.ts``) speaks: they post ``check``, ``save``,
+``autosave`` and ``recover`` commands as form data, send the ETag of the
+last successful save in ``If-Match``, and interpret the ``messages`` of
+the replies the same way. A 412 reply is a ``save_edited`` conflict.
+
+By default, the editors talk to a stand-in server started by this script.
+The stand-in stores the documents in memory, detects conflicts with
+ETags, and can add latency and inject failures. Use ``--url`` to test
+another server instead.
+
+At the end of a run, the script reports the throughput, the latency
+percentiles of each command, the outcomes of the requests and the rate of
+conflicts.
+"""
+import os
+import json
+import time
+import random
+import socket
+import hashlib
+import argparse
+import threading
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import urlencode, urlparse, parse_qs
+    from urllib.request import Request, urlopen
+    from urllib.error import HTTPError, URLError
+    from http.client import HTTPException
+except ImportError:  # Python 2
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urllib import urlencode
+    from urlparse import urlparse, parse_qs
+    from urllib2 import Request, urlopen, HTTPError, URLError
+    from httplib import HTTPException
+
+_dirname = os.path.dirname(os.path.abspath(__file__))
+_topdir = os.path.dirname(_dirname)
+
+DEFAULT_DOCUMENT = os.path.join(_topdir, "sample_documents",
+                                "sketch_for_a_medical_education.xml")
+
+COMMANDS = ("check", "save", "autosave", "recover")
+
+# The outcome recorded when the server cannot be contacted, which
+# AjaxSaver reports as ``save_disconnected``.
+DISCONNECTED = "save_disconnected"
+
+STATISTICS = (50, 90, 95, 99)
+
+
+def etag_of(data):
+    return '"{0}"'.format(hashlib.md5(data.encode("utf-8")).hexdigest())
+
+
+#
+# The stand-in server.
+#
+
+class Store(object):
+    """
+    The documents held by the stand-in server. Documents are created
+    with the content of a template document the first time they are
+    accessed.
+    """
+
+    def __init__(self, template):
+        self.template = template
+        self.documents = {}
+        self.lock = threading.Lock()
+
+    def get(self, name):
+        with self.lock:
+            return self._get(name)
+
+    def _get(self, name):
+        ret = self.documents.get(name)
+        if ret is None:
+            ret = self.documents[name] = (self.template,
+                                          etag_of(self.template))
+        return ret
+
+    def put(self, name, data, if_match):
+        """
+        Store a document if its current ETag matches ``if_match``. An
+        ``if_match`` of ``None`` always matches.
+
+        :returns: The new ETag, or ``None`` if there was a conflict.
+        """
+        with self.lock:
+            _, etag = self._get(name)
+            if if_match is not None and if_match != etag:
+                return None
+            etag = etag_of(data)
+            self.documents[name] = (data, etag)
+            return etag
+
+
+class StandInServer(ThreadingMixIn, HTTPServer):
+    """
+    A server that implements wed's save protocol. ``GET`` on a path
+    returns the document stored at that path, with its ETag. ``POST`` on
+    a path performs a command on the document.
+
+    :param faults: A dictionary with the keys ``latency`` and ``jitter``
+    (in seconds) and ``transient``, ``fatal`` and ``disconnect`` (the
+    probabilities of each failure).
+    """
+    daemon_threads = True
+    # The default is too low for hundreds of clients.
+    request_queue_size = 1024
+    allow_reuse_address = True
+
+    def __init__(self, address, store, faults, seed=None):
+        HTTPServer.__init__(self, address, StandInHandler)
+        self.store = store
+        self.faults = faults
+        self.rand = random.Random(seed)
+        self.rand_lock = threading.Lock()
+
+    def random(self):
+        with self.rand_lock:
+            return self.rand.random()
+
+    def delay(self):
+        faults = self.faults
+        with self.rand_lock:
+            delay = faults["latency"] + \
+                self.rand.uniform(-faults["jitter"], faults["jitter"])
+        if delay > 0:
+            time.sleep(delay)
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *_args):
+        pass
+
+    def reply(self, status, body, headers=None):
+        body = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def reply_messages(self, types, etag=None):
+        self.reply(200,
+                   json.dumps({"messages": [{"type": t} for t in types]}),
+                   {"ETag": etag} if etag is not None else None)
+
+    def do_GET(self):
+        server = self.server
+        server.delay()
+        data, etag = server.store.get(urlparse(self.path).path)
+        self.reply(200, data, {"ETag": etag})
+
+    def do_POST(self):
+        server = self.server
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length).decode("utf-8")
+        fields = dict((key, value[0]) for key, value in
+                      parse_qs(body, keep_blank_values=True).items())
+        server.delay()
+
+        faults = server.faults
+        if server.random() < faults["disconnect"]:
+            # Drop the connection without replying.
+            self.close_connection = True
+            return
+
+        command = fields.get("command")
+        if command == "check":
+            self.reply_messages([])
+            return
+
+        if command not in ("save", "autosave", "recover"):
+            self.reply(400, json.dumps({"messages": []}))
+            return
+
+        if server.random() < faults["fatal"]:
+            self.reply_messages(["save_fatal_error"])
+            return
+
+        if server.random() < faults["transient"]:
+            self.reply_messages(["save_transient_error"])
+            return
+
+        # A recovery is the last chance to save the data, so it
+        # ignores conflicts.
+        if_match = self.headers.get("If-Match") \
+            if command != "recover" else None
+        etag = server.store.put(urlparse(self.path).path,
+                                fields.get("data", ""), if_match)
+        if etag is None:
+            self.reply(412, json.dumps({"messages": []}))
+            return
+
+        self.reply_messages(["save_successful"], etag)
+
+
+#
+# The simulated editors.
+#
+
+class Stats(object):
+    """
+    Collects the results of the requests made by the editors.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = dict((command, []) for command in COMMANDS)
+        self.outcomes = dict((command, {}) for command in COMMANDS)
+        self.bytes_sent = 0
+        self.sessions = 0
+
+    def record(self, command, latency, outcome, size):
+        with self.lock:
+            self.latencies[command].append(latency)
+            outcomes = self.outcomes[command]
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+            self.bytes_sent += size
+
+    def new_session(self):
+        with self.lock:
+            self.sessions += 1
+
+
+def percentile(values, pct):
+    """
+    :param values: The values, which must be sorted.
+    :param pct: The percentile, between 0 and 100.
+    :returns: The value at the percentile, by the nearest-rank method.
+    """
+    rank = int(round(pct / 100.0 * len(values) + 0.5)) - 1
+    return values[max(0, min(rank, len(values) - 1))]
+
+
+class Editor(threading.Thread):
+    """
+    Simulates a person editing a document in wed.
+
+    An editing session starts by loading the document, which provides
+    the initial ETag, and checking the server. The editor then modifies
+    the document from time to time, autosaves it when it has been
+    modified, and explicitly saves it now and then. A session ends when
+    a save fails in a way that ends editing in wed (a conflict or a
+    fatal error, which is followed by a recovery). The editor then
+    reloads the document and starts a new session.
+    """
+
+    def __init__(self, number, url, document, stats, args, deadline):
+        threading.Thread.__init__(self, name="editor-{0}".format(number))
+        self.daemon = True
+        self.url = url
+        self.document = document
+        self.stats = stats
+        self.args = args
+        self.deadline = deadline
+        self.rand = random.Random(args.seed * 100003 + number)
+        self.data = None
+        self.etag = None
+        self.dirty = False
+
+    def request(self, command, data=None):
+        """
+        Post a command.
+
+        :returns: The outcome of the request: the type of the message
+        that determines how wed would react to the reply.
+        """
+        fields = {"command": command, "version": self.args.version}
+        if data is not None:
+            fields["data"] = data
+        body = urlencode(dict((key, value.encode("utf-8"))
+                              for key, value in fields.items())) \
+            .encode("ascii")
+        headers = {"Content-Type": "application/x-www-form-urlencoded"}
+        # Like AjaxSaver, we send If-Match with every command.
+        if self.etag is not None:
+            headers["If-Match"] = self.etag
+        start = time.time()
+        reply_etag = None
+        try:
+            response = urlopen(Request(self.url, body, headers),
+                               timeout=self.args.timeout)
+            try:
+                reply = json.loads(response.read().decode("utf-8"))
+                reply_etag = response.info().get("ETag")
+            finally:
+                response.close()
+            types = [msg.get("type") for msg in reply.get("messages", [])]
+            outcome = self.outcome(command, types)
+        except HTTPError as ex:
+            outcome = "save_edited" if ex.code == 412 else \
+                "http_{0}".format(ex.code)
+        except (URLError, HTTPException, socket.error, ValueError):
+            outcome = DISCONNECTED
+        self.stats.record(command, time.time() - start, outcome, len(body))
+        if outcome == "save_successful":
+            self.etag = reply_etag
+        return outcome
+
+    @staticmethod
+    def outcome(command, types):
+        if command == "check":
+            return "ok"
+        # The order is the order in which AjaxSaver examines the messages.
+        for message in ("save_fatal_error", "save_transient_error",
+                        "save_edited", "version_too_old_error",
+                        "save_successful"):
+            if message in types:
+                return message
+        return "no_messages"
+
+    def load(self):
+        """
+        Load the document, as the page hosting wed would.
+        """
+        self.stats.new_session()
+        self.data = self.document
+        self.etag = None
+        self.dirty = False
+        if self.args.url is not None:
+            # We do not know how the document is loaded from a foreign
+            # server.
+            return True
+        try:
+            response = urlopen(self.url, timeout=self.args.timeout)
+            try:
+                self.data = response.read().decode("utf-8")
+                self.etag = response.info().get("ETag")
+            finally:
+                response.close()
+        except (URLError, HTTPException, socket.error):
+            return False
+        return True
+
+    def edit(self):
+        word = "".join(self.rand.choice("abcdefghijklmnopqrstuvwxyz")
+                       for _ in range(self.rand.randint(1, 10)))
+        end = self.data.rfind("</")
+        self.data = self.data[:end] + "<!-- " + word + " -->" + \
+            self.data[end:]
+        self.dirty = True
+
+    def save(self, command):
+        """
+        Save the document.
+
+        :returns: Whether the editing session can continue.
+        """
+        outcome = self.request(command, self.data)
+        if outcome == "save_successful":
+            self.dirty = False
+            return True
+        if outcome in (DISCONNECTED, "save_transient_error"):
+            # wed reports the failure and tries again later.
+            return True
+        if outcome in ("save_fatal_error", "no_messages") or \
+           outcome.startswith("http_"):
+            # wed stops and tries to save the data one last time.
+            self.request("recover", self.data)
+        return False
+
+    def session(self):
+        if not self.load() or self.request("check") != "ok":
+            return
+        args = self.args
+        next_autosave = time.time() + args.autosave
+        while time.time() < self.deadline:
+            time.sleep(self.rand.expovariate(1.0 / args.think))
+            self.edit()
+            now = time.time()
+            if self.rand.random() < args.save_probability:
+                if not self.save("save"):
+                    return
+            elif now >= next_autosave:
+                next_autosave = now + args.autosave
+                if self.dirty and not self.save("autosave"):
+                    return
+
+    def run(self):
+        # Spread the start of the sessions.
+        time.sleep(self.rand.uniform(0, self.args.ramp_up))
+        while time.time() < self.deadline:
+            self.session()
+            if time.time() < self.deadline:
+                # The time it takes a person to reload the page.
+                time.sleep(self.rand.uniform(0, self.args.think))
+
+
+def report(stats, duration):
+    """
+    :returns: The results of a run as a dictionary that can be
+    serialized to JSON.
+    """
+    commands = {}
+    total = 0
+    for command in COMMANDS:
+        latencies = sorted(stats.latencies[command])
+        if not latencies:
+            continue
+        total += len(latencies)
+        record = {
+            "count": len(latencies),
+            "outcomes": stats.outcomes[command],
+            "mean": sum(latencies) / len(latencies),
+            "max": latencies[-1],
+        }
+        for pct in STATISTICS:
+            record["p{0}".format(pct)] = percentile(latencies, pct)
+        commands[command] = record
+
+    saves = [stats.outcomes[command] for command in ("save", "autosave")]
+    attempts = sum(sum(outcomes.values()) for outcomes in saves)
+    conflicts = sum(outcomes.get("save_edited", 0) for outcomes in saves)
+    return {
+        "duration": duration,
+        "requests": total,
+        "throughput": total / duration,
+        "bytes_per_second": stats.bytes_sent / duration,
+        "sessions": stats.sessions,
+        "conflict_rate": float(conflicts) / attempts if attempts else 0.0,
+        "commands": commands,
+    }
+
+
+def format_report(results):
+    lines = [
+        "{0} requests in {1:.1f}s: {2:.1f} requests/s, {3:.1f} KiB/s sent"
+        .format(results["requests"], results["duration"],
+                results["throughput"], results["bytes_per_second"] / 1024),
+        "{0} editing sessions, {1:.2%} of saves had conflicts"
+        .format(results["sessions"], results["conflict_rate"]),
+        "{0:10} {1:>7} {2:>8} {3:>8} {4:>8} {5:>8} {6:>8}  (ms)"
+        .format("command", "count", "p50", "p90", "p95", "p99", "max"),
+    ]
+    for command in COMMANDS:
+        record = results["commands"].get(command)
+        if record is None:
+            continue
+        lines.append(
+            "{0:10} {1:>7} {2:8.1f} {3:8.1f} {4:8.1f} {5:8.1f} {6:8.1f}"
+            .format(command, record["count"],
+                    *[record[name] * 1000 for name in
+                      ("p50", "p90", "p95", "p99", "max")]))
+        lines.append("{0:10} {1}".format(
+            "", ", ".join("{0}: {1}".format(outcome, count)
+                          for outcome, count in
+                          sorted(record["outcomes"].items()))))
+    return lines
+
+
+def positive(value):
+    ret = float(value)
+    if ret <= 0:
+        raise argparse.ArgumentTypeError("must be positive: " + value)
+    return ret
+
+
+def probability(value):
+    ret = float(value)
+    if ret < 0 or ret > 1:
+        raise argparse.ArgumentTypeError("must be between 0 and 1: " + value)
+    return ret
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Load test a server implementing wed's save protocol.")
+    parser.add_argument("--url",
+                        help="The URL to which save requests are posted. "
+                        "(Default: a stand-in server started by this "
+                        "script.)")
+    parser.add_argument("--serve", metavar="ADDRESS",
+                        help="Only run the stand-in server, on the address "
+                        "given as host:port, until interrupted.")
+    parser.add_argument("--editors", type=int, default=100,
+                        help="The number of simulated editors. "
+                        "(Default: 100.)")
+    parser.add_argument("--documents", type=int, default=None,
+                        help="The number of distinct documents. When there "
+                        "are fewer documents than editors, editors share "
+                        "documents and conflicts happen. (Default: one "
+                        "document per editor.)")
+    parser.add_argument("--duration", type=positive, default=60,
+                        help="How long the test runs, in seconds. "
+                        "(Default: 60.)")
+    parser.add_argument("--ramp-up", type=float, default=5,
+                        help="The period over which editors start, in "
+                        "seconds. (Default: 5.)")
+    parser.add_argument("--think", type=positive, default=2,
+                        help="The mean time between edits, in seconds. "
+                        "(Default: 2.)")
+    parser.add_argument("--autosave", type=positive, default=300,
+                        help="The autosave interval, in seconds. wed "
+                        "autosaves every 5 minutes by default. "
+                        "(Default: 300.)")
+    parser.add_argument("--save-probability", type=probability, default=0.05,
+                        help="The probability that an edit is followed by "
+                        "an explicit save. (Default: 0.05.)")
+    parser.add_argument("--document", default=DEFAULT_DOCUMENT,
+                        help="The document that is edited. (Default: a "
+                        "document in sample_documents.)")
+    parser.add_argument("--version", default="2.0.0",
+                        help="The version of wed that the editors report. "
+                        "(Default: 2.0.0.)")
+    parser.add_argument("--timeout", type=positive, default=30,
+                        help="The timeout of requests, in seconds. "
+                        "(Default: 30.)")
+    parser.add_argument("--latency", type=float, default=0,
+                        help="The latency added by the stand-in server, in "
+                        "milliseconds. (Default: 0.)")
+    parser.add_argument("--jitter", type=float, default=0,
+                        help="The stand-in server varies its latency "
+                        "randomly by up to this many milliseconds. "
+                        "(Default: 0.)")
+    parser.add_argument("--transient-rate", type=probability, default=0,
+                        help="The probability that the stand-in server "
+                        "replies with save_transient_error. (Default: 0.)")
+    parser.add_argument("--fatal-rate", type=probability, default=0,
+                        help="The probability that the stand-in server "
+                        "replies with save_fatal_error. (Default: 0.)")
+    parser.add_argument("--disconnect-rate", type=probability, default=0,
+                        help="The probability that the stand-in server "
+                        "drops a connection without replying. "
+                        "(Default: 0.)")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="The seed of the random number generators. "
+                        "(Default: 0.)")
+    parser.add_argument("--json",
+                        help="Also write the results to this file, as JSON.")
+    args = parser.parse_args()
+
+    if args.editors < 1:
+        parser.error("there must be at least one editor")
+    documents = args.documents if args.documents is not None else \
+        args.editors
+    if documents < 1:
+        parser.error("there must be at least one document")
+
+    with open(args.document, "rb") as f:
+        document = f.read().decode("utf-8")
+
+    server = None
+    if args.url is None:
+        faults = {
+            "latency": args.latency / 1000.0,
+            "jitter": args.jitter / 1000.0,
+            "transient": args.transient_rate,
+            "fatal": args.fatal_rate,
+            "disconnect": args.disconnect_rate,
+        }
+        host, port = "127.0.0.1", 0
+        if args.serve is not None:
+            host, port = args.serve.rsplit(":", 1)
+        server = StandInServer((host, int(port)), Store(document), faults,
+                               args.seed)
+        if args.serve is not None:
+            print("Serving on {0}:{1}".format(*server.server_address))
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                pass
+            return
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        base = "http://{0}:{1}".format(*server.server_address)
+        urls = ["{0}/doc/{1}".format(base, ix) for ix in range(documents)]
+    else:
+        urls = [args.url]
+
+    stats = Stats()
+    start = time.time()
+    deadline = start + args.duration
+    editors = [Editor(ix, urls[ix % len(urls)], document, stats, args,
+                      deadline)
+               for ix in range(args.editors)]
+    for editor in editors:
+        editor.start()
+    for editor in editors:
+        # Requests in progress when the deadline passes must finish.
+        editor.join(args.duration + args.timeout + args.think * 10)
+
+    results = report(stats, time.time() - start)
+    if server is not None:
+        server.shutdown()
+
+    for line in format_report(results):
+        print(line)
+    if args.json:
+        with open(args.json, "w") as out:
+            json.dump(results, out, indent=2, sort_keys=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -26,7 +26,9 @@ const url = require("url");
 const fs = require("fs");
 const querystring = require("querystring");
 const crypto = require("crypto");
+const zlib = require("zlib");
 const morgan = require("morgan");
+const { JSDOM } = require("jsdom");
 const { ArgumentParser } = require("argparse");
 
 const parser = new ArgumentParser({
@@ -100,6 +102,31 @@ function writeResponse(response, status, data, type, headers) {
   response.end();
 }
 
+// The encodings which the Ajax saver may use to compress the data it sends.
+const encodings = ["gzip", "deflate"];
+
+// Decompress the data sent by the Ajax saver, so that the rest of the server
+// deals only with uncompressed data.
+function decodeData(decoded) {
+  const { encoding } = decoded;
+  if (encoding === undefined) {
+    return;
+  }
+
+  const buffer = Buffer.from(decoded.data, "base64");
+  switch (encoding) {
+  case "gzip":
+    decoded.data = zlib.gunzipSync(buffer).toString("utf8");
+    break;
+  case "deflate":
+    decoded.data = zlib.inflateSync(buffer).toString("utf8");
+    break;
+  default:
+    throw new Error(`unknown encoding: ${encoding}`);
+  }
+  delete decoded.encoding;
+}
+
 function dumpData(request, options, callback) {
   if (typeof options === "function") {
     callback = options;
@@ -122,6 +149,7 @@ function dumpData(request, options, callback) {
     let decoded;
     if (request.is("application/x-www-form-urlencoded")) {
       decoded = querystring.parse(body);
+      decodeData(decoded);
     }
     else if (request.is("json")) {
       decoded = JSON.parse(body);
@@ -165,25 +193,169 @@ app.post(makePaths("/build/ajax/log.txt"), (request, response) => {
   writeResponse(response, 200, "{}", "application/json");
 });
 
+//
+// Support for the patches sent by the Ajax saver when its ``delta`` option is
+// on. This is a reference implementation: it parses the whole document for
+// each patch.
+//
+
+// Only elements and text nodes count in the paths of patches.
+function pathChildren(node) {
+  return Array.prototype.filter.call(
+    node.childNodes,
+    child => child.nodeType === 1 || child.nodeType === 3);
+}
+
+function resolvePath(doc, path) {
+  let node = doc;
+  for (const offset of path) {
+    node = pathChildren(node)[offset];
+    if (node === undefined) {
+      throw new Error(`invalid path: ${path.join("/")}`);
+    }
+  }
+  return node;
+}
+
+function checkName(node, name) {
+  if (name !== undefined ? (node.nodeType !== 1 || node.tagName !== name) :
+      node.nodeType !== 3) {
+    throw new Error(`unexpected node: ${node.nodeName}`);
+  }
+}
+
+// Parse the serialization of an element inserted in parent. The element may
+// use the namespace prefixes declared on the ancestors of parent.
+function parseElement(parent, xml) {
+  const decls = Object.create(null);
+  for (let node = parent; node.nodeType === 1; node = node.parentNode) {
+    for (const attr of Array.from(node.attributes)) {
+      if ((attr.name === "xmlns" || attr.prefix === "xmlns") &&
+          !(attr.name in decls)) {
+        decls[attr.name] = attr.value;
+      }
+    }
+  }
+
+  const declString = Object.keys(decls)
+        .map(name => ` ${name}="${decls[name].replace(/&/g, "&amp;")
+                                     .replace(/"/g, "&quot;")}"`).join("");
+  const wrapper = new JSDOM(`<wrapper${declString}>${xml}</wrapper>`,
+                            { contentType: "application/xml" })
+        .window.document.documentElement;
+  const el = parent.ownerDocument.importNode(wrapper.firstElementChild, true);
+
+  // Remove the declarations that serialization added but which are already
+  // in effect where the element is inserted.
+  for (const attr of Array.from(el.attributes)) {
+    if (attr.name === "xmlns" || attr.prefix === "xmlns") {
+      const prefix = attr.name === "xmlns" ? null : attr.localName;
+      if (parent.lookupNamespaceURI(prefix) === attr.value) {
+        el.removeAttributeNode(attr);
+      }
+    }
+  }
+
+  return el;
+}
+
+function applyPatch(data, ops) {
+  const dom = new JSDOM(data, { contentType: "application/xml" });
+  const doc = dom.window.document;
+  for (const op of ops) {
+    switch (op.op) {
+    case "insert": {
+      const parent = resolvePath(doc, op.path.slice(0, -1));
+      const node = op.xml !== undefined ? parseElement(parent, op.xml) :
+            doc.createTextNode(op.text);
+      const before = pathChildren(parent)[op.path[op.path.length - 1]];
+      parent.insertBefore(node, before !== undefined ? before : null);
+      break;
+    }
+    case "delete": {
+      const node = resolvePath(doc, op.path);
+      checkName(node, op.name);
+      node.parentNode.removeChild(node);
+      break;
+    }
+    case "text": {
+      const node = resolvePath(doc, op.path);
+      checkName(node);
+      node.data = op.value;
+      break;
+    }
+    case "attr": {
+      const node = resolvePath(doc, op.path);
+      checkName(node, op.name);
+      const ns = op.ns === "" ? null : op.ns;
+      if (op.value === null) {
+        node.removeAttributeNS(ns, op.attribute.replace(/^.*:/, ""));
+      }
+      else {
+        node.setAttributeNS(ns, op.attribute, op.value);
+      }
+      break;
+    }
+    default:
+      throw new Error(`unknown operation: ${op.op}`);
+    }
+  }
+
+  return new dom.window.XMLSerializer().serializeToString(doc.documentElement);
+}
+
+// The last document saved at each URL, and its ETag.
+const documents = Object.create(null);
+
 app.post(makePaths("/build/ajax/save.txt"), (request, response) => {
   dumpData(request, (decoded) => {
     let headers;
     const messages = [];
-    function success() {
+    const uri = url.parse(request.url).pathname;
+    function success(data) {
       messages.push({ type: "save_successful" });
       const hash = crypto.createHash("md5");
-      hash.update(decoded.data);
-      headers = { ETag: hash.digest("base64") };
+      hash.update(data);
+      const etag = hash.digest("base64");
+      headers = { ETag: etag };
+      documents[uri] = { data, etag };
     }
     let status = 200;
     switch (decoded.command) {
     case "check":
+      messages.push({ type: "capabilities", encodings });
       break;
     case "save":
     case "autosave":
     case "recover":
-      success();
+      success(decoded.data);
       break;
+    case "patch": {
+      // We reject the patch if we do not have the document the patch was
+      // made from. The saver then sends the whole document.
+      const doc = documents[uri];
+      let patched;
+      // The saver may send the ETag with the quotes of an If-Match header.
+      const base = decoded.base !== undefined ?
+            decoded.base.replace(/^"(.*)"$/, "$1") : undefined;
+      if (doc !== undefined && doc.etag === base) {
+        try {
+          patched = applyPatch(doc.data, JSON.parse(decoded.patch));
+        }
+        catch (ex) {
+          if (verbose) {
+            console.log("cannot apply patch:", ex.message);
+          }
+        }
+      }
+      if (patched !== undefined) {
+        success(patched);
+      }
+      else {
+        messages.push({ type: "save_patch_rejected" });
+      }
+      break;
+    }
     default:
       status = 400;
     }
@@ -195,8 +367,11 @@ app.post(makePaths("/build/ajax/save.txt"), (request, response) => {
 
 // Setting up the test environment requires getting *any* page from the server
 // in some cases. It does not matter what the content of the page is. This
-// serves the purpose.
+// serves the purpose. The response identifies the process that serves it, so
+// that the test suite can tell whether it is talking to the server it
+// started.
 app.get(makePaths("/blank"), (request, response) => {
+  response.setHeader("X-Server-PID", String(process.pid));
   response.end();
 });
 
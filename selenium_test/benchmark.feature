@@ -0,0 +1,24 @@
+@benchmark @reload
+Feature: editor performance
+
+Scenario Outline: editing a <kind> document with <sections> sections
+  Given a <kind> benchmark document with <sections> sections
+  When 20 characters are typed in the benchmark document
+  And the caret is moved 20 times in the benchmark document
+  And the benchmark document is saved 5 times
+
+  Examples:
+    | kind    | sections |
+    | tei     | 10       |
+    | tei     | 100      |
+    | tei     | 1000     |
+    | math    | 10       |
+    | math    | 100      |
+    | math    | 1000     |
+    | docbook | 10       |
+    | docbook | 100      |
+    | docbook | 1000     |
+
+# This must remain the last scenario of this feature.
+Scenario: comparing the results with the baseline
+  Then the benchmark results do not regress
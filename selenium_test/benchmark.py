@@ -0,0 +1,146 @@
+"""
+Support for the performance benchmarks of the Selenium suite.
+"""
+import os
+import json
+from xml.dom import minidom
+
+STATISTICS = ("p50", "p90", "p95", "p99")
+
+
+def percentile(values, fraction):
+    """
+    Compute a percentile by linear interpolation between the closest
+    ranks.
+
+    :param values: The values, which must be sorted.
+    :param fraction: The percentile, as a fraction between 0 and 1.
+    """
+    if len(values) == 1:
+        return values[0]
+    rank = fraction * (len(values) - 1)
+    low = int(rank)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (rank - low)
+
+
+def summarize(samples):
+    """
+    :param samples: A list of numbers.
+    :returns: A dictionary of statistics about the samples.
+    """
+    values = sorted(samples)
+    ret = {
+        "count": len(values),
+        "min": values[0],
+        "max": values[-1],
+        "mean": sum(values) / float(len(values)),
+    }
+    for name in STATISTICS:
+        ret[name] = percentile(values, int(name[1:]) / 100.0)
+    return ret
+
+
+class Benchmarks(object):
+    """
+    Collects the samples measured by the benchmarks. Samples are
+    grouped by case (e.g. the schema and size of a document) and then
+    by metric (e.g. keystroke latency). All samples are in
+    milliseconds.
+    """
+
+    def __init__(self):
+        self.cases = {}
+
+    def add(self, case, metric, samples):
+        self.cases.setdefault(case, {}).setdefault(metric, []) \
+                                       .extend(samples)
+
+    def report(self):
+        return dict((case, dict((metric, summarize(samples))
+                                for metric, samples in metrics.items()
+                                if samples))
+                    for case, metrics in self.cases.items())
+
+    def write(self, path):
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        with open(path, 'w') as out:
+            json.dump(self.report(), out, indent=2, sort_keys=True)
+
+
+def load_report(path):
+    """
+    :returns: The report stored in ``path`` or ``None`` if the file
+    does not exist.
+    """
+    if not os.path.exists(path):
+        return None
+
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def regressions(report, baseline, threshold, statistic="p50"):
+    """
+    Compare a report against a baseline. Cases and metrics absent from
+    either are ignored.
+
+    :param threshold: The fraction by which a statistic may exceed the
+    baseline before it is considered a regression.
+    :returns: A list of ``(case, metric, value, baseline_value)``
+    tuples.
+    """
+    ret = []
+    for case, metrics in sorted(report.items()):
+        base_metrics = baseline.get(case, {})
+        for metric, stats in sorted(metrics.items()):
+            base = base_metrics.get(metric)
+            if base is None:
+                continue
+            value = stats[statistic]
+            base_value = base[statistic]
+            if value > base_value * (1 + threshold):
+                ret.append((case, metric, value, base_value))
+    return ret
+
+
+def make_document(source, dest, container, count, name=None):
+    """
+    Make a document by repeating the children of an element of another
+    document.
+
+    :param source: The path of the document to start from.
+    :param dest: The path of the document to write.
+    :param container: The local name of the element whose children are
+    repeated. The first element with this name is used.
+    :param count: The number of repeated children that ``container``
+    must have in the new document.
+    :param name: If set, only the children with this local name are
+    repeated. The other children are kept as they are.
+    """
+    if os.path.exists(dest) and \
+       os.path.getmtime(dest) >= os.path.getmtime(source):
+        return
+
+    doc = minidom.parse(source)
+    parent = doc.getElementsByTagNameNS("*", container)[0]
+    children = [child for child in parent.childNodes
+                if child.nodeType == child.ELEMENT_NODE and
+                (name is None or child.localName == name)]
+    if not children:
+        raise ValueError("{0} has no children to repeat in {1}"
+                         .format(container, source))
+
+    for child in children:
+        parent.removeChild(child)
+
+    for ix in range(count):
+        parent.appendChild(children[ix % len(children)].cloneNode(True))
+
+    directory = os.path.dirname(dest)
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    with open(dest, 'wb') as out:
+        out.write(doc.toxml("utf-8"))
@@ -1,4 +1,5 @@
 import os
+import errno
 import time
 from urlparse import urljoin
 import subprocess
@@ -20,6 +21,9 @@ from behave.tag_matcher import ActiveTagMatcher
 from selenic import Builder, outil
 import selenic.util
 
+from timing import Timings, load_baseline, summarize
+from benchmark import Benchmarks
+
 _dirname = os.path.dirname(__file__)
 
 conf_path = os.path.join(os.path.dirname(_dirname),
@@ -91,15 +95,29 @@ def cleanup(context, failed):
 
 def start_server(context):
     builder = context.builder
-    port = builder.get_unused_port()
 
-    if port is None:
-        raise Exception("unable to find a port for the server")
+    def start():
+        # When features are run by multiple behave processes at once, another
+        # process may grab the port we picked before our server listens on
+        # it. Our server then exits right away, and we try another port.
+        attempts = 0
+        while True:
+            attempts += 1
+            if try_start():
+                break
 
-    port = str(port)
-    context.server_port = port
+            if attempts >= 5:
+                raise Exception("cannot start the server")
+
+    def try_start():
+        port = builder.get_unused_port()
+
+        if port is None:
+            raise Exception("unable to find a port for the server")
+
+        port = str(port)
+        context.server_port = port
 
-    def start():
         # Start a server just for our tests...
         context.server = subprocess.Popen(["node", "./misc/server.js",
                                            "localhost:" + port])
@@ -127,18 +145,35 @@ def start_server(context):
         # Try pinging the server util we get a positive response or we've
         # tried enough times to declare failure
         tries = 0
-        success = False
-        while not success and tries < 10:
+        response = None
+        while response is None and tries < 10:
+            # If our server is no longer running, it could not listen on the
+            # port.
+            if context.server.poll() is not None:
+                context.server = None
+                return False
+
             try:
-                requests.get(urljoin(local_server, '/blank'))
-                success = True
+                response = requests.get(urljoin(local_server, '/blank'))
             except ConnectionError:
                 time.sleep(0.5)
                 tries += 1
 
-        if not success:
+        if response is None:
             raise Exception("cannot contact server")
 
+        # The server that answered may belong to another process, which
+        # got the port before our server could listen on it. Our server
+        # is then about to exit, if it has not done so already.
+        if response.headers.get("X-Server-PID") != str(context.server.pid):
+            if context.server.poll() is None:
+                context.server.terminate()
+                context.server.wait()
+            context.server = None
+            return False
+
+        return True
+
     thread = threading.Thread(target=start, name="Server Start Thread")
     thread.start()
     return thread
@@ -151,7 +186,16 @@ def setup_screenshots(context):
     this_screenshots_dir_path = os.path.join(screenshots_dir_path,
                                              now.isoformat())
 
-    os.makedirs(this_screenshots_dir_path)
+    # Multiple behave processes started at the same time would otherwise use
+    # the same directory. We create the directory and check the outcome in one
+    # step, so that two processes cannot both decide to use the same name.
+    try:
+        os.makedirs(this_screenshots_dir_path)
+    except OSError as ex:
+        if ex.errno != errno.EEXIST:
+            raise
+        this_screenshots_dir_path += "-" + str(os.getpid())
+        os.makedirs(this_screenshots_dir_path)
     latest = os.path.join(screenshots_dir_path, "LATEST")
     try:
         os.unlink(latest)
@@ -159,8 +203,13 @@ def setup_screenshots(context):
         if ex.errno != 2:
             raise
 
-    os.symlink(os.path.basename(this_screenshots_dir_path),
-               os.path.join(screenshots_dir_path, "LATEST"))
+    try:
+        os.symlink(os.path.basename(this_screenshots_dir_path),
+                   os.path.join(screenshots_dir_path, "LATEST"))
+    except OSError as ex:
+        # Another behave process created the link first.
+        if ex.errno != 17:
+            raise
     context.screenshots_dir_path = this_screenshots_dir_path
 
 
@@ -170,6 +219,9 @@ class Top(object):
     util = None
     initial_window_size = None
     initial_window_handle = None
+    # Whether the page currently loaded can replace its editor in-page for
+    # the next scenario.
+    reusable_page = False
 
 
 def before_all(context):
@@ -220,12 +272,17 @@ def before_all(context):
 
     server_thread = start_server(context)
 
+    context.headless = getattr(builder, "HEADLESS", False)
+
     if not builder.remote:
-        visible = context.selenium_quit in ("never", "on-success", "on-enter")
-        context.display = Display(visible=visible, size=(1024, 768))
-        context.display.start()
-        builder.update_ff_binary_env('DISPLAY')
-        context.wm = subprocess.Popen(["openbox", "--sm-disable"])
+        # A headless browser needs neither a display nor a window manager.
+        if not context.headless:
+            visible = context.selenium_quit in ("never", "on-success",
+                                                "on-enter")
+            context.display = Display(visible=visible, size=(1024, 768))
+            context.display.start()
+            builder.update_ff_binary_env('DISPLAY')
+            context.wm = subprocess.Popen(["openbox", "--sm-disable"])
     else:
         context.display = None
         context.wm = None
@@ -251,9 +308,31 @@ def before_all(context):
 
     context.selenium_logs = os.environ.get("SELENIUM_LOGS", False)
 
+    context.reload_pages = os.environ.get("BEHAVE_RELOAD_PAGES", False)
+
+    context.timings_path = os.environ.get("BEHAVE_TIMINGS",
+                                          os.path.join("test_logs", "timings"))
+    context.timings_baseline = os.environ.get(
+        "BEHAVE_TIMINGS_BASELINE",
+        os.path.join("test_logs", "timings_baseline.json"))
+    context.timings_slowest = int(os.environ.get("BEHAVE_TIMINGS_SLOWEST",
+                                                 10))
+
+    context.run_benchmarks = os.environ.get("BEHAVE_BENCHMARKS", False)
+    context.benchmark_repeat = int(os.environ.get("BENCHMARK_REPEAT", 3))
+    context.benchmark_report = os.environ.get(
+        "BENCHMARK_REPORT", os.path.join("test_logs", "benchmarks.json"))
+    context.benchmark_baseline = os.environ.get(
+        "BENCHMARK_BASELINE",
+        os.path.join("test_logs", "benchmarks_baseline.json"))
+    context.benchmark_threshold = float(os.environ.get("BENCHMARK_THRESHOLD",
+                                                       0.25))
+
     server_thread.join()
 
     context.start_time = time.time()
+    context.timings = Timings()
+    context.benchmarks = Benchmarks()
     context.top = Top()
 
 
@@ -286,15 +365,25 @@ class DriverMeta(object):
 
 
 def before_feature(context, feature):
+    context.timings.start_feature(feature)
+
     if "skip" in feature.tags:
         feature.skip("The feature was marked with @skip")
 
+    if "benchmark" in feature.tags and not context.run_benchmarks:
+        feature.skip("Benchmarks run only when BEHAVE_BENCHMARKS is set")
+
     if context.top.driver is None:
         builder = context.builder
         driver_meta = context.top.driver_meta = DriverMeta()
         driver = context.top.driver = builder.get_driver({
             "name": "Wed Test ({})".format(driver_meta.number),
         })
+        context.timings.wrap(driver, "execute_script")
+        context.timings.wrap(driver, "execute_async_script")
+        # We wait for the editor and for saves by waiting on promises in
+        # the browser, and large documents take a while to validate.
+        driver.set_script_timeout(60)
         util = context.top.util = selenic.util.Util(driver,
                                                     # Give more time if we are
                                                     # remote.
@@ -358,8 +447,12 @@ def after_feature(context, feature):
                 pass
         context.top.driver = None
 
+    context.timings.end_feature(feature)
+
 
 def before_scenario(context, scenario):
+    context.timings.start_scenario(scenario)
+
     if "skip" in scenario.effective_tags:
         scenario.skip("The scenario was marked with @skip")
         return
@@ -368,6 +461,11 @@ def before_scenario(context, scenario):
         scenario.skip("Disabled by an active tag")
         return
 
+    if context.headless and "window_manager" in scenario.effective_tags:
+        scenario.skip("The scenario needs a window manager, which is not "
+                      "available in headless mode")
+        return
+
     driver = context.driver
 
     if context.behave_captions:
@@ -382,11 +480,23 @@ def before_scenario(context, scenario):
 
 
 def after_scenario(context, scenario):
+    try:
+        with context.timings.measure("teardown"):
+            teardown_scenario(context, scenario)
+    finally:
+        context.timings.end_scenario(scenario)
+
+
+def teardown_scenario(context, scenario):
     if "skip" in scenario.status:
         return
 
     driver = context.driver
 
+    # Whatever happens below, the page cannot be reused unless we get to the
+    # end of this function.
+    context.top.reusable_page = False
+
     # Close all extra tabs.
     handles = driver.window_handles
     if handles:
@@ -434,11 +544,38 @@ def after_scenario(context, scenario):
     assert_false(status["terminating"],
                  "should not have experienced a fatal error")
 
-    # We move to a blank page so as to stop any interaction with the database
-    # and then we delete it manually. This is a safer approach than trying to
-    # stop actions on an actual test page.
-    driver.get(context.builder.WED_SERVER + "/blank.html")
-    status = driver.execute_async_script("""
+    # If the page is able to replace its editor, we keep it so that the next
+    # scenario can reuse it, and we delete the database from it. The editor
+    # is destroyed first so that it neither holds the database open nor
+    # recreates it by autosaving. If the database is still in use, the
+    # deletion is blocked and we fall back to the blank page.
+    reuse = not context.reload_pages and driver.execute_script("""
+    if (typeof window.wed_reset !== "function" ||
+        typeof window.wed_teardown !== "function") {
+      return false;
+    }
+
+    window.wed_teardown();
+    return true;
+    """)
+    status = delete_database(driver) if reuse else None
+
+    if status is None or not status[0]:
+        reuse = False
+        # We move to a blank page so as to stop any interaction with the
+        # database and then we delete it manually. This is a safer approach
+        # than trying to stop actions on an actual test page.
+        driver.get(context.builder.WED_SERVER + "/blank.html")
+        status = delete_database(driver)
+
+    if not status[0]:
+        assert_true(status[0], status[1])
+
+    context.top.reusable_page = reuse
+
+
+def delete_database(driver):
+    return driver.execute_async_script("""
     var done = arguments[0];
 
     var req = indexedDB.deleteDatabase("wed");
@@ -455,11 +592,9 @@ def after_scenario(context, scenario):
     };
     """)
 
-    if not status[0]:
-        assert_true(status[0], status[1])
-
 
 def before_step(context, step):
+    context.timings.start_step(step)
     if context.behave_captions:
         # We send a comment as a "script" so that we get something
         # in the record of Selenium commands.
@@ -481,10 +616,27 @@ def after_step(context, step):
         print("")
 
     dump_javascript_log(context)
+    context.timings.end_step(step)
+
+
+def write_timings(context):
+    timings = context.timings
+    timings.finish()
+    directory = os.path.dirname(context.timings_path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    timings.write_json(context.timings_path + ".json")
+    timings.write_junit(context.timings_path + ".xml")
+    # The names may contain non-ASCII characters, and stdout may not
+    # have an encoding (e.g. when it is piped).
+    print(u"\n".join(summarize(timings, context.timings_slowest,
+                               load_baseline(context.timings_baseline)))
+          .encode("utf-8"))
 
 
 def after_all(context):
     print("Elapsed between before_all and after_all:",
           str(datetime.timedelta(seconds=time.time() - context.start_time)))
+    write_timings(context)
     cleanup(context, False)
     dump_config(context.builder)
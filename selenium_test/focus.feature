@@ -1,3 +1,5 @@
+# Focus changes between windows require a real window manager.
+@window_manager
 Feature: focus
  Users want the editor's focus to be managed.
 
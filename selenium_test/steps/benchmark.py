@@ -0,0 +1,166 @@
+import os
+import urllib
+
+from selenium.webdriver.common.action_chains import ActionChains
+from selenium.webdriver.common.keys import Keys
+from selenium.webdriver.support.ui import WebDriverWait
+from nose.tools import assert_false  # pylint: disable=E0611
+
+from selenium_test.util import wait_for_editor, wait_for_promise
+from selenium_test.benchmark import make_document, load_report, regressions
+
+# Don't complain about redefined functions
+# pylint: disable=E0102
+
+#
+# The documents we benchmark with. For each kind of document, we record the
+# document from which the benchmark documents are made, the schema to load
+# the document with, the element whose children are repeated to make larger
+# documents and the name of the children to repeat.
+#
+DOCUMENTS = {
+    "tei": ("build/samples/sketch_for_a_medical_education.xml", None,
+            "body", None),
+    "math": ("build/standalone/lib/tests/wed_test_data/"
+             "multiple_top_namespaces_converted.xml", "@math", "body", None),
+    "docbook": ("build/samples/docbook_book.xml", "@docbook", "book",
+                "chapter"),
+}
+
+# Records the time at which each key was pressed and, once the browser has
+# painted, the time elapsed since then.
+INSTALL_LATENCY_PROBE = """
+var samples = window.wed_benchmark_samples = [];
+function probe() {
+  var start = performance.now();
+  requestAnimationFrame(function () {
+    setTimeout(function () {
+      samples.push(performance.now() - start);
+    }, 0);
+  });
+}
+document.addEventListener("keydown", probe, true);
+window.wed_benchmark_remove_probe = function () {
+  document.removeEventListener("keydown", probe, true);
+};
+"""
+
+
+def measure_keys(context, keys):
+    driver = context.driver
+    driver.execute_script(INSTALL_LATENCY_PROBE)
+    for key in keys:
+        ActionChains(driver).send_keys(key).perform()
+
+    count = len(keys)
+    WebDriverWait(driver, 10).until(
+        lambda driver: driver.execute_script(
+            "return window.wed_benchmark_samples.length;") >= count)
+
+    return driver.execute_script("""
+    window.wed_benchmark_remove_probe();
+    return window.wed_benchmark_samples;
+    """)
+
+
+@given(u"a {kind} benchmark document with {sections:d} sections")
+def step_impl(context, kind, sections):
+    driver = context.driver
+    source, schema, container, name = DOCUMENTS[kind]
+    dest = os.path.join("build", "benchmark",
+                        "{0}-{1}.xml".format(kind, sections))
+    make_document(source, dest, container, sections, name)
+
+    query = {
+        "mode": "test",
+        "nodemo": "1",
+        "file": "../" + os.path.relpath(dest, "build"),
+    }
+    if schema is not None:
+        query["schema"] = schema
+
+    url = context.builder.WED_SERVER + "/kitchen-sink.html?" + \
+        urllib.urlencode(query)
+
+    case = context.benchmark_case = "{0}-{1}".format(kind, sections)
+    benchmarks = context.benchmarks
+    for _ in range(context.benchmark_repeat):
+        driver.get(url)
+        wait_for_editor(context)
+        timings = driver.execute_async_script("""
+        var done = arguments[0];
+        wed_editor.firstValidationComplete.then(function () {
+          // Let the handler in kitchen-sink record its time first.
+          setTimeout(function () {
+            done(window.wed_timings);
+          }, 0);
+        });
+        """)
+        benchmarks.add(case, "time_to_editable",
+                       [timings["initialized"] - timings["start"]])
+        benchmarks.add(case, "validation",
+                       [timings["validated"] - timings["start"]])
+
+    # Put the caret in the middle of the document.
+    driver.execute_script("""
+    var editor = wed_editor;
+    var walker = document.createTreeWalker(editor.dataRoot,
+                                           NodeFilter.SHOW_TEXT, null, false);
+    var texts = [];
+    while (walker.nextNode()) {
+      if (walker.currentNode.data.trim() !== "") {
+        texts.push(walker.currentNode);
+      }
+    }
+    var text = texts[Math.floor(texts.length / 2)];
+    editor.caretManager.setCaret(text, 0);
+    """)
+
+
+@when(u"{count:d} characters are typed in the benchmark document")
+def step_impl(context, count):
+    context.benchmarks.add(context.benchmark_case, "keystroke",
+                           measure_keys(context, ["a"] * count))
+
+
+@when(u"the caret is moved {count:d} times in the benchmark document")
+def step_impl(context, count):
+    # We move back and forth so as to stay in the same area.
+    keys = [Keys.ARROW_RIGHT if ix % 2 == 0 else Keys.ARROW_LEFT
+            for ix in range(count)]
+    context.benchmarks.add(context.benchmark_case, "caret",
+                           measure_keys(context, keys))
+
+
+@when(u"the benchmark document is saved {count:d} times")
+def step_impl(context, count):
+    driver = context.driver
+    samples = []
+    for _ in range(count):
+        # A failed save raises PromiseRejected, which fails the step.
+        samples.append(wait_for_promise(driver, """
+        (function () {
+          var start = performance.now();
+          return wed_editor.save().then(function () {
+            return performance.now() - start;
+          });
+        })()
+        """))
+    context.benchmarks.add(context.benchmark_case, "save", samples)
+
+
+@then(u"the benchmark results do not regress")
+def step_impl(context):
+    benchmarks = context.benchmarks
+    benchmarks.write(context.benchmark_report)
+    baseline = load_report(context.benchmark_baseline)
+    if baseline is None:
+        print("No baseline: {0} does not exist."
+              .format(context.benchmark_baseline))
+        return
+
+    slower = regressions(benchmarks.report(), baseline,
+                         context.benchmark_threshold)
+    assert_false(slower, "\n".join(
+        "{0} {1}: {2:.1f}ms, baseline {3:.1f}ms".format(*x)
+        for x in slower))
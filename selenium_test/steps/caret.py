@@ -9,7 +9,7 @@ from selenium.webdriver.common.keys import Keys
 import wedutil
 import selenic.util
 
-from selenium_test.util import get_element_parent_and_parent_text
+from selenium_test.util import get_element_parent_and_parent_text, Query
 
 # Don't complain about redefined functions
 # pylint: disable=E0102
@@ -53,22 +53,14 @@ def step_impl(context):
 def step_impl(context):
     driver = context.driver
     util = context.util
-    element = util.find_element((By.CSS_SELECTOR, ".title"))
-
-    rect = driver.execute_script("""
-    var title = arguments[0];
-    var text = title.childNodes[1]; // At index 0 is the opening label.
-    var range = title.ownerDocument.createRange();
-    range.setStart(text, 0);
-    range.setEnd(text, 1);
-    // Just returning does not work with IEDriver...
-    // return range.getBoundingClientRect();
-    var rect = range.getBoundingClientRect();
-    var ret = {};
-    for (var x in rect)
-        ret[x] = rect[x];
-    return ret;
-    """, element)
+
+    # At index 0 of the title is the opening label. We wait for the title
+    # because it may not be rendered yet.
+    rect = Query() \
+        .element("_title", ".title") \
+        .child("_text", "_title", 1) \
+        .range_rect("rect", "_text", 0, 1) \
+        .run(driver, util)["rect"]
 
     last_click = {"left": round(rect["left"]) + 2,
                   "top": int(rect["top"] + rect["height"] / 2)}
@@ -487,24 +479,22 @@ def step_impl(context, what):
     label = what == "an element's label"
     selector = ".__end_label._title_label>*" if label else "._text._phantom"
 
-    # Faster than using 4 Selenium operations.
-    label, start, end = driver.execute_script("""
-    var selector = arguments[0];
-    var label = arguments[1];
+    query = Query() \
+        .element("_el", selector) \
+        .scroll_into_view("_el") \
+        .parent("parent", "_el")
+    if label:
+        query.child("_text", "_el", 0).child("_text", "_text", 0)
+    else:
+        query.child("_text", "_el", 0)
+    result = query.range_rect("rect", "_text").run(driver)
 
-    var el = jQuery(selector)[0];
-    el.scrollIntoView();
-    var text = label ? el.firstChild.firstChild : el.firstChild;
-    var range = document.createRange();
-    range.setStart(text, 0);
-    range.setEnd(text, text.nodeValue.length);
-    var rect = range.getBoundingClientRect();
-    return [el.parentNode,
-            {left: rect.left + 5, top: rect.top + rect.height / 2},
-            {left: rect.right - 5, top: rect.top + rect.height / 2}];
-    """, selector, label)
+    rect = result["rect"]
+    middle = rect["top"] + rect["height"] / 2.0
+    start = {"left": rect["left"] + 5, "top": middle}
+    end = {"left": rect["right"] - 5, "top": middle}
 
-    context.clicked_element = label
+    context.clicked_element = result["parent"]
 
     select_text(context, start, end)
 
@@ -513,17 +503,18 @@ def step_impl(context, what):
 def step_impl(context):
     driver = context.driver
 
-    distance_test, p, start_label, end_label = driver.execute_script("""
-    var p = document.querySelectorAll(".body>.p")[6];
-    var start_label = p.querySelector(".__start_label._p_label");
-    var end_label = p.querySelector(".__end_label._p_label");
-    var start_rect = start_label.getBoundingClientRect();
-    var end_rect = end_label.getBoundingClientRect();
-    // A minium distance of 20 pixels is an arbitrary minimum.
-    return [end_rect.top > start_rect.bottom + 20, p, start_label, end_label];
-    """)
-
-    assert_true(distance_test, "the labels are not at the desired distance")
+    # A minium distance of 20 pixels is an arbitrary minimum.
+    result = Query() \
+        .element("p", ".body>.p", index=6) \
+        .element("start_label", ".__start_label._p_label", within="p") \
+        .element("end_label", ".__end_label._p_label", within="p") \
+        .rect("_start_rect", "start_label") \
+        .rect("_end_rect", "end_label") \
+        .check("values._end_rect.top > values._start_rect.bottom + 20",
+               "the labels are not at the desired distance") \
+        .run(driver)
+    p, start_label, end_label = \
+        result["p"], result["start_label"], result["end_label"]
 
     end_label.click()
 
@@ -591,11 +582,19 @@ def step_impl(context):
     driver = context.driver
     util = context.util
 
-    element, parent, parent_text = get_element_parent_and_parent_text(
-        driver, ".__start_label._title_label")
+    result = Query() \
+        .element("element", ".__start_label._title_label") \
+        .parent("parent", "element") \
+        .own_text("parent_text", "parent") \
+        .rect("rect", "element") \
+        .run(driver)
+    element, parent, parent_text = \
+        result["element"], result["parent"], result["parent_text"]
 
     # This is where our selection will end
-    end = util.element_screen_center(element)
+    rect = result["rect"]
+    end = {"left": rect["left"] + rect["width"] / 2.0,
+           "top": rect["top"] + rect["height"] / 2.0}
     end["left"] += 2  # Move it off-center for this test
 
     element.click()
@@ -14,7 +14,7 @@ from nose.tools import assert_equal, assert_true, \
 import wedutil
 
 from ..util import Trigger, get_element_parent_and_parent_text, \
-    get_real_siblings
+    get_real_siblings, Query
 
 step_matcher("re")
 
@@ -121,11 +121,12 @@ def context_menu_on_end_label_of_top_element(context):
     driver = context.driver
     util = context.util
 
-    button, parent = driver.execute_script("""
-    var button = jQuery(".__end_label").get(-1);
-    button.scrollIntoView();
-    return [button, button.parentNode];
-    """)
+    result = Query() \
+        .element("button", ".__end_label", index=-1) \
+        .scroll_into_view("button") \
+        .parent("parent", "button") \
+        .run(driver)
+    button, parent = result["button"], result["parent"]
     ActionChains(driver)\
         .context_click(button)\
         .perform()
@@ -508,9 +509,9 @@ def step_impl(context, choice, new=None, name=None):
             info["preceding"], info["following"] = \
                 get_real_siblings(driver, for_element)
         elif choice == "new":
-            info["children"] = driver.execute_script("""
-            return jQuery(arguments[0]).children("._real").toArray();
-            """, for_element)
+            info["children"] = Query() \
+                .children("children", for_element, "._real") \
+                .run(driver)["children"]
     context.clicked_context_menu_item = \
         util.get_text_excluding_children(link).strip()
 
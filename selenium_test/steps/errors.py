@@ -3,6 +3,7 @@ from selenium.webdriver.common.action_chains import ActionChains
 from selenium.common.exceptions import MoveTargetOutOfBoundsException
 
 from selenic.util import Condition, Result
+from selenium_test.util import wait_for_promise
 # pylint: disable=no-name-in-module
 from nose.tools import assert_true, assert_equal
 
@@ -38,7 +39,16 @@ def step_impl(context, count):
         return jQuery("#sb-errorlist").children().length === count;
         """, int(count))
 
-    util.wait(cond)
+    # Once validation is complete, the error panel is up to date, so
+    # there is usually nothing to poll for. We still fall back on
+    # polling in case validation restarts after the promise resolved.
+    wait_for_promise(driver, """
+    wed_editor.validationComplete().then(function () {
+      return 1;
+    })
+    """)
+    if not cond():
+        util.wait(cond)
 
 
 @when(ur"the user clicks the (?P<which>first|last) error in the error "
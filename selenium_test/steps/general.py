@@ -36,9 +36,29 @@ def load_and_wait_for_editor(context, text=None, options=None,
     if schema is not None:
         query["schema"] = schema
 
-    server += urllib.urlencode(query)
-
-    driver.get(server)
+    search = urllib.urlencode(query)
+
+    # When the page left by the previous scenario is able to replace its
+    # editor, we ask it to do so rather than reload it. The page decides
+    # whether the new query is compatible with it. Scenarios tagged @reload
+    # always get a fresh page.
+    if context.top.reusable_page and \
+       "reload" not in context.scenario.effective_tags:
+        context.top.reusable_page = False
+        with context.timings.measure("editor_reset"):
+            reset = driver.execute_async_script("""
+            var search = arguments[0];
+            var done = arguments[1];
+            wed_reset(search).then(done, function (err) {
+              done(err.toString());
+            });
+            """, "?" + search)
+        if reset is True:
+            wait_for_editor(context, tooltips)
+            return
+
+    with context.timings.measure("page_load"):
+        driver.get(server + search)
     wait_for_editor(context, tooltips)
 
 
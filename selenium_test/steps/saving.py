@@ -8,6 +8,7 @@ from nose.tools import assert_equal  # pylint: disable=E0611
 from behave import step_matcher
 
 from selenic.util import Result, Condition
+from selenium_test.util import wait_for_promise
 
 
 step_matcher("re")
@@ -16,6 +17,14 @@ step_matcher("re")
 @when('the user saves')
 def step_impl(context):
     util = context.util
+    # We must start waiting before the save is initiated, otherwise we
+    # could miss the event that signals that the save is done. We wait
+    # for a manual save so that an autosave that happens in the meantime
+    # does not resolve the promise.
+    context.driver.execute_script("""
+    var SaveKind = require("wed").saver.SaveKind;
+    window.wed_save_promise = wed_editor.saveComplete(SaveKind.MANUAL);
+    """)
     util.ctrl_equivalent_x('s')
 
 last_obj_re = re.compile('.*}{')
@@ -103,6 +112,12 @@ def step_impl(context):
 
         return Result(actual == expected, [actual, expected])
 
+    wait_for_promise(context.driver, """
+    (window.wed_save_promise || Promise.resolve()).then(function () {
+      delete window.wed_save_promise;
+      return 1;
+    })
+    """)
     result = Condition(util, cond).wait()
 
     assert_equal.__self__.maxDiff = None
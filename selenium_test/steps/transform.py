@@ -2,7 +2,7 @@
 from nose.tools import assert_equal, assert_is_not_none
 from selenium.webdriver.support.wait import TimeoutException
 
-from ..util import get_real_siblings
+from ..util import get_real_siblings, Query
 
 step_matcher("re")
 
@@ -62,9 +62,9 @@ def step_impl(context, what):
     info = context.context_menu_pre_transformation_info
 
     def cond(*_):
-        children = driver.execute_script("""
-        return jQuery(arguments[0]).children("._real").toArray();
-        """, for_element)
+        children = Query() \
+            .children("children", for_element, "._real") \
+            .run(driver)["children"]
         return len(info["children"]) + 1 == len(children)
 
     util.wait(cond)
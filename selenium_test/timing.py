@@ -0,0 +1,273 @@
+"""
+Record how long the parts of a behave run take.
+"""
+import io
+import os
+import json
+import time
+import functools
+from contextlib import contextmanager
+from xml.sax.saxutils import quoteattr
+
+
+def _status(status):
+    # Recent versions of behave use an enumeration for statuses, older
+    # versions use strings.
+    return str(getattr(status, "name", status))
+
+
+def _add_operation(operations, name, duration):
+    record = operations.setdefault(name, {"count": 0, "total": 0.0})
+    record["count"] += 1
+    record["total"] += duration
+
+
+class Timings(object):
+    """
+    Records the wall-clock durations of the features, scenarios and
+    steps of a run. It also records how much time is spent in some
+    operations of interest (e.g. ``execute_script``). Operation times
+    are recorded globally and for the scenario during which they
+    occur.
+    """
+
+    def __init__(self):
+        self.start = time.time()
+        self.end = None
+        self.features = []
+        self.operations = {}
+        self._feature = None
+        self._scenario = None
+        self._step_start = None
+
+    def start_feature(self, feature):
+        self._feature = {
+            "name": feature.name,
+            "filename": feature.filename,
+            "start": time.time(),
+            "scenarios": [],
+        }
+        self.features.append(self._feature)
+
+    def end_feature(self, feature):
+        record = self._feature
+        if record is None:
+            return
+        record["duration"] = time.time() - record.pop("start")
+        record["status"] = _status(feature.status)
+        self._feature = None
+
+    def start_scenario(self, scenario):
+        self._scenario = {
+            "name": scenario.name,
+            "start": time.time(),
+            "steps": [],
+            "operations": {},
+        }
+        if self._feature is not None:
+            self._feature["scenarios"].append(self._scenario)
+
+    def end_scenario(self, scenario):
+        record = self._scenario
+        if record is None:
+            return
+        record["duration"] = time.time() - record.pop("start")
+        record["status"] = _status(scenario.status)
+        self._scenario = None
+
+    def start_step(self, _step):
+        self._step_start = time.time()
+
+    def end_step(self, step):
+        if self._step_start is None or self._scenario is None:
+            return
+        self._scenario["steps"].append({
+            "name": step.keyword + " " + step.name,
+            "duration": time.time() - self._step_start,
+            "status": _status(step.status),
+        })
+        self._step_start = None
+
+    def add_operation(self, name, duration):
+        _add_operation(self.operations, name, duration)
+        if self._scenario is not None:
+            _add_operation(self._scenario["operations"], name, duration)
+
+    @contextmanager
+    def measure(self, name):
+        """
+        Measure the time taken by the body of a ``with`` statement
+        and record it as an operation.
+        """
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.add_operation(name, time.time() - start)
+
+    def wrap(self, obj, name):
+        """
+        Replace the method ``name`` of ``obj`` with a method that
+        records the time the original method takes as an operation
+        with the same name.
+        """
+        original = getattr(obj, name)
+
+        @functools.wraps(original)
+        def wrapper(*args, **kwargs):
+            with self.measure(name):
+                return original(*args, **kwargs)
+
+        setattr(obj, name, wrapper)
+
+    def finish(self):
+        self.end = time.time()
+
+    def report(self):
+        """
+        :returns: The timings as a dictionary that can be serialized
+        to JSON.
+        """
+        end = self.end if self.end is not None else time.time()
+        return {
+            "duration": end - self.start,
+            "operations": self.operations,
+            "features": self.features,
+        }
+
+    def scenarios(self):
+        """
+        :returns: A list of ``(name, duration)`` pairs, one per
+        completed scenario. The name includes the file name of the
+        feature.
+        """
+        return [(feature["filename"] + ": " + scenario["name"],
+                 scenario["duration"])
+                for feature in self.features
+                for scenario in feature["scenarios"]
+                if "duration" in scenario]
+
+    def steps(self):
+        """
+        :returns: A list of ``(name, duration)`` pairs, one per
+        step. The name includes the name of the scenario.
+        """
+        return [(feature["filename"] + ": " + scenario["name"] + ": " +
+                 step["name"], step["duration"])
+                for feature in self.features
+                for scenario in feature["scenarios"]
+                for step in scenario["steps"]]
+
+    def write_json(self, path):
+        with open(path, 'w') as out:
+            json.dump(self.report(), out, indent=2, sort_keys=True)
+
+    def write_junit(self, path):
+        """
+        Write the timings as a JUnit XML report. Each scenario is a
+        test case, and each feature is a test suite.
+        """
+        lines = [u'<?xml version="1.0" encoding="UTF-8"?>', u"<testsuites>"]
+        for feature in self.features:
+            lines.append(u'  <testsuite name={0} tests="{1}" time="{2:.3f}">'
+                         .format(quoteattr(feature["filename"]),
+                                 len(feature["scenarios"]),
+                                 feature.get("duration", 0)))
+            for scenario in feature["scenarios"]:
+                lines.append(u'    <testcase classname={0} name={1} '
+                             u'time="{2:.3f}">'
+                             .format(quoteattr(feature["name"]),
+                                     quoteattr(scenario["name"]),
+                                     scenario.get("duration", 0)))
+                status = scenario.get("status")
+                if status == "failed":
+                    lines.append(u"      <failure/>")
+                elif status == "skipped":
+                    lines.append(u"      <skipped/>")
+                lines.append(u"    </testcase>")
+            lines.append(u"  </testsuite>")
+        lines.append(u"</testsuites>")
+        with io.open(path, 'w', encoding="utf-8") as out:
+            out.write(u"\n".join(lines) + u"\n")
+
+
+def slowest(pairs, count):
+    """
+    :param pairs: A list of ``(name, duration)`` pairs.
+    :param count: The number of pairs to return.
+    :returns: The ``count`` pairs with the longest durations, longest
+    first.
+    """
+    return sorted(pairs, key=lambda pair: pair[1], reverse=True)[:count]
+
+
+def load_baseline(path):
+    """
+    Load a report previously written by :meth:`Timings.write_json`.
+
+    :returns: The scenario durations of the report, keyed by the
+    names returned by :meth:`Timings.scenarios`, or ``None`` if the
+    file does not exist.
+    """
+    if not os.path.exists(path):
+        return None
+
+    with open(path, 'r') as f:
+        report = json.load(f)
+
+    return dict((feature["filename"] + ": " + scenario["name"],
+                 scenario["duration"])
+                for feature in report["features"]
+                for scenario in feature["scenarios"]
+                if "duration" in scenario)
+
+
+def regressions(pairs, baseline, ratio=1.5, minimum=1.0):
+    """
+    Compare durations against a baseline.
+
+    :param pairs: A list of ``(name, duration)`` pairs.
+    :param baseline: A dictionary of durations keyed by name.
+    :param ratio: How many times slower than the baseline a duration
+    must be to be reported.
+    :param minimum: By how many seconds a duration must exceed the
+    baseline to be reported. This avoids reporting noise on short
+    durations.
+    :returns: A list of ``(name, duration, baseline_duration)``
+    triples, largest increase first.
+    """
+    ret = []
+    for name, duration in pairs:
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if duration > base * ratio and duration - base >= minimum:
+            ret.append((name, duration, base))
+    return sorted(ret, key=lambda triple: triple[1] - triple[2],
+                  reverse=True)
+
+
+def summarize(timings, count, baseline):
+    """
+    :returns: A list of unicode lines summarizing the timings.
+    """
+    lines = [u"Slowest scenarios:"]
+    lines += [u"  {0:8.2f}s {1}".format(duration, name)
+              for name, duration in slowest(timings.scenarios(), count)]
+    lines.append(u"Slowest steps:")
+    lines += [u"  {0:8.2f}s {1}".format(duration, name)
+              for name, duration in slowest(timings.steps(), count)]
+    lines.append(u"Operations:")
+    for name, record in sorted(timings.operations.items()):
+        lines.append(u"  {0:8.2f}s {1} ({2} calls)".format(
+            record["total"], name, record["count"]))
+    if baseline is not None:
+        slower = regressions(timings.scenarios(), baseline)
+        if slower:
+            lines.append(u"Scenarios slower than the baseline:")
+            for name, duration, base in slower:
+                lines.append(u"  {0:8.2f}s (was {1:.2f}s) {2}".format(
+                    duration, base, name))
+        else:
+            lines.append(u"No scenario is slower than the baseline.")
+    return lines
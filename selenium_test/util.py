@@ -1,5 +1,7 @@
-import wedutil
+import json
+
 from selenium.webdriver.common.action_chains import ActionChains
+from selenium.webdriver.support.wait import TimeoutException
 
 
 class Trigger(object):
@@ -55,19 +57,242 @@ class Trigger(object):
             return self.el.size
 
 
+class QueryError(Exception):
+    pass
+
+
+class Query(object):
+    """
+    Builds a script that performs a series of DOM queries and checks in
+    the browser, so that they all happen in a single round trip. Each
+    query stores a value under a name, and later queries may refer to
+    earlier values by name. For instance::
+
+        result = Query() \\
+            .element("button", ".__start_label._p_label") \\
+            .parent("parent", "button") \\
+            .own_text("text", "parent") \\
+            .run(driver)
+
+    ``result`` is then a dictionary with the keys ``button``, ``parent``
+    and ``text``. Values whose names begin with an underscore are
+    available to later queries but are not returned. This is necessary
+    for values Selenium cannot return, like text nodes.
+
+    Wherever a query takes a node, it may be given the name of an
+    earlier value or a :class:`WebElement`.
+    """
+
+    def __init__(self):
+        self._statements = []
+        self._args = []
+
+    def _arg(self, value):
+        self._args.append(value)
+        return "args[{0}]".format(len(self._args) - 1)
+
+    @staticmethod
+    def _ref(name):
+        return "values[{0}]".format(json.dumps(name))
+
+    def _node(self, node):
+        return self._ref(node) if isinstance(node, basestring) \
+            else self._arg(node)
+
+    def _set(self, name, expression):
+        self._statements.append("{0} = {1};".format(self._ref(name),
+                                                    expression))
+        return self
+
+    def element(self, name, selector, index=0, within=None):
+        """
+        Find an element by CSS selector. It is an error if no element
+        matches.
+
+        :param index: The index of the element among those that match.
+        A negative index counts from the end.
+        :param within: If set, the node to search in.
+        """
+        within = "" if within is None else ", " + self._node(within)
+        self._set(name, "jQuery({0}{1}).get({2})"
+                  .format(self._arg(selector), within, index))
+        # The failure is marked as missing so that ``run`` can wait for
+        # the element.
+        self._statements.append(
+            "if ({0} === undefined) {{ "
+            "return {{ error: {1}, missing: true }}; }}"
+            .format(self._ref(name),
+                    self._arg("no element matches " + selector)))
+        return self
+
+    def parent(self, name, node):
+        return self._set(name, self._node(node) + ".parentNode")
+
+    def child(self, name, node, index):
+        """
+        Get a child node of ``node``, which may be a text node.
+        """
+        return self._set(name, "{0}.childNodes[{1}]"
+                         .format(self._node(node), index))
+
+    def children(self, name, node, selector):
+        """
+        Get the list of the children of ``node`` that match a selector.
+        """
+        return self._set(name, "jQuery({0}).children({1}).toArray()"
+                         .format(self._node(node), self._arg(selector)))
+
+    def own_text(self, name, node):
+        """
+        Get the text of ``node``, excluding the text of its children.
+        """
+        return self._set(name, """\
+jQuery({0}).contents().filter(function () {{
+  return this.nodeType === Node.TEXT_NODE;
+}}).text()""".format(self._node(node)))
+
+    def siblings(self, name, node, cls="_real"):
+        """
+        Get the siblings of ``node`` which have a class. The value is a
+        couple whose first member is the list of siblings before
+        ``node``, and the second member is the list of siblings after
+        ``node``.
+        """
+        return self._set(name, """\
+(function (el, cls) {{
+  var before = [];
+  var after = [];
+  var into = before;
+  var child = el.parentNode.firstElementChild;
+  while (child) {{
+    if (child === el) {{
+      into = after;
+    }}
+    else if (child.classList.contains(cls)) {{
+      into.push(child);
+    }}
+    child = child.nextElementSibling;
+  }}
+  return [before, after];
+}})({0}, {1})""".format(self._node(node), self._arg(cls)))
+
+    def rect(self, name, node):
+        """
+        Get the bounding rectangle of ``node``, relative to the
+        viewport, as a dictionary.
+        """
+        return self._set(name, "toRect({0}.getBoundingClientRect())"
+                         .format(self._node(node)))
+
+    def range_rect(self, name, node, start=0, end=None):
+        """
+        Get the bounding rectangle of a range of text in a text node,
+        relative to the viewport, as a dictionary.
+
+        :param end: The end of the range. It defaults to the end of the
+        text.
+        """
+        node = self._node(node)
+        end = "{0}.length".format(node) if end is None else end
+        return self._set(name, """\
+(function (text) {{
+  var range = text.ownerDocument.createRange();
+  range.setStart(text, {1});
+  range.setEnd(text, {2});
+  return toRect(range.getBoundingClientRect());
+}})({0})""".format(node, start, end))
+
+    def scroll_into_view(self, node):
+        self._statements.append("{0}.scrollIntoView();"
+                                .format(self._node(node)))
+        return self
+
+    def evaluate(self, name, expression):
+        """
+        Evaluate an arbitrary JavaScript expression. The expression may
+        refer to earlier values through the ``values`` object.
+        """
+        return self._set(name, "(" + expression + ")")
+
+    def check(self, expression, message):
+        """
+        Check that a JavaScript expression is true, and fail the query
+        with ``message`` if it is not. The expression may refer to
+        earlier values through the ``values`` object.
+        """
+        self._statements.append(
+            "if (!({0})) {{ return {{ error: {1} }}; }}"
+            .format(expression, self._arg(message)))
+        return self
+
+    def script(self):
+        return QUERY_TEMPLATE.format("\n".join(self._statements))
+
+    def run(self, driver, util=None):
+        """
+        Run the queries.
+
+        :param util: Selenic's util object. If set, the queries are run
+        again until the elements looked up with :meth:`element` exist,
+        or until ``util`` times out. Otherwise, an element that does not
+        exist is an error right away.
+        :returns: A dictionary of the values of the queries.
+        :raises QueryError: If a query or a check fails.
+        """
+        script = self.script()
+
+        def cond(driver):
+            result = driver.execute_script(script, *self._args)
+            return None if result.get("missing") else result
+
+        result = None
+        if util is not None:
+            try:
+                result = util.wait(cond)
+            except TimeoutException:
+                pass
+
+        if result is None:
+            result = driver.execute_script(script, *self._args)
+
+        if "error" in result:
+            raise QueryError(result["error"])
+        return result["values"]
+
+
+QUERY_TEMPLATE = """
+var args = arguments;
+var values = {{}};
+
+// IEDriver does not return the objects produced by getBoundingClientRect.
+function toRect(rect) {{
+  return {{ left: rect.left, top: rect.top, right: rect.right,
+            bottom: rect.bottom, width: rect.width, height: rect.height }};
+}}
+
+{0}
+
+var ret = {{}};
+for (var name in values) {{
+  if (name.charAt(0) !== "_") {{
+    ret[name] = values[name];
+  }}
+}}
+return {{ values: ret }};
+"""
+
+
 def get_element_parent_and_parent_text(driver, selector):
     """
     Given a CSS selector, return the element found, its parent and the
     text of the parent, excluding any children.
     """
-    return driver.execute_script("""
-    var button = jQuery(arguments[0])[0];
-    var parent = button.parentNode;
-    var parent_text = jQuery(parent).contents().filter(function() {
-       return this.nodeType == Node.TEXT_NODE;
-    }).text();
-    return [button, parent, parent_text];
-    """, selector)
+    result = Query() \
+        .element("element", selector) \
+        .parent("parent", "element") \
+        .own_text("text", "parent") \
+        .run(driver)
+    return [result["element"], result["parent"], result["text"]]
 
 
 def get_real_siblings(driver, element):
@@ -76,31 +301,75 @@ def get_real_siblings(driver, element):
     ``element``, and the second member is the list of siblings after
     ``element``. All siblings must be of the ``_real`` class.
     """
-    preceding, following = driver.execute_script("""
-    var el = arguments[0];
-    var before = [];
-    var after = [];
-    var child = el.parentNode.firstElementChild;
-    var into = before;
-
-    while(child) {
-        if (child === el)
-            into = after;
-        else if (child.classList.contains("_real"))
-            into.push(child);
-        child = child.nextElementSibling;
-    }
-    return [before, after];
-    """, element)
+    preceding, following = Query() \
+        .siblings("siblings", element) \
+        .run(driver)["siblings"]
 
     return (preceding, following)
 
 
+class PromiseRejected(Exception):
+    pass
+
+
+def wait_for_promise(driver, expression, *args):
+    """
+    Wait for a promise computed in the browser to settle. This lets the
+    browser tell us when something is done, instead of polling it.
+
+    :param driver: The Selenium driver.
+    :param expression: A JavaScript expression which evaluates to a
+    promise. The arguments passed to this function after
+    ``expression`` are available to it as ``args``.
+    :returns: The value with which the promise resolves. It must be
+    serializable by Selenium.
+    :raises PromiseRejected: If the promise is rejected.
+    """
+    result = driver.execute_async_script("""
+    var expression = arguments[0];
+    var args = Array.prototype.slice.call(arguments, 1, -1);
+    var done = arguments[arguments.length - 1];
+    Promise.resolve()
+      .then(function () { return eval(expression); })
+      .then(function (value) { done({ value: value }); },
+            function (err) { done({ error: String(err) }); });
+    """, expression, *args)
+    if "error" in result:
+        raise PromiseRejected(result["error"])
+    return result.get("value")
+
+
+# A promise which resolves once the editor is initialized, has validated
+# the document and is done decorating it. The editor may not exist yet when
+# we start waiting, so we wait for it to be created.
+WAIT_FOR_EDITOR = """
+new Promise(function (resolve) {
+  function check() {
+    if (window.wed_editor) {
+      resolve(window.wed_editor);
+      return;
+    }
+    setTimeout(check, 50);
+  }
+  check();
+}).then(function (editor) {
+  return editor.initialized.then(function () {
+    return editor.validationComplete();
+  }).then(function () {
+    return editor.decorationComplete();
+  }).then(function () {
+    return true;
+  });
+})
+"""
+
+
 def wait_for_editor(context, tooltips=False):
     util = context.util
     driver = context.driver
     builder = context.builder
-    wedutil.wait_for_editor(util)
+    with context.timings.measure("wait_for_editor"):
+        wait_for_promise(driver, WAIT_FOR_EDITOR)
 
     context.origin_object = driver.execute_script("""
     var tooltips = arguments[0];
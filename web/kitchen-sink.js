@@ -25,12 +25,26 @@ define(function f(require) {
   var uri = new URI();
   var query = uri.query(true);
   var mode = query.mode;
-  var file = query.file;
   var schema = query.schema;
-  var options_param = query.options;
   var fetchOptions = query.fetchOptions;
+  var baseOptions;
 
-  function fetched(options) {
+  /**
+   * Create an editor.
+   *
+   * @param {string} file The file to load.
+   *
+   * @param {string} options_param The name of a set of mode options.
+   *
+   * @param {number} startTime The time, as given by ``performance.now()``, at
+   * which the creation of the editor was requested. The times at which the
+   * editor becomes initialized and is first validated are recorded in
+   * ``window.wed_timings`` relative to the same origin.
+   *
+   * @returns {Promise} A promise that resolves once the editor is initialized.
+   */
+  function start(file, options_param, startTime) {
+    var options = mergeOptions({}, baseOptions);
     if (mode) {
       options.mode = { path: mode };
     }
@@ -84,7 +98,7 @@ define(function f(require) {
     }
 
     var text;
-    Promise.all(deps.map(r.resolve.bind(r)))
+    return Promise.all(deps.map(r.resolve.bind(r)))
       .then(function resolved(resolvedDeps) {
         if (deps.length === 0) {
           return;
@@ -97,16 +111,83 @@ define(function f(require) {
 
         text = resolvedFile;
       })
-      .then(function start() {
-        $(function ready() {
-          var widget = document.getElementById("widget");
-          var finalOptions = mergeOptions({}, globalConfig.config, options);
-          window.wed_editor = wed.makeEditor(widget, finalOptions);
-          window.wed_editor.init(text);
+      .then(function create() {
+        return new Promise(function executor(resolve) {
+          $(function ready() {
+            var finalOptions = mergeOptions({}, globalConfig.config, options);
+            var previous = window.wed_editor;
+            var editor;
+            if (previous && !previous.destroyed) {
+              editor = wed.replaceEditor(previous, finalOptions);
+            }
+            else {
+              var widget = document.getElementById("widget");
+              editor = wed.makeEditor(widget, finalOptions);
+            }
+            window.wed_editor = editor;
+            var timings = window.wed_timings = { start: startTime };
+            editor.firstValidationComplete.then(function validated() {
+              timings.validated = performance.now();
+            });
+            resolve(editor.init(text).then(function initialized() {
+              timings.initialized = performance.now();
+            }));
+          });
         });
       });
   }
 
+  /**
+   * Replace the editor of this page with a new editor, without reloading the
+   * page. This is used by the test suite to avoid paying the cost of a page
+   * load for each test.
+   *
+   * @param {string} search The query part of a URL to this page, which
+   * specifies the new editor.
+   *
+   * @returns {Promise<boolean>} A promise that resolves to ``true`` once the
+   * new editor is initialized. It resolves to ``false`` if the editor cannot be
+   * replaced in this page because the query changes the mode, the schema or the
+   * options module. The page must be reloaded in this case.
+   */
+  window.wed_reset = function reset(search) {
+    var newQuery = new URI(search).query(true);
+    if (newQuery.mode !== mode || newQuery.schema !== schema ||
+        newQuery.fetchOptions !== fetchOptions) {
+      return Promise.resolve(false);
+    }
+
+    window.history.replaceState(null, "", search);
+    // Get rid of the elements that the previous editor or test left in the
+    // body.
+    $(".tooltip, [data-notify=container], #origin-object").remove();
+    window.scrollTo(0, 0);
+    return start(newQuery.file, newQuery.options, performance.now())
+      .then(function started() {
+        return true;
+      });
+  };
+
+  /**
+   * Destroy the editor of this page. The editor stops autosaving and no longer
+   * uses the databases of the page. This is used by the test suite before it
+   * deletes the databases between tests. The page can then create a new editor
+   * with ``wed_reset``.
+   */
+  window.wed_teardown = function teardown() {
+    var editor = window.wed_editor;
+    if (editor && !editor.destroyed) {
+      editor.destroy();
+    }
+  };
+
+  function fetched(options) {
+    baseOptions = options;
+    // The origin of performance.now() is the start of the navigation to this
+    // page.
+    start(query.file, query.options, 0);
+  }
+
   if (fetchOptions) {
     // eslint-disable-next-line import/no-dynamic-require
     require([fetchOptions], function loaded(module) {